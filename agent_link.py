@@ -0,0 +1,317 @@
+# agent_link.py
+# Persistent agent <-> env connections (config.AGENT_LINK = "socket"):
+#  - every animal process, pooled process or shard worker opens ONE TCP connection to ENV_HOST:ENV_PORT
+#    for its whole life, instead of a throwaway "join" connection plus multiprocessing queues
+#  - telemetry and events go up, control messages (die / grass_grant / hunt_result) come down,
+#    as length-prefixed binary frames of fixed-layout records: no pickling, no feeder thread
+#  - env serves every connection from one asyncio event loop in a background thread (AgentServer);
+#    decoded messages wait in deques that env takes as a whole once per tick, and control messages
+#    are written out once per tick (flush)
+#
+# Frame: u32 length of the rest | u8 channel (hello, telemetry, events, control) | records.
+# Record: u8 type, then the fields of that message type (see _RECORDS). A frame is what one put()
+# sent, so ("batch", [...]) is one frame and counts as one message for the lockstep barrier.
+# A batch of one message type (a pooled process' telemetry) is sent as a run instead: channel | RUN,
+# the u8 type once, then the bare fields of every record, unpacked in one call.
+#
+# The messages are the same tuples as on the queues, so env handles them with the same code.
+
+import queue
+import socket
+import struct
+import asyncio
+import threading
+import collections
+
+from shm_slots import SlotWriter
+
+
+HELLO = 0
+TELEMETRY = 1
+EVENTS = 2
+CONTROL = 3
+RUN = 0x80
+
+KINDS = ("prey", "predator", "pooled", "worker")
+
+# message name -> struct of its fields ("kind" strings travel as an index into KINDS)
+_RECORDS = (
+    ("hello", "<Bq"),            # kind, pid
+    ("prey", "<qd?"),            # pid, energy, active
+    ("predator", "<qd?"),
+    ("ready", "<Bqd"),           # kind, pid, monotonic time
+    ("dead", "<Bq"),             # kind, pid
+    ("eat_grass", "<qq"),        # pid, requested
+    ("hunt", "<q"),              # pid
+    ("spawn_prey", "<q"),        # n
+    ("spawn_predator", "<q"),
+    ("die", "<"),
+    ("grass_grant", "<q"),       # granted
+    ("hunt_result", "<?"),       # success
+)
+# packed with their type byte in front
+_BY_NAME = {name: (code, struct.Struct("<B" + fmt[1:])) for code, (name, fmt) in enumerate(_RECORDS)}
+_BY_CODE = [(name, struct.Struct("<B" + fmt[1:])) for name, fmt in _RECORDS]
+_RUN = [struct.Struct(fmt) for _name, fmt in _RECORDS]
+_WITH_KIND = {"hello", "ready", "dead"}
+
+_LEN = struct.Struct("<I")
+
+
+def encode(channel: int, msgs) -> bytes:
+    name = msgs[0][0] if len(msgs) > 1 else None
+    if name is not None and name not in _WITH_KIND and _RUN[_BY_NAME[name][0]].size \
+            and all(msg[0] == name for msg in msgs):
+        code = _BY_NAME[name][0]
+        pack = _RUN[code].pack
+        body = bytes((channel | RUN, code)) + b"".join([pack(*msg[1:]) for msg in msgs])
+        return _LEN.pack(len(body)) + body
+
+    parts = [bytes((channel,))]
+    for msg in msgs:
+        code, st = _BY_NAME[msg[0]]
+        if msg[0] in _WITH_KIND:
+            parts.append(st.pack(code, KINDS.index(msg[1]), *msg[2:]))
+        else:
+            parts.append(st.pack(code, *msg[1:]))
+    body = b"".join(parts)
+    return _LEN.pack(len(body)) + body
+
+
+def decode(body) -> tuple:
+    """(channel, [message tuples]) of a frame body (without its length prefix)."""
+    channel = body[0]
+    if channel & RUN:
+        name = _RECORDS[body[1]][0]
+        return channel & ~RUN, [(name,) + fields for fields in _RUN[body[1]].iter_unpack(body[2:])]
+
+    msgs = []
+    off = 1
+    end = len(body)
+    while off < end:
+        name, st = _BY_CODE[body[off]]
+        fields = st.unpack_from(body, off)
+        off += st.size
+        if name in _WITH_KIND:
+            msgs.append((name, KINDS[fields[1]]) + fields[2:])
+        else:
+            msgs.append((name,) + fields[1:])
+    return channel, msgs
+
+
+# =======================
+# AGENT SIDE
+# =======================
+
+class _Channel:
+    """put() side of one direction of the link (stands in for energies_to_env / events_to_env)."""
+    def __init__(self, link, channel: int):
+        self.link = link
+        self.channel = channel
+
+    def put(self, msg):
+        self.link.send(self.channel, msg[1] if msg[0] == "batch" else (msg,))
+
+
+class AgentLink:
+    """
+    One blocking connection to env. `telemetry` and `events` have the Queue put() interface,
+    the link itself has get_nowait() for control messages (checked once per tick, never blocks).
+    """
+    def __init__(self, host: str, port: int, kind: str, pid: int, timeout: float = 5.0):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.settimeout(None)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.inbox = collections.deque()
+        self.buf = bytearray()
+        self.telemetry = _Channel(self, TELEMETRY)
+        self.events = _Channel(self, EVENTS)
+        self.send(HELLO, (("hello", kind, pid),))
+
+    def send(self, channel: int, msgs):
+        self.sock.sendall(encode(channel, msgs))
+
+    def attach(self, energies_to_env, events_to_env, ctrl_q=None):
+        """
+        The (energies_to_env, events_to_env, ctrl_q) an agent should use: the link, except for what
+        the shared-memory transports already carry (telemetry slots, control mailboxes).
+        """
+        if isinstance(energies_to_env, SlotWriter):
+            energies_to_env.queue = self.telemetry
+        else:
+            energies_to_env = self.telemetry
+        return energies_to_env, self.events, self if ctrl_q is None else ctrl_q
+
+    def get_nowait(self):
+        if not self.inbox:
+            self._poll()
+        if not self.inbox:
+            raise queue.Empty
+        return self.inbox.popleft()
+
+    def _poll(self):
+        while True:
+            try:
+                data = self.sock.recv(65536, socket.MSG_DONTWAIT)
+            except BlockingIOError:
+                break
+            except OSError:
+                data = b""
+            if not data:
+                # env is gone: nothing more will come
+                self.inbox.append(("die",))
+                return
+            self.buf += data
+
+        buf = self.buf
+        while len(buf) >= _LEN.size:
+            (n,) = _LEN.unpack_from(buf)
+            if len(buf) < _LEN.size + n:
+                break
+            _channel, msgs = decode(memoryview(buf)[_LEN.size:_LEN.size + n])
+            self.inbox.extend(msgs)
+            del buf[:_LEN.size + n]
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+# =======================
+# ENV SIDE
+# =======================
+
+class _Ctrl:
+    """Stands in for an animal's ctrl Queue on the env side: messages wait in the outbox until flush()."""
+    def __init__(self, server, pid):
+        self.server = server
+        self.pid = pid
+
+    def put(self, msg):
+        with self.server.lock:
+            self.server.outbox.setdefault(self.pid, []).append(msg)
+
+
+class AgentServer:
+    """
+    Env-side asyncio server, run in its own thread.
+    `telemetry` and `events` hold decoded messages (in arrival order) until env drains them.
+    """
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.telemetry = collections.deque()
+        self.events = collections.deque()
+        self.lock = threading.Lock()
+        self.outbox = {}      # pid -> control messages not written yet
+        self.writers = {}     # pid -> StreamWriter (event loop thread only)
+        self.closed = set()   # pids whose connection is gone: their control messages are dropped
+        self.connections = 0
+        self.frames = 0
+        self.loop = None
+        self._server = None
+        self._started = threading.Event()
+        self._error = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name="agent-link")
+        self._thread.start()
+        self._started.wait()
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self.loop = loop
+        try:
+            self._server = loop.run_until_complete(
+                asyncio.start_server(self._serve, self.host, self.port, reuse_address=True))
+        except OSError as e:
+            self._error = e
+            self._started.set()
+            loop.close()
+            return
+        self._started.set()
+        try:
+            loop.run_forever()
+        finally:
+            # end the connection handlers inside the loop before closing it
+            self._server.close()
+            for writer in list(self.writers.values()):
+                writer.close()
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.close()
+
+    async def _serve(self, reader, writer):
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        pid = None
+        try:
+            channel, msgs = decode(await reader.readexactly(_LEN.unpack(await reader.readexactly(_LEN.size))[0]))
+            if channel != HELLO or not msgs:
+                return
+            pid = msgs[0][2]
+            self.writers[pid] = writer
+            self.closed.discard(pid)
+            self.connections += 1
+
+            telemetry, events = self.telemetry, self.events
+            while True:
+                (n,) = _LEN.unpack(await reader.readexactly(_LEN.size))
+                channel, msgs = decode(await reader.readexactly(n))
+                msg = msgs[0] if len(msgs) == 1 else ("batch", msgs)
+                (telemetry if channel == TELEMETRY else events).append(msg)
+                self.frames += 1
+        except (asyncio.IncompleteReadError, ConnectionError, OSError, asyncio.CancelledError):
+            # disconnected, or cancelled by stop()
+            pass
+        finally:
+            if pid is not None and self.writers.get(pid) is writer:
+                del self.writers[pid]
+                self.closed.add(pid)
+                self.connections -= 1
+            writer.close()
+
+    # ---- env thread ----
+    @staticmethod
+    def drain(messages) -> list:
+        """Everything queued in `messages` (self.telemetry or self.events) so far."""
+        return [messages.popleft() for _ in range(len(messages))]
+
+    def ctrl(self, pid) -> _Ctrl:
+        return _Ctrl(self, pid)
+
+    def flush(self, timeout: float = 5.0):
+        """
+        Write the control messages of this tick: one frame per animal, one wake-up of the event loop.
+        Returns once they are handed to the sockets, so an animal woken for the next tick finds them.
+        """
+        with self.lock:
+            if not self.outbox:
+                return
+            out, self.outbox = self.outbox, {}
+        asyncio.run_coroutine_threadsafe(self._write(out), self.loop).result(timeout)
+
+    async def _write(self, out):
+        for pid, msgs in out.items():
+            writer = self.writers.get(pid)
+            if writer is not None:
+                writer.write(encode(CONTROL, msgs))
+            elif pid not in self.closed:
+                # not connected yet (still starting): kept, in order, for the next flush
+                with self.lock:
+                    self.outbox[pid] = msgs + self.outbox.get(pid, [])
+
+    def stop(self):
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self._thread is not None:
+            self._thread.join(2.0)
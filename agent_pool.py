@@ -0,0 +1,219 @@
+# agent_pool.py
+# Sharded agent workers (config.ENGINE_MODE = "sharded"):
+#  - N worker processes, each hosting a shard of preys/predators
+#  - each worker runs prey_step / predator_step for its whole shard once per tick
+#  - one batched message per tick and per direction between a worker and env
+
+import os
+import time
+import queue
+import itertools
+import multiprocessing
+
+import config
+import seeding
+from prey import _join_env_socket, prey_on_ctrl, prey_step
+from predator import predator_on_ctrl, predator_step
+from agent_link import AgentLink
+from shm_slots import SlotWriter, MailboxReader
+from tick_sync import Pacer
+
+
+class _Batch:
+    """Collects the puts of one shard tick so they are sent as one message."""
+    def __init__(self):
+        self.items = []
+
+    def put(self, item):
+        self.items.append(item)
+
+
+def run_agent_worker(shard_id, shared_env, inbox, energies_to_env, events_to_env,
+                     telemetry_shm=None, control_shm=None, first_tick=0):
+    if config.AGENT_LINK == "socket":
+        # telemetry / event batches over the connection; spawns and ctrl still come through `inbox`
+        link = AgentLink(config.ENV_HOST, config.ENV_PORT, "worker", os.getpid())
+        energies_to_env, events_to_env, _ctrl = link.attach(energies_to_env, events_to_env, inbox)
+    else:
+        _join_env_socket("worker", config.ENV_HOST, config.ENV_PORT, os.getpid())
+
+    # in lockstep mode a worker is one participant, and env sends it exactly one batch per tick
+    pacer = Pacer(shared_env, first_tick)
+    lockstep = pacer.barrier is not None
+    energies_to_env = pacer.track(energies_to_env)
+    events_to_env = pacer.track(events_to_env)
+
+    preys = {}  # aid -> {"energy", "active", "rng", "out", "ctrl"}
+    preds = {}
+
+    # "out" of an animal is this batch, or a SlotWriter over it when telemetry goes through shared memory
+    telemetry = _Batch()
+
+    while shared_env.running.value:
+        if not pacer.wait():
+            break
+
+        telemetry.items = []
+        events = _Batch()
+
+        # env batches: spawn / ctrl (die, grass_grant, hunt_result) / reset
+        try:
+            while True:
+                batch = inbox.get(timeout=config.LOCKSTEP_TIMEOUT) if lockstep else inbox.get_nowait()
+                for item in batch:
+                    if item[0] == "spawn":
+                        _, kind, aid, serial, slot, state = item
+                        out = telemetry
+                        if slot is not None and telemetry_shm is not None:
+                            out = SlotWriter(telemetry_shm, telemetry, *slot)
+                        ctrl = None
+                        if slot is not None and control_shm is not None:
+                            ctrl = MailboxReader(control_shm, *slot)
+                        rng = seeding.agent_stream(serial, state[2] if state is not None else None)
+                        me = {"energy": float(rng.randint(config.INITIAL_ENERGY_MIN, config.INITIAL_ENERGY_MAX)),
+                              "active": False, "rng": rng, "out": out, "ctrl": ctrl}
+                        if state is not None:
+                            me["energy"], me["active"] = float(state[0]), bool(state[1])
+                        (preys if kind == "prey" else preds)[aid] = me
+                        out.put(("ready", kind, aid, time.monotonic()))
+
+                    elif item[0] == "ctrl":
+                        _, aid, msg = item
+                        if aid in preys:
+                            if not prey_on_ctrl(preys[aid], msg):
+                                preys.pop(aid)["out"].put(("dead", "prey", aid))
+                        elif aid in preds:
+                            if not predator_on_ctrl(preds[aid], msg):
+                                preds.pop(aid)["out"].put(("dead", "predator", aid))
+
+                    elif item[0] == "reset":
+                        preys.clear()
+                        preds.clear()
+                if lockstep:
+                    break
+        except queue.Empty:
+            pass
+
+        # shared-memory mailboxes: die / grass_grant / hunt_result written by env in place
+        if control_shm is not None:
+            for animals, on_ctrl, kind in ((preys, prey_on_ctrl, "prey"), (preds, predator_on_ctrl, "predator")):
+                for aid, me in list(animals.items()):
+                    if me["ctrl"] is None:
+                        continue
+                    try:
+                        while True:
+                            if not on_ctrl(me, me["ctrl"].get_nowait()):
+                                animals.pop(aid)["out"].put(("dead", kind, aid))
+                                break
+                    except queue.Empty:
+                        pass
+
+        for aid, me in list(preys.items()):
+            prey_step(me, aid, events)
+            me["out"].put(("prey", aid, float(me["energy"]), bool(me["active"])))
+            if me["energy"] <= 0:
+                del preys[aid]
+                me["out"].put(("dead", "prey", aid))
+
+        for aid, me in list(preds.items()):
+            predator_step(me, aid, events)
+            me["out"].put(("predator", aid, float(me["energy"]), bool(me["active"])))
+            if me["energy"] <= 0:
+                del preds[aid]
+                me["out"].put(("dead", "predator", aid))
+
+        if telemetry.items:
+            energies_to_env.put(("batch", telemetry.items))
+        if events.items:
+            events_to_env.put(("batch", events.items))
+
+        pacer.done()
+
+
+class _ShardCtrl:
+    """Stands in for an animal's ctrl Queue: messages wait in the shard outbox until flush()."""
+    def __init__(self, outbox, aid):
+        self.outbox = outbox
+        self.aid = aid
+
+    def put(self, msg):
+        self.outbox.append(("ctrl", self.aid, msg))
+
+
+class ShardPool:
+    """
+    Env-side handle on the worker processes.
+    Animal ids are assigned here (not OS pids) and each new animal goes to the least-loaded shard.
+    """
+    def __init__(self, shared_env, energies_to_env, events_to_env, workers=None,
+                 telemetry_shm=None, control_shm=None):
+        self.shared_env = shared_env
+        self.energies_to_env = energies_to_env
+        self.events_to_env = events_to_env
+        self.telemetry_shm = telemetry_shm
+        self.control_shm = control_shm
+        self.n = max(1, int(workers or os.cpu_count() or 1))
+
+        self.procs = []
+        self.inboxes = []
+        self.outboxes = [[] for _ in range(self.n)]
+        self.load = [0] * self.n
+        self.owner = {}  # aid -> shard
+        self._ids = itertools.count(1)
+
+    def start(self):
+        for shard in range(self.n):
+            inbox = multiprocessing.Queue()
+            p = multiprocessing.Process(
+                target=run_agent_worker,
+                args=(shard, self.shared_env, inbox, self.energies_to_env, self.events_to_env,
+                      self.telemetry_shm, self.control_shm, self.shared_env.barrier.next_tick()),
+                name=f"SHARD-{shard}",
+            )
+            p.start()
+            self.procs.append(p)
+            self.inboxes.append(inbox)
+
+    def add(self, kind: str, serial: int, slot=None, state=None):
+        """
+        Place a new animal; returns (aid, ctrl) where ctrl has the ctrl Queue put() interface.
+        `serial` keys its random stream, `slot` is its (slot, generation) in the shared telemetry table, if any,
+        `state` its (energy, active, resume tick) when resumed from a checkpoint.
+        """
+        shard = min(range(self.n), key=self.load.__getitem__)
+        aid = next(self._ids)
+        self.load[shard] += 1
+        self.owner[aid] = shard
+        self.outboxes[shard].append(("spawn", kind, aid, serial, slot, state))
+        return aid, _ShardCtrl(self.outboxes[shard], aid)
+
+    def remove(self, aid):
+        shard = self.owner.pop(aid, None)
+        if shard is not None:
+            self.load[shard] -= 1
+
+    def reset(self):
+        self.owner.clear()
+        for shard in range(self.n):
+            self.load[shard] = 0
+            self.outboxes[shard][:] = [("reset",)]
+
+    def flush(self, always: bool = False):
+        """Send each shard its pending spawns/ctrl messages as one batch (even empty if `always`)."""
+        for shard, outbox in enumerate(self.outboxes):
+            if not outbox and not always:
+                continue
+            try:
+                self.inboxes[shard].put(list(outbox))
+            except Exception:
+                pass
+            outbox.clear()
+
+    def stop(self):
+        for p in self.procs:
+            try:
+                p.join(timeout=config.TICK_DURATION + 1)
+            except Exception:
+                pass
+            if p.is_alive():
+                p.terminate()
@@ -0,0 +1,472 @@
+# bench.py
+# Headless performance benchmarks, results saved as JSON to compare commits:
+#  - tick:  ticks/sec and tick latency percentiles of run_env (lockstep, max speed) per engine and population
+#  - spawn: how fast spawn_prey brings N new animals up (until their first tick is acked)
+#  - queue: messages/sec through an energies_to_env / events_to_env style multiprocessing.Queue,
+#           and through agent_link connections (AGENT_LINK = "socket")
+#  - reset: duration of the tick that runs reset_to_initial on a populated world, also right after
+#           a spawn burst (children still starting); a reset that waits out LOCKSTEP_TIMEOUT fails the run
+#  - web:   requests/sec on web_display's /api/state with many concurrent clients (plain, gzip, ETag 304)
+#
+#   python3 bench.py --modes vectorized,sharded --sizes 1000,10000 --out bench.json
+#   python3 bench.py --out new.json --compare bench.json      # exit code 1 on regression (or stalled reset)
+#
+# Every run_env scenario runs in a fresh process; config overrides reach it (and the animal
+# processes it starts) through config.CONFIG_OVERRIDES_ENV.
+
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import argparse
+import http.client
+import platform
+import subprocess
+import multiprocessing
+
+import config
+from ipc import DisplayCommand, Snapshot
+
+
+# metric -> True if higher is better (used by --compare)
+METRICS = {
+    "ticks_per_sec": True,
+    "tick_ms_p99": False,
+    "spawn_per_sec": True,
+    "msgs_per_sec": True,
+    "reset_ms": False,
+    "req_per_sec": True,
+}
+
+
+class _Recorder:
+    """
+    Stands in for env_to_display: timestamps every Snapshot, and feeds UI commands
+    scheduled for a given tick into display_to_env (read by env at the start of the next tick).
+    """
+    def __init__(self, display_to_env, schedule=None):
+        self.display_to_env = display_to_env
+        self.schedule = dict(schedule or {})   # tick -> [DisplayCommand]
+        self.times = []
+        self.snapshots = []
+
+    def put(self, snapshot):
+        if not isinstance(snapshot, Snapshot):   # MetricsReport
+            return
+        self.times.append(time.monotonic())
+        self.snapshots.append(snapshot)
+        for cmd in self.schedule.pop(snapshot.tick, ()):
+            self.display_to_env.put(cmd)
+
+
+def _percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    i = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return float(sorted_values[i])
+
+
+def _free_port() -> int:
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        s.bind((config.ENV_HOST, 0))
+        return s.getsockname()[1]
+    finally:
+        s.close()
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+# =======================
+# RUN_ENV SCENARIOS (child process)
+# =======================
+
+def _run_env_child(result_q, preys, predators, ticks, schedule):
+    from shared_env import SharedEnv
+    from env import run_env, NoLog
+
+    shared_env = SharedEnv()
+    display_to_env = queue.Queue()
+    display_to_env.put(DisplayCommand(cmd="add_prey", args={"value": preys}))
+    display_to_env.put(DisplayCommand(cmd="add_predator", args={"value": predators}))
+    recorder = _Recorder(display_to_env, schedule)
+    energies_to_env = multiprocessing.Queue()
+    events_to_env = multiprocessing.Queue()
+
+    t_start = time.monotonic()
+    run_env(shared_env, recorder, display_to_env, energies_to_env, events_to_env, NoLog(), max_ticks=ticks)
+
+    # animals exit once running is False; keep their queues drained so their feeder threads can finish
+    deadline = time.monotonic() + 10.0
+    while multiprocessing.active_children() and time.monotonic() < deadline:
+        for q in (energies_to_env, events_to_env):
+            try:
+                while True:
+                    q.get_nowait()
+            except Exception:
+                pass
+        time.sleep(0.05)
+    for p in multiprocessing.active_children():
+        p.terminate()
+
+    result_q.put({
+        "start": t_start,
+        "times": recorder.times,
+        "population": [s.preys + s.predators for s in recorder.snapshots],
+        "spawn_latency_ms": [s.spawn_latency_ms for s in recorder.snapshots],
+    })
+
+
+def run_scenario(overrides: dict, preys: int, predators: int, ticks: int, schedule=None, timeout=600.0):
+    """run_env in a fresh process with `overrides` applied to config (there and in every child)."""
+    ctx = multiprocessing.get_context("spawn")
+    values = {"TICK_MODE": "lockstep", "LOCKSTEP_MAX_SPEED": True, "ENV_PORT": _free_port()}
+    values.update(overrides)
+
+    old = os.environ.get(config.CONFIG_OVERRIDES_ENV)
+    os.environ[config.CONFIG_OVERRIDES_ENV] = json.dumps(values)
+    try:
+        result_q = ctx.Queue()
+        p = ctx.Process(target=_run_env_child, args=(result_q, preys, predators, ticks, schedule or {}))
+        p.start()
+    finally:
+        if old is None:
+            os.environ.pop(config.CONFIG_OVERRIDES_ENV, None)
+        else:
+            os.environ[config.CONFIG_OVERRIDES_ENV] = old
+
+    try:
+        return result_q.get(timeout=timeout)
+    finally:
+        p.join(15)
+        if p.is_alive():
+            p.terminate()
+
+
+def bench_tick(mode: str, size: int, ticks: int):
+    preys, predators = size, max(1, size // 5)
+    r = run_scenario({"ENGINE_MODE": mode, "LOCKSTEP_TIMEOUT": 60.0}, preys, predators, ticks)
+    # tick 0 spawns the population: measure the steady loop from tick 1 on
+    times = r["times"]
+    durations = sorted(b - a for a, b in zip(times[1:], times[2:]))
+    elapsed = times[-1] - times[1] if len(times) > 2 else 0.0
+    population = r["population"][2:] or [0]
+    return {
+        "mode": mode,
+        "preys": preys,
+        "predators": predators,
+        "ticks": len(durations),
+        "ticks_per_sec": len(durations) / elapsed if elapsed > 0 else 0.0,
+        "tick_ms_p50": _percentile(durations, 0.50) * 1000.0,
+        "tick_ms_p90": _percentile(durations, 0.90) * 1000.0,
+        "tick_ms_p99": _percentile(durations, 0.99) * 1000.0,
+        "tick_ms_max": (durations[-1] if durations else 0.0) * 1000.0,
+        "mean_population": sum(population) / len(population),
+    }
+
+
+def bench_spawn(mode: str, count: int):
+    # tick 0 spawns `count` preys; tick 1 only completes once every one of them has acked
+    r = run_scenario({"ENGINE_MODE": mode, "LOCKSTEP_TIMEOUT": 300.0}, count, 0, 2)
+    elapsed = r["times"][1] - r["start"]
+    p50, p99 = r["spawn_latency_ms"][-1]
+    return {
+        "mode": mode,
+        "count": count,
+        "seconds": elapsed,
+        "spawn_per_sec": count / elapsed if elapsed > 0 else 0.0,
+        "ready_ms_p50": p50,
+        "ready_ms_p99": p99,
+    }
+
+
+RESET_LOCKSTEP_TIMEOUT = 120.0
+
+
+def bench_reset(mode: str, size: int, after_spawn: bool = False):
+    # populated world; "reset" is sent after tick 2 and runs at the start of tick 3.
+    # after_spawn: a burst of preys is added just before it, in the same tick, so the reset meets
+    # children that are still starting (they must still get "die" and ack)
+    commands = [DisplayCommand(cmd="reset", args={})]
+    if after_spawn:
+        commands.insert(0, DisplayCommand(cmd="add_prey", args={"value": max(1, size // 10)}))
+    r = run_scenario({"ENGINE_MODE": mode, "LOCKSTEP_TIMEOUT": RESET_LOCKSTEP_TIMEOUT}, size, max(1, size // 5), 4,
+                     {2: commands})
+    times = r["times"]
+    reset_ms = (times[3] - times[2]) * 1000.0
+    return {
+        "mode": mode,
+        "case": "after_spawn" if after_spawn else "populated",
+        "population": r["population"][2],
+        "reset_ms": reset_ms,
+        # the tick only ended because the barrier gave up on missing acks
+        "stalled": reset_ms >= RESET_LOCKSTEP_TIMEOUT * 1000.0,
+    }
+
+
+# =======================
+# QUEUE THROUGHPUT
+# =======================
+
+def _producer(q, kind: str, count: int, batch: int):
+    pid = os.getpid()
+    msg = ("prey", pid, 42.0, True) if kind == "telemetry" else ("eat_grass", pid, 30)
+    if batch > 1:
+        for _ in range(count // batch):
+            q.put(("batch", [msg] * batch))
+    else:
+        for _ in range(count):
+            q.put(msg)
+
+
+def _link_producer(port: int, kind: str, count: int, batch: int):
+    from agent_link import AgentLink
+    link = AgentLink("127.0.0.1", port, "prey", os.getpid())
+    _producer(link.telemetry if kind == "telemetry" else link.events, kind, count, batch)
+    link.close()
+
+
+def bench_queue(kind: str, producers: int, count: int, batch: int, link: str = "queue"):
+    """`producers` processes put `count` messages each; env-style drain on the other side."""
+    ctx = multiprocessing.get_context("spawn")
+    if link == "socket":
+        from agent_link import AgentServer
+        server = AgentServer("127.0.0.1", _free_port())
+        server.start()
+        messages = server.telemetry if kind == "telemetry" else server.events
+        procs = [ctx.Process(target=_link_producer, args=(server.port, kind, count, batch))
+                 for _ in range(producers)]
+    else:
+        q = ctx.Queue()
+        procs = [ctx.Process(target=_producer, args=(q, kind, count, batch)) for _ in range(producers)]
+    expected = producers * (count // batch) * batch if batch > 1 else producers * count
+
+    t0 = time.monotonic()
+    for p in procs:
+        p.start()
+    received = 0
+    while received < expected:
+        if link == "socket":
+            # taken as a whole, like env does once per tick
+            got = server.drain(messages)
+            if not got:
+                if time.monotonic() - t0 > 30:
+                    raise TimeoutError(f"agent_link: {received}/{expected} messages")
+                time.sleep(0.001)
+        else:
+            got = (q.get(timeout=30),)
+        for msg in got:
+            received += len(msg[1]) if msg[0] == "batch" else 1
+    elapsed = time.monotonic() - t0
+    for p in procs:
+        p.join()
+    if link == "socket":
+        server.stop()
+    entry = {
+        "kind": kind,
+        "producers": producers,
+        "batch": batch,
+        "messages": received,
+        "msgs_per_sec": received / elapsed if elapsed > 0 else 0.0,
+    }
+    if link != "queue":
+        # only tagged when not the default, so older results still line up with --compare
+        entry["link"] = link
+    return entry
+
+
+# =======================
+# WEB DISPLAY THROUGHPUT
+# =======================
+
+_WEB_HEADERS = {
+    "plain": {},
+    "gzip": {"Accept-Encoding": "gzip"},
+    "etag": {},   # If-None-Match added once the first response is in
+}
+
+
+def _web_client(port: int, variant: str, seconds: float, result_q):
+    headers = dict(_WEB_HEADERS[variant])
+    done = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            c = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            c.request("GET", "/api/state", headers=headers)
+            r = c.getresponse()
+            r.read()
+            if variant == "etag" and r.getheader("ETag"):
+                headers["If-None-Match"] = r.getheader("ETag")
+            c.close()
+            done += 1
+        except Exception:
+            errors += 1
+    result_q.put((done, errors))
+
+
+def bench_web(variant: str, clients: int, seconds: float):
+    """`clients` processes GET /api/state in a loop against a web_display holding one snapshot."""
+    from web_display import run_web_display
+
+    ctx = multiprocessing.get_context("spawn")
+    port = _free_port()
+    env_to_display, display_to_env, log_to_display = ctx.Queue(), ctx.Queue(), ctx.Queue()
+    env_to_display.put(Snapshot(tick=1, predators=20, preys=100, grass=500, drought=False,
+                                prey_energy_stats=(10.0, 40.0, 70.0), predator_energy_stats=(20.0, 45.0, 80.0),
+                                prey_probs=(config.PREY_EAT_PROB, config.PREY_REPRO_PROB),
+                                pred_probs=(config.PRED_HUNT_PROB, config.PRED_REPRO_PROB),
+                                prey_energy_pct=(20.0, 40.0, 60.0), predator_energy_pct=(30.0, 45.0, 70.0),
+                                prey_energy_hist=tuple(range(int(config.ENERGY_HIST_BINS))),
+                                predator_energy_hist=tuple(range(int(config.ENERGY_HIST_BINS)))))
+    server = ctx.Process(target=run_web_display,
+                         args=(env_to_display, display_to_env, log_to_display, "127.0.0.1", port), daemon=True)
+    server.start()
+    try:
+        deadline = time.monotonic() + 30.0
+        while True:
+            try:
+                c = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+                c.request("GET", "/api/state")
+                if json.loads(c.getresponse().read()).get("ok"):
+                    break
+            except (OSError, ValueError):
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("web_display did not come up")
+            time.sleep(0.05)
+
+        result_q = ctx.Queue()
+        procs = [ctx.Process(target=_web_client, args=(port, variant, seconds, result_q)) for _ in range(clients)]
+        for p in procs:
+            p.start()
+        results = [result_q.get(timeout=seconds + 60) for _ in procs]
+        for p in procs:
+            p.join()
+    finally:
+        server.terminate()
+        server.join(5)
+
+    done = sum(r[0] for r in results)
+    return {
+        "kind": variant,
+        "clients": clients,
+        "requests": done,
+        "errors": sum(r[1] for r in results),
+        "req_per_sec": done / seconds,
+    }
+
+
+# =======================
+# COMPARE
+# =======================
+
+def _key(bench: str, entry: dict):
+    return (bench,) + tuple(str(entry.get(k)) for k in
+                            ("mode", "case", "preys", "count", "kind", "link", "producers", "batch", "clients"))
+
+
+def compare(base: dict, current: dict, tolerance: float) -> int:
+    """Print metric ratios against `base`; returns how many got worse by more than `tolerance`."""
+    old = {_key(b, e): e for b, entries in base.get("results", {}).items() for e in entries}
+    regressions = 0
+    for bench, entries in current["results"].items():
+        for e in entries:
+            ref = old.get(_key(bench, e))
+            if ref is None:
+                continue
+            for metric, higher_is_better in METRICS.items():
+                if metric not in e or not ref.get(metric):
+                    continue
+                ratio = e[metric] / ref[metric]
+                worse = ratio < 1.0 - tolerance if higher_is_better else ratio > 1.0 + tolerance
+                regressions += worse
+                label = " ".join(k for k in _key(bench, e) if k != "None")
+                print(f"{'REGRESSION' if worse else 'ok':10} {label:40} {metric:14} "
+                      f"{ref[metric]:12.2f} -> {e[metric]:12.2f} ({ratio:.2f}x)")
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmarks for the env tick loop, spawning, IPC and reset.")
+    ap.add_argument("--only", default="tick,spawn,queue,reset,web", help="comma-separated benchmarks to run")
+    ap.add_argument("--modes", default="vectorized,sharded", help="engine modes (vectorized, sharded, process)")
+    ap.add_argument("--sizes", default="1000,10000", help="prey counts for the tick benchmark")
+    ap.add_argument("--ticks", type=int, default=200)
+    ap.add_argument("--spawn-count", type=int, default=500)
+    ap.add_argument("--reset-size", type=int, default=1000)
+    ap.add_argument("--producers", type=int, default=4)
+    ap.add_argument("--messages", type=int, default=50_000, help="messages per producer")
+    ap.add_argument("--web-clients", type=int, default=16, help="concurrent /api/state clients")
+    ap.add_argument("--web-seconds", type=float, default=5.0)
+    ap.add_argument("--out", default="bench.json")
+    ap.add_argument("--compare", help="previous JSON result to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="relative change counted as a regression")
+    args = ap.parse_args(argv)
+
+    only = set(args.only.split(","))
+    modes = [m for m in args.modes.split(",") if m]
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    results = {}
+
+    def record(bench, entry):
+        results.setdefault(bench, []).append(entry)
+        print(bench, json.dumps(entry))
+
+    if "tick" in only:
+        for mode in modes:
+            for size in sizes:
+                record("tick", bench_tick(mode, size, args.ticks))
+    if "spawn" in only:
+        for mode in modes:
+            record("spawn", bench_spawn(mode, args.spawn_count))
+    if "queue" in only:
+        for link in ("queue", "socket"):
+            for kind in ("telemetry", "events"):
+                for batch in (1, 100):
+                    record("queue", bench_queue(kind, args.producers, args.messages, batch, link))
+    if "reset" in only:
+        for mode in modes:
+            for after_spawn in (False, True):
+                record("reset", bench_reset(mode, args.reset_size, after_spawn))
+    if "web" in only:
+        for variant in ("plain", "gzip", "etag"):
+            record("web", bench_web(variant, args.web_clients, args.web_seconds))
+
+    report = {
+        "commit": _git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.out}")
+
+    failed = False
+    for e in results.get("reset", ()):
+        if e["stalled"]:
+            print(f"STALLED    reset {e['mode']} {e['case']}: {e['reset_ms']:.0f} ms (LOCKSTEP_TIMEOUT reached)")
+            failed = True
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        if compare(base, report, args.tolerance):
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# checkpoint.py
+# Full simulation state saved every CHECKPOINT_EVERY_TICKS ticks, to resume after a crash:
+#  tick, grass, drought, every animal (kind, energy, active flag) and the env random streams.
+#
+# Env only copies its tables into a dict on the tick (flat arrays, see env.py); pickling,
+# compression and the write happen in a background thread. The file is replaced atomically
+# (temporary file + fsync + os.replace), so a crash mid-write leaves the previous checkpoint.
+#
+# File: 8-byte magic, then the zlib-compressed pickle of the state dict.
+
+import os
+import time
+import zlib
+import pickle
+import threading
+
+
+MAGIC = b"CLCKPT\x00\x01"
+
+PREY = 0
+PREDATOR = 1
+
+
+def save(path: str, state: dict):
+    data = MAGIC + zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 1)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(data)
+
+
+def load(path: str) -> dict:
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path}: not a checkpoint")
+    return pickle.loads(zlib.decompress(data[len(MAGIC):]))
+
+
+class Checkpointer:
+    """Writes checkpoints off the env tick; at most one write in flight, later ones are skipped meanwhile."""
+    def __init__(self, path: str):
+        self.path = path
+        self._thread = None
+        self.written = 0
+        self.skipped = 0
+        self.last = None   # (tick, bytes, seconds) of the last write
+        self.error = None
+
+    def busy(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(self, state: dict) -> bool:
+        if self.busy():
+            self.skipped += 1
+            return False
+        self._thread = threading.Thread(target=self._write, args=(state,), daemon=True)
+        self._thread.start()
+        return True
+
+    def _write(self, state: dict):
+        t0 = time.monotonic()
+        try:
+            size = save(self.path, state)
+            self.written += 1
+            self.last = (state["tick"], size, time.monotonic() - t0)
+        except Exception as e:
+            self.error = e
+
+    def wait(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,537 @@
+# cluster.py
+# Distributed env (config.ENGINE_MODE = "cluster"): the grid world (config.WORLD_SIZE) is cut into
+# vertical strips, one per shard; each shard is a vectorized engine (vector_engine.py) reached over TCP,
+# possibly on another host. env only coordinates, in lockstep:
+#  - every tick it sends each shard one frame: UI commands, drought, the animals that walked into its
+#    strip, the border preys of its two neighbours ("ghosts", huntable) and the ids of its preys that
+#    neighbours caught the tick before
+#  - each shard runs its tick, then answers with its counts, energy per unit, the animals that left
+#    its strip, its own border preys and the ghosts it caught
+#  - env merges the answers into one Snapshot for web_display and routes the rest for the next tick
+# A border kill reaches the prey's owner one tick later (a "die" message); a prey that moved on
+# in between escapes, its hunter is fed anyway.
+#
+# Frames: 8-byte header (json length, payload length), a json object, then raw 1-D arrays
+# described by its "arrays" entry ([name, dtype, length], in payload order). No pickle on the wire.
+#
+# Local stand-in (CLUSTER_NODES = None): env starts CLUSTER_LOCAL_SHARDS shard processes on 127.0.0.1.
+# Several hosts: on each one  `python3 cluster.py shard --listen 0.0.0.0:6001`, then
+# CLUSTER_NODES = ["host-a:6001", "host-b:6001"] on the env host (same config.py everywhere).
+
+import json
+import time
+import socket
+import signal
+import struct
+import argparse
+import multiprocessing
+
+import numpy as np
+
+import config
+import seeding
+from ipc import Snapshot
+from tick_metrics import TickMetrics
+from tick_log import TickLog
+from snapshot_log import SnapshotLogWriter
+from grid_world import GridWorld
+from vector_engine import VectorPopulation, PREY, PREDATOR
+from env import _log
+
+
+_FRAME = struct.Struct("<II")
+
+_OUTCOME = ("eaters", "eaten", "starving", "hunters", "kills",
+            "prey_births", "predator_births", "prey_deaths", "predator_deaths")
+
+
+# =======================
+# FRAMES
+# =======================
+
+def _send(sock, header: dict, arrays=None):
+    specs = []
+    payload = []
+    for name, a in (arrays or {}).items():
+        a = np.ascontiguousarray(a)
+        specs.append([name, a.dtype.str, int(a.shape[0])])
+        payload.append(a.tobytes())
+    head = json.dumps(dict(header, arrays=specs)).encode("utf-8")
+    body = b"".join(payload)
+    sock.sendall(_FRAME.pack(len(head), len(body)) + head + body)
+
+
+def _recv_exact(sock, n: int) -> bytearray:
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:])
+        if k == 0:
+            raise ConnectionError("cluster: connection closed")
+        got += k
+    return buf
+
+
+def _recv(sock):
+    """(header dict, {name: array}) of the next frame."""
+    head_len, body_len = _FRAME.unpack(_recv_exact(sock, _FRAME.size))
+    header = json.loads(_recv_exact(sock, head_len))
+    body = _recv_exact(sock, body_len)
+    arrays = {}
+    off = 0
+    for name, dtype, n in header.pop("arrays"):
+        dt = np.dtype(dtype)
+        arrays[name] = np.frombuffer(body, dtype=dt, count=n, offset=off)
+        off += n * dt.itemsize
+    return header, arrays
+
+
+def _animals(prefix: str, kind, energy, active, x, y) -> dict:
+    return {f"{prefix}kind": kind, f"{prefix}energy": energy, f"{prefix}active": active,
+            f"{prefix}x": x, f"{prefix}y": y}
+
+
+def _no_animals(prefix: str) -> dict:
+    f = np.zeros(0, dtype=np.float64)
+    return _animals(prefix, np.zeros(0, dtype=np.int8), f, np.zeros(0, dtype=bool), f, f)
+
+
+def _units(population, kind: int):
+    """Animals per energy unit (floor(energy)) of one kind: mergeable into exact percentiles / histogram."""
+    n = population.size
+    e = population.energy[:n][population.kind[:n] == kind]
+    return np.bincount(np.maximum(np.floor(e), 0).astype(np.int64)).astype(np.int64)
+
+
+# =======================
+# SHARD
+# =======================
+
+def _serve(conn):
+    """One coordinator session: hello, then one tick frame -> one result frame until "stop"."""
+    hello, _ = _recv(conn)
+    index, shards = int(hello["index"]), int(hello["shards"])
+    x0, x1 = int(hello["x0"]), int(hello["x1"])
+    width, height = (int(v) for v in hello["world"])
+    w = x1 - x0
+    mid = (x0 + x1) / 2.0
+    radius = float(config.WORLD_HUNT_RADIUS)
+    limits = {PREY: int(hello["max_preys"]), PREDATOR: int(hello["max_predators"])}
+
+    # a single shard owns the whole torus; otherwise the strip's left/right edges lead to the neighbours
+    world = GridWorld(w, height, wrap_x=shards == 1)
+    population = VectorPopulation(seed=hello["seed"], world=world)
+    drought = False
+
+    def room(kind: int, n: int) -> int:
+        return max(0, min(int(n), limits[kind] - population.count(kind)))
+
+    def to_local(gx):
+        # nearest copy of a global x around the strip (ghosts sit just outside it, across the wrap too)
+        return (gx - mid + width / 2.0) % width - width / 2.0 + (mid - x0)
+
+    while True:
+        header, a = _recv(conn)
+        if header["type"] == "stop":
+            return
+
+        for cmd in header["commands"]:
+            if cmd[0] == "reset":
+                population.clear()
+                world.fill(cmd[1])
+            elif cmd[0] == "spawn":
+                population.spawn(cmd[1], room(cmd[1], cmd[2]))
+            elif cmd[0] == "set_grass":
+                world.fill(cmd[1])
+        if header["drought"] and not drought:
+            world.grass *= 0.5
+        drought = bool(header["drought"])
+
+        population.kill(a["claims"])
+        population.admit(a["in_kind"], a["in_energy"], a["in_active"], (a["in_x"] - x0) % width, a["in_y"])
+        out = population.step(0, (to_local(a["ghost_x"]), a["ghost_y"]))
+        counts = {k: int(getattr(out, k)) for k in _OUTCOME}
+        counts["prey_births"] = room(PREY, out.prey_births)
+        counts["predator_births"] = room(PREDATOR, out.predator_births)
+        population.spawn(PREY, counts["prey_births"])
+        population.spawn(PREDATOR, counts["predator_births"])
+        world.grow(drought)
+
+        arrays = {}
+        if shards > 1:
+            # animals that stepped out of the strip, in global coordinates
+            n = population.size
+            lx = population.x[:n]
+            kind, energy, active, x, y = population.emigrate((lx < 0) | (lx >= w))
+            arrays.update(_animals("out_", kind, energy, active, (x + x0) % width, y))
+
+            # border preys, huntable by the neighbour on that side
+            n = population.size
+            lx = population.x[:n]
+            huntable = (population.kind[:n] == PREY) & population.active[:n]
+            for side, band in (("left_", lx < radius), ("right_", lx >= w - radius)):
+                rows = np.flatnonzero(huntable & band)
+                arrays[f"{side}x"] = (population.x[rows] + x0) % width
+                arrays[f"{side}y"] = population.y[rows]
+                arrays[f"{side}id"] = population.ids[rows]
+        else:
+            arrays.update(_no_animals("out_"))
+            for side in ("left_", "right_"):
+                arrays[f"{side}x"] = arrays[f"{side}y"] = np.zeros(0, dtype=np.float64)
+                arrays[f"{side}id"] = np.zeros(0, dtype=np.int64)
+
+        arrays["claim_owner"] = a["ghost_owner"][out.ghost_kills]
+        arrays["claim_id"] = a["ghost_id"][out.ghost_kills]
+        arrays["prey_units"] = _units(population, PREY)
+        arrays["predator_units"] = _units(population, PREDATOR)
+
+        stats = {}
+        for name, kind in (("prey", PREY), ("predator", PREDATOR)):
+            n = population.size
+            e = population.energy[:n][population.kind[:n] == kind]
+            stats[name] = [float(e.min()), float(e.sum()), float(e.max())] if e.size else [0.0, 0.0, 0.0]
+
+        _send(conn, {
+            "type": "result",
+            "tick": header["tick"],
+            "index": index,
+            "out": counts,
+            "preys": population.count(PREY),
+            "predators": population.count(PREDATOR),
+            "grass": world.total(),
+            "energy": stats,
+        }, arrays)
+
+
+def run_shard(host: str, port: int, ready=None, once: bool = False):
+    """Shard server on host:port (0 = any free port, reported on `ready`); one coordinator at a time."""
+    srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    srv.bind((host, port))
+    srv.listen(1)
+    if ready is not None:
+        ready.put(srv.getsockname()[1])
+    try:
+        while True:
+            conn, _ = srv.accept()
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            try:
+                _serve(conn)
+            except (ConnectionError, OSError):
+                pass
+            finally:
+                conn.close()
+            if once:
+                return
+    finally:
+        srv.close()
+
+
+# =======================
+# COORDINATOR
+# =======================
+
+def _connect(host: str, port: int, timeout: float):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            sock = socket.create_connection((host, port), timeout=timeout)
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.settimeout(timeout)
+    return sock
+
+
+def _merge_energy(results, name: str):
+    """((min, mean, max), percentiles, histogram) of one kind over every shard (EnergyStats definitions)."""
+    units = [r[1][f"{name}_units"] for r in results]
+    counts = np.zeros(max((u.size for u in units), default=0), dtype=np.int64)
+    for u in units:
+        counts[:u.size] += u
+    total = int(counts.sum())
+    qs = config.ENERGY_PERCENTILES
+    width, bins = float(config.ENERGY_HIST_WIDTH), int(config.ENERGY_HIST_BINS)
+    if total == 0:
+        return (0.0, 0.0, 0.0), tuple(0.0 for _ in qs), tuple(0 for _ in range(bins))
+
+    stats = [r[0]["energy"][name] for r in results if r[1][f"{name}_units"].sum()]
+    mn = min(s[0] for s in stats)
+    mx = max(s[2] for s in stats)
+    mean = sum(s[1] for s in stats) / total
+
+    cum = np.cumsum(counts)
+    pct = tuple(float(np.searchsorted(cum, min(total - 1, int(q * total)), side="right")) for q in qs)
+    idx = np.clip(np.floor(np.arange(counts.size) / width), 0, bins - 1).astype(np.int64)
+    hist = np.bincount(idx, weights=counts, minlength=bins)
+    return (mn, mean, mx), pct, tuple(int(c) for c in hist)
+
+
+def run_coordinator(shared_env, env_to_display, display_to_env, log_to_display, max_ticks=None, resume=None):
+    if not config.WORLD_SIZE:
+        raise ValueError("cluster mode needs config.WORLD_SIZE (the world is split between shards)")
+    width, height = (int(v) for v in config.WORLD_SIZE)
+
+    local = []   # shard processes of the local stand-in
+    if config.CLUSTER_NODES:
+        nodes = []
+        for node in config.CLUSTER_NODES:
+            host, port = node.rsplit(":", 1)
+            nodes.append((host, int(port)))
+    else:
+        ready = multiprocessing.Queue()
+        for i in range(int(config.CLUSTER_LOCAL_SHARDS)):
+            p = multiprocessing.Process(target=run_shard, args=("127.0.0.1", 0, ready, True),
+                                        daemon=True, name=f"SHARD-{i}")
+            p.start()
+            local.append(p)
+        nodes = [("127.0.0.1", ready.get(timeout=float(config.CLUSTER_TIMEOUT))) for _ in local]
+
+    shards = len(nodes)
+    if not 0 < shards <= width:
+        raise ValueError(f"cluster: {shards} shards for a world {width} cells wide")
+    bounds = [i * width // shards for i in range(shards + 1)]
+    cells = [(bounds[i + 1] - bounds[i]) * height for i in range(shards)]
+    rng = np.random.default_rng(seeding.np_seed("cluster"))
+
+    metrics = TickMetrics(config.METRICS_BUCKETS_MS)
+    ticklog = TickLog(lambda line: _log(log_to_display, line), config.LOG_LEVEL,
+                      config.LOG_SAMPLE_RATE, seeding.stream("log"))
+    snap_log = None
+    if config.SNAPSHOT_LOG_PATH:
+        snap_log = SnapshotLogWriter(config.SNAPSHOT_LOG_PATH, len(config.ENERGY_PERCENTILES),
+                                     int(config.ENERGY_HIST_BINS))
+
+    commands = [[] for _ in range(shards)]
+
+    def split(total: int):
+        """`total` grass units in proportion to the cells of each strip."""
+        return [total * c / (width * height) for c in cells]
+
+    def reset_to_initial():
+        shared_env.set_initial(grass=int(config.INITIAL_GRASS), drought=False)
+        for i, g in enumerate(split(int(config.INITIAL_GRASS))):
+            commands[i] = [["reset", g]]
+        _log(log_to_display, f"🔄 Reset environment (0 prey, 0 predator, {shards} shards)")
+
+    def spawn(kind: int, n: int):
+        # spread uniformly over the world; each shard caps them at its share of the limits
+        for i, k in enumerate(rng.multinomial(max(0, n), [c / (width * height) for c in cells])):
+            if k:
+                commands[i].append(["spawn", kind, int(k)])
+
+    def drought_signal_handler(signum, frame):
+        with shared_env.lock:
+            shared_env.drought.value = not bool(shared_env.drought.value)
+            now = bool(shared_env.drought.value)
+        _log(log_to_display, f"🌵 Drought toggled by SIGNAL (drought={now})")
+
+    # routed to each shard with its next tick frame
+    empty_i64 = np.zeros(0, dtype=np.int64)
+    empty_f64 = np.zeros(0, dtype=np.float64)
+    incoming = [_no_animals("in_") for _ in range(shards)]
+    ghosts = [{"ghost_x": empty_f64, "ghost_y": empty_f64, "ghost_owner": empty_i64, "ghost_id": empty_i64}
+              for _ in range(shards)]
+    claims = [empty_i64] * shards
+
+    links = []
+    try:
+        signal.signal(signal.SIGUSR1, drought_signal_handler)
+        if resume or config.CHECKPOINT_PATH:
+            _log(log_to_display, "💾 Checkpoints are not supported in cluster mode")
+
+        for i, (host, port) in enumerate(nodes):
+            sock = _connect(host, port, float(config.CLUSTER_TIMEOUT))
+            links.append(sock)
+            _send(sock, {
+                "type": "hello",
+                "index": i,
+                "shards": shards,
+                "x0": bounds[i],
+                "x1": bounds[i + 1],
+                "world": [width, height],
+                "seed": seeding.np_seed("cluster", i),
+                "max_preys": int(config.CLUSTER_MAX_PREYS) // shards,
+                "max_predators": int(config.CLUSTER_MAX_PREDATORS) // shards,
+            })
+        _log(log_to_display, "🕸️ Cluster: " + ", ".join(f"{h}:{p}" for h, p in nodes))
+
+        reset_to_initial()
+        tick = 0
+        while shared_env.running.value:
+            tick_start = time.monotonic()
+            metrics.start()
+            with shared_env.lock:
+                shared_env.tick.value = tick
+
+            # ---- UI commands ----
+            while not display_to_env.empty():
+                cmd = display_to_env.get_nowait()
+                if cmd.cmd == "quit":
+                    with shared_env.lock:
+                        shared_env.running.value = False
+                elif cmd.cmd == "reset":
+                    reset_to_initial()
+                elif cmd.cmd == "trigger_drought":
+                    drought_signal_handler(signal.SIGUSR1, None)
+                elif cmd.cmd == "add_prey":
+                    n = int(cmd.args.get("value", 1))
+                    spawn(PREY, n)
+                    _log(log_to_display, f"🐇 +{n} prey")
+                elif cmd.cmd == "add_predator":
+                    n = int(cmd.args.get("value", 1))
+                    spawn(PREDATOR, n)
+                    _log(log_to_display, f"🦁 +{n} predator")
+                elif cmd.cmd == "set_grass":
+                    val = max(0, min(int(float(cmd.args.get("value", 0))), int(config.MAX_GRASS)))
+                    for i, g in enumerate(split(val)):
+                        commands[i].append(["set_grass", g])
+                    _log(log_to_display, f"🌿 Grass set to {val}")
+                elif cmd.cmd == "set_log_level":
+                    try:
+                        ticklog.set_level(str(cmd.args.get("value", "")), cmd.args.get("sample"))
+                        _log(log_to_display, f"📝 Log level: {ticklog.level} (sample {ticklog.sample_rate:g})")
+                    except (TypeError, ValueError) as e:
+                        _log(log_to_display, f"📝 {e}")
+            metrics.lap("commands")
+
+            # ---- Shards: one frame out, one frame back each ----
+            drought = bool(shared_env.drought.value)
+            for i, sock in enumerate(links):
+                _send(sock, {"type": "tick", "tick": tick, "drought": drought, "commands": commands[i]},
+                      dict(incoming[i], claims=claims[i], **ghosts[i]))
+                commands[i] = []
+            results = [_recv(sock) for sock in links]
+            metrics.lap("engine")
+
+            # ---- Routing for the next tick ----
+            out_x = np.concatenate([a["out_x"] for _h, a in results])
+            owner = np.searchsorted(bounds, out_x, side="right") - 1
+            cols = {k: np.concatenate([a[f"out_{k}"] for _h, a in results])
+                    for k in ("kind", "energy", "active", "x", "y")}
+            incoming = [_animals("in_", *(cols[k][owner == i] for k in ("kind", "energy", "active", "x", "y")))
+                        for i in range(shards)]
+
+            parts = [[] for _ in range(shards)]
+            for i, (_h, a) in enumerate(results):
+                for side, j in (("left_", (i - 1) % shards), ("right_", (i + 1) % shards)):
+                    if shards > 1:
+                        parts[j].append((a[f"{side}x"], a[f"{side}y"], np.full(a[f"{side}id"].size, i),
+                                         a[f"{side}id"]))
+            ghosts = []
+            for p in parts:
+                if p:
+                    gx, gy, go, gid = (np.concatenate(c) for c in zip(*p))
+                else:
+                    gx, gy, go, gid = empty_f64, empty_f64, empty_i64, empty_i64
+                ghosts.append({"ghost_x": gx, "ghost_y": gy, "ghost_owner": go.astype(np.int64), "ghost_id": gid})
+
+            claim_owner = np.concatenate([a["claim_owner"] for _h, a in results])
+            claim_id = np.concatenate([a["claim_id"] for _h, a in results])
+            claims = [claim_id[claim_owner == i] for i in range(shards)]
+
+            # ---- Merge ----
+            c = {k: sum(h["out"][k] for h, _a in results) for k in _OUTCOME}
+            if c["eaters"]:
+                ticklog.event("🐇 {} preys eat {} grass ({} without grass)", c["eaters"], c["eaten"], c["starving"],
+                              eaters=c["eaters"], grass=c["eaten"], starving=c["starving"])
+            if c["hunters"]:
+                ticklog.event("🦁 {} predators hunt, {} preys eaten", c["hunters"], c["kills"],
+                              hunts=c["hunters"], kills=c["kills"])
+            if c["prey_deaths"] or c["predator_deaths"]:
+                ticklog.event("☠️ {} prey / {} predator dead", c["prey_deaths"], c["predator_deaths"],
+                              prey_deaths=c["prey_deaths"], predator_deaths=c["predator_deaths"])
+            if c["prey_births"]:
+                ticklog.event("🐇 Reproduction: +{} prey", c["prey_births"], prey_births=c["prey_births"])
+            if c["predator_births"]:
+                ticklog.event("🦁 Reproduction: +{} predator", c["predator_births"],
+                              predator_births=c["predator_births"])
+            ticklog.flush(tick)
+
+            # animals in transit are counted with the shard they are going to
+            moving = [int(np.count_nonzero(cols["kind"] == k)) for k in (PREY, PREDATOR)]
+            with shared_env.lock:
+                shared_env.preys.value = sum(h["preys"] for h, _a in results) + moving[0]
+                shared_env.predators.value = sum(h["predators"] for h, _a in results) + moving[1]
+                shared_env.grass.value = sum(h["grass"] for h, _a in results)
+                predators_n = int(shared_env.predators.value)
+                preys_n = int(shared_env.preys.value)
+                grass_n = int(shared_env.grass.value)
+
+            prey_stats, prey_pct, prey_hist = _merge_energy(results, "prey")
+            pred_stats, pred_pct, pred_hist = _merge_energy(results, "predator")
+            snapshot = Snapshot(
+                tick=tick,
+                predators=predators_n,
+                preys=preys_n,
+                grass=grass_n,
+                drought=drought,
+                prey_energy_stats=prey_stats,
+                predator_energy_stats=pred_stats,
+                prey_probs=(config.PREY_EAT_PROB, config.PREY_REPRO_PROB),
+                pred_probs=(config.PRED_HUNT_PROB, config.PRED_REPRO_PROB),
+                prey_energy_pct=prey_pct,
+                predator_energy_pct=pred_pct,
+                prey_energy_hist=prey_hist,
+                predator_energy_hist=pred_hist,
+            )
+            env_to_display.put(snapshot)
+            if snap_log is not None:
+                snap_log.append(snapshot)
+            metrics.lap("snapshot")
+
+            metrics.end_tick(float(config.TICK_DURATION))
+            if config.METRICS_EVERY_TICKS and (tick + 1) % int(config.METRICS_EVERY_TICKS) == 0:
+                env_to_display.put(metrics.report(tick))
+
+            tick += 1
+            if max_ticks is not None and tick >= max_ticks:
+                break
+            if not (config.TICK_MODE == "lockstep" and config.LOCKSTEP_MAX_SPEED):
+                time.sleep(max(0.0, config.TICK_DURATION - (time.monotonic() - tick_start)))
+
+    except (ConnectionError, OSError) as e:
+        _log(log_to_display, f"🕸️ Cluster stopped: shard lost ({e!r})")
+
+    finally:
+        try:
+            with shared_env.lock:
+                shared_env.running.value = False
+        except Exception:
+            pass
+
+        for sock in links:
+            try:
+                _send(sock, {"type": "stop"})
+                sock.close()
+            except OSError:
+                pass
+        for p in local:
+            p.join(2)
+            if p.is_alive():
+                p.terminate()
+        if snap_log is not None:
+            snap_log.close()
+
+        _log(log_to_display, "🛑 ENV stopped")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Cluster shard server (config.ENGINE_MODE = \"cluster\").")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sp = sub.add_parser("shard", help="serve one strip of the world to a coordinator")
+    sp.add_argument("--listen", default="0.0.0.0:6001", metavar="HOST:PORT")
+    sp.add_argument("--once", action="store_true", help="exit after the first coordinator session")
+    args = ap.parse_args(argv)
+
+    host, port = args.listen.rsplit(":", 1)
+    print(f"Shard listening on {host}:{port}")
+    run_shard(host, int(port), once=args.once)
+
+
+if __name__ == "__main__":
+    main()
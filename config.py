@@ -1,10 +1,49 @@
 # config.py
 
+import os
+import json
+
 # Simulation timing
-import random
+TICK_DURATION = 1  # second
 
+# Tick scheduling (tick_sync.py)
+# "realtime" : env and every animal sleep TICK_DURATION on their own
+# "lockstep" : env publishes each tick, every animal acts exactly once and acks
+TICK_MODE = "realtime"
+LOCKSTEP_MAX_SPEED = False   # lockstep: never sleep, next tick as soon as all acks are in
+LOCKSTEP_TIMEOUT = 5.0       # seconds env waits for missing acks / messages before moving on
 
-TICK_DURATION = 1  # second
+# Engine
+# "process"    : one OS process per animal (run_prey / run_predator)
+# "vectorized" : every animal lives in NumPy arrays inside env (vector_engine.py)
+# "sharded"    : animals hosted by a pool of worker processes (agent_pool.py)
+# "cluster"    : vectorized shards reached over TCP, one strip of the grid world each (cluster.py)
+ENGINE_MODE = "process"
+
+# Sharded mode: number of worker processes (None -> CPU count)
+SHARD_WORKERS = None
+
+# Process mode: pre-started idle animal processes used for births (0 = cold spawn)
+WARM_POOL_SIZE = 0
+
+# Agent -> env telemetry (process and sharded modes)
+# "queue" : one pickled message per animal and per tick on energies_to_env
+# "shm"   : fixed slot per animal in shared memory, death flag included (shm_slots.py)
+TELEMETRY_TRANSPORT = "queue"
+
+# Env -> agent control: die / grass_grant / hunt_result (process and sharded modes)
+# "queue" : one multiprocessing.Queue per animal (or per shard)
+# "shm"   : mailbox in shared memory indexed by the animal's slot, polled every tick
+CONTROL_TRANSPORT = "queue"
+
+# Agent <-> env link (animal processes, pooled processes, shard workers; agent_link.py)
+# "queue"  : multiprocessing queues, plus a throwaway "join" connection to ENV_HOST:ENV_PORT
+# "socket" : one persistent connection per process to ENV_HOST:ENV_PORT, binary frames both ways,
+#            all served by one asyncio loop in env (the "shm" transports above still take precedence)
+AGENT_LINK = "queue"
+
+# Number of shared-memory slots (max live animals using the "shm" transports)
+SHM_SLOTS = 65536
 
 # Environment
 ENV_HOST = "127.0.0.1"
@@ -17,6 +56,19 @@ MAX_PREYS = 200
 MAX_PREDATORS = 80
 MAX_GRASS = 5000
 
+# Limits in vectorized mode (no process per animal)
+VECTOR_MAX_PREYS = 200_000
+VECTOR_MAX_PREDATORS = 80_000
+
+# Limits in sharded mode
+SHARDED_MAX_PREYS = 50_000
+SHARDED_MAX_PREDATORS = 20_000
+
+# Run-level random seed (seeding.py): every animal and engine gets its own stream derived from it
+# None -> fresh randomness each run; with a seed, lockstep runs give identical Snapshot sequences
+# (process mode: only with CONTROL_TRANSPORT = "shm", queue messages may arrive a tick late)
+SEED = None
+
 # Initial state
 INITIAL_GRASS = 2000
 
@@ -25,8 +77,8 @@ H_ENERGY = 30         # active threshold
 R_ENERGY = 60         # reproduction threshold
 
 # Energy dynamics
-PREY_INITIAL_ENERGY = random.randint(30, 60)
-PREDATOR_INITIAL_ENERGY = random.randint(30, 60)
+INITIAL_ENERGY_MIN = 30
+INITIAL_ENERGY_MAX = 60    # each animal draws its initial energy from its own stream (seeding.py)
 
 PREY_ENERGY_DECAY = 2
 PREDATOR_ENERGY_DECAY = 1
@@ -43,6 +95,9 @@ PREY_MIN_EAT = 1
 # Grass dynamics
 GRASS_GROWTH_PER_TICK = 50
 DROUGHT_GRASS_FACTOR = 0.1         # during drought, growth is reduced
+# Sharing of the grass when a tick's requests exceed what is left (grass.py):
+# "fifo" (order of the requests) | "random" | "proportional" (same fraction for everyone)
+GRASS_POLICY = "fifo"
 
 # Decision probabilities
 PREY_EAT_PROB = 0.8
@@ -50,3 +105,66 @@ PREY_REPRO_PROB = 0.5
 
 PRED_HUNT_PROB = 0.6
 PRED_REPRO_PROB = 0.5
+
+# Energy distribution in each Snapshot (energy_stats.py)
+ENERGY_PERCENTILES = (0.1, 0.5, 0.9)
+ENERGY_HIST_WIDTH = 10
+ENERGY_HIST_BINS = 16              # last bin: everything above
+
+# Tick instrumentation (tick_metrics.py): report sent to the display every N ticks (0 = never)
+METRICS_EVERY_TICKS = 10
+METRICS_BUCKETS_MS = (0.1, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Display: log lines kept by web_display (/api/logs?since=N, /api/stream)
+LOG_RETENTION = 200
+
+# Env -> display channels (main.py)
+# "queue" : multiprocessing queues, every snapshot and log line kept until the display takes it
+# "shm"   : latest snapshot / metrics report in a shared-memory slot, log lines in a bounded ring
+#           that drops the oldest (display_channel.py): memory stays flat if the display stalls
+DISPLAY_TRANSPORT = "shm"
+DISPLAY_SLOT_BYTES = 65536       # max pickled size of one snapshot / metrics report
+DISPLAY_LOG_LINES = 1024
+DISPLAY_LOG_LINE_BYTES = 256     # longer lines are cut
+
+# Display: snapshots kept for /api/history (history.py) and max buckets returned per query
+HISTORY_TICKS = 10000
+HISTORY_MAX_POINTS = 1000
+
+# Env: file receiving every Snapshot of the run (snapshot_log.py, overwritten at start; None = off)
+SNAPSHOT_LOG_PATH = None
+
+# Env: full state saved every N ticks (checkpoint.py, written off the tick; None = off).
+# Resume with: python3 main.py --resume <file>
+CHECKPOINT_PATH = None
+CHECKPOINT_EVERY_TICKS = 100
+
+# Env log lines about animals (tick_log.py), changeable at runtime from the UI:
+# "events" (one line per eat/hunt/birth/death) | "summary" (one line per tick + sampled events) | "quiet"
+LOG_LEVEL = "events"
+LOG_SAMPLE_RATE = 0.01             # fraction of individual event lines still sent in "summary"
+
+# Grid world (vectorized engine only): None = one global grass stock, no positions.
+# (width, height) in cells: grass grows per cell, animals move on a torus, a prey eats from its own cell
+# and a predator only catches preys within WORLD_HUNT_RADIUS. 20 x 20 x 12.5 = MAX_GRASS.
+WORLD_SIZE = None                    # e.g. (20, 20)
+WORLD_CELL_MAX_GRASS = 12.5
+WORLD_GRASS_GROWTH_PER_CELL = 0.125  # GRASS_GROWTH_PER_TICK spread over 20 x 20 cells (x DROUGHT_GRASS_FACTOR in drought)
+WORLD_MOVE_STEP = 1.0                # max move per tick on each axis, in cells
+WORLD_HUNT_RADIUS = 3.0              # in cells
+
+# Cluster mode (needs WORLD_SIZE): env only coordinates the shards, in lockstep.
+# None -> CLUSTER_LOCAL_SHARDS shard processes started on 127.0.0.1 (local stand-in);
+# ["host:port", ...] -> shards started on those hosts with `python3 cluster.py shard --listen HOST:PORT`
+CLUSTER_NODES = None
+CLUSTER_LOCAL_SHARDS = 2
+CLUSTER_TIMEOUT = 30.0            # seconds to reach a shard / to wait for its answer to a tick
+CLUSTER_MAX_PREYS = 200_000       # whole cluster, split evenly between shards
+CLUSTER_MAX_PREDATORS = 80_000
+
+# Overrides for headless runs (bench.py): JSON object {"NAME": value} in this environment variable.
+# Environment variables are inherited, so every spawned child process sees the same values.
+CONFIG_OVERRIDES_ENV = "CIRCLE_CONFIG"
+_overrides = os.environ.get(CONFIG_OVERRIDES_ENV)
+if _overrides:
+    globals().update(json.loads(_overrides))
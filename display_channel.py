@@ -0,0 +1,262 @@
+# display_channel.py
+# Env -> display channels in shared memory (config.DISPLAY_TRANSPORT = "shm"), instead of
+# unbounded queues that keep growing while the display is stalled:
+#  - LatestSlot: one value (pickled) behind a seqlock; the writer overwrites it, readers copy it
+#    and retry if a write went through meanwhile. Nobody waits for the other side.
+#  - StateChannel: env_to_display. Latest Snapshot and latest MetricsReport, each in its slot:
+#    the display always gets the current tick, ticks it had no time for are skipped (counted)
+#  - LogChannel: log_to_display. Bounded ring of log lines; when the display lags by more than
+#    the ring, the oldest lines are overwritten and counted as dropped
+# Both have the Queue interface their side uses (put / put_nowait for env, blocking get for the
+# display), so env, cluster.py and web_display do not know which transport they are given.
+#
+# Created by main.py (owner, unlinks at exit) and handed to env and the display as Process args.
+
+import atexit
+import pickle
+import struct
+import multiprocessing
+from multiprocessing import shared_memory
+
+from ipc import MetricsReport
+
+
+def _attach(name: str):
+    return shared_memory.SharedMemory(name=name)
+
+
+class LatestSlot:
+    """
+    Layout: seq u64 | length u32 | pad u32 | data[capacity]
+    seq is odd while the (single) writer is inside write(); a reader that saw it change while
+    copying copies again.
+    """
+    def __init__(self, capacity: int, name=None):
+        self.capacity = int(capacity)
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=16 + self.capacity)
+            self.owner = True
+        else:
+            self.shm = _attach(name)
+            self.owner = False
+        self._views()
+        if self.owner:
+            self.header[0] = 0
+            self.header[1] = 0
+
+    def _views(self):
+        buf = self.shm.buf
+        self.header = buf[0:16].cast("Q")
+        self.data = buf[16:16 + self.capacity]
+
+    def __getstate__(self):
+        return {"capacity": self.capacity, "name": self.shm.name}
+
+    def __setstate__(self, state):
+        self.capacity = state["capacity"]
+        self.shm = _attach(state["name"])
+        self.owner = False
+        self._views()
+        # views must be released before SharedMemory.__del__ closes the mapping
+        atexit.register(self.close)
+
+    def write(self, data: bytes) -> bool:
+        """False (nothing written) if `data` does not fit."""
+        n = len(data)
+        if n > self.capacity:
+            return False
+        seq = self.header[0]
+        self.header[0] = seq + 1   # odd: write in progress
+        self.data[:n] = data
+        self.header[1] = n
+        self.header[0] = seq + 2
+        return True
+
+    def read(self, seen: int = 0):
+        """(seq, bytes) of the current value, None if nothing newer than `seen` was written."""
+        while True:
+            seq = self.header[0]
+            if seq == seen or seq == 0 or seq & 1:
+                # nothing new, or a write in progress (its put() wakes the reader again)
+                return None
+            n = self.header[1]
+            data = bytes(self.data[:n]) if n <= self.capacity else b""
+            if self.header[0] == seq:
+                return seq, data
+
+    def close(self):
+        if self.shm is None:
+            return
+        self.header.release()
+        self.data.release()
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except Exception:
+                pass
+        self.shm = None
+
+
+class StateChannel:
+    """env_to_display: put() on the env side, get() (blocking) on the display side."""
+    def __init__(self, slot_bytes: int, poll: float = 0.5):
+        self.snapshot = LatestSlot(slot_bytes)
+        self.metrics = LatestSlot(slot_bytes)
+        self.changed = multiprocessing.Event()
+        self.poll = float(poll)
+        self.too_big = 0   # env side: values larger than slot_bytes (not sent)
+        self._seen_snapshot = 0
+        self._seen_metrics = 0
+        self.skipped = 0   # display side: snapshots overwritten before they were read
+
+    def __getstate__(self):
+        return {"snapshot": self.snapshot, "metrics": self.metrics, "changed": self.changed, "poll": self.poll}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.too_big = 0
+        self._seen_snapshot = 0
+        self._seen_metrics = 0
+        self.skipped = 0
+
+    # ---- env side ----
+    def put(self, obj, block=True, timeout=None):
+        slot = self.metrics if isinstance(obj, MetricsReport) else self.snapshot
+        if not slot.write(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)):
+            self.too_big += 1
+            return
+        self.changed.set()
+
+    put_nowait = put
+
+    # ---- display side ----
+    def _take(self):
+        # metrics first: they are rarer and a snapshot always follows
+        got = self.metrics.read(self._seen_metrics)
+        if got is not None:
+            self._seen_metrics = got[0]
+            return pickle.loads(got[1])
+        got = self.snapshot.read(self._seen_snapshot)
+        if got is not None:
+            if self._seen_snapshot:
+                self.skipped += (got[0] - self._seen_snapshot) // 2 - 1
+            self._seen_snapshot = got[0]
+            return pickle.loads(got[1])
+        return None
+
+    def get(self, block=True, timeout=None):
+        while True:
+            # cleared before looking, so a put() that lands after the look wakes the wait below
+            self.changed.clear()
+            obj = self._take()
+            if obj is not None:
+                return obj
+            self.changed.wait(self.poll)
+
+    def close(self):
+        self.snapshot.close()
+        self.metrics.close()
+
+
+class LogChannel:
+    """
+    log_to_display as a bounded ring. Layout:
+      head u64 (lines written) | dropped u64 | entries (seq u64 | length u32 | pad u32 | utf-8[line_bytes])[cap]
+    An entry's seq is the number of its line (from 1), zeroed while the line is being written.
+    Writers serialize on a lock; the single reader never locks: a line it finds renumbered after
+    copying it was overwritten, and is counted as dropped like the ones it never saw.
+    """
+    _ENTRY = struct.Struct("<QII")
+
+    def __init__(self, capacity: int, line_bytes: int, poll: float = 0.5, name=None, lock=None, changed=None):
+        self.capacity = int(capacity)
+        self.line_bytes = int(line_bytes)
+        self.entry_size = self._ENTRY.size + self.line_bytes
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=16 + self.capacity * self.entry_size)
+            self.owner = True
+        else:
+            self.shm = _attach(name)
+            self.owner = False
+        self.lock = lock or multiprocessing.Lock()
+        self.changed = changed or multiprocessing.Event()
+        self.poll = float(poll)
+        self.next = 0   # reader: lines consumed (or dropped) so far
+        self._views()
+        if self.owner:
+            self.header[0] = 0
+            self.header[1] = 0
+
+    def _views(self):
+        buf = self.shm.buf
+        self.header = buf[0:16].cast("Q")
+        self.entries = buf[16:16 + self.capacity * self.entry_size]
+
+    def __getstate__(self):
+        return {"capacity": self.capacity, "line_bytes": self.line_bytes, "name": self.shm.name,
+                "lock": self.lock, "changed": self.changed, "poll": self.poll}
+
+    def __setstate__(self, state):
+        self.__init__(state["capacity"], state["line_bytes"], state["poll"],
+                      name=state["name"], lock=state["lock"], changed=state["changed"])
+        atexit.register(self.close)
+
+    @property
+    def dropped(self) -> int:
+        return self.header[1]
+
+    # ---- env side ----
+    def put(self, line, block=True, timeout=None):
+        data = str(line).encode("utf-8")[:self.line_bytes]
+        with self.lock:
+            head = self.header[0]
+            off = (head % self.capacity) * self.entry_size
+            self._ENTRY.pack_into(self.entries, off, 0, len(data), 0)
+            self.entries[off + self._ENTRY.size:off + self._ENTRY.size + len(data)] = data
+            self._ENTRY.pack_into(self.entries, off, head + 1, len(data), 0)
+            self.header[0] = head + 1   # publish after the entry is written
+        self.changed.set()
+
+    put_nowait = put
+
+    # ---- display side ----
+    def _take(self):
+        while True:
+            head = self.header[0]
+            if self.next >= head:
+                return None
+            if head - self.next > self.capacity:
+                # overwritten before we got to them
+                self.header[1] += head - self.capacity - self.next
+                self.next = head - self.capacity
+            off = (self.next % self.capacity) * self.entry_size
+            seq, n, _ = self._ENTRY.unpack_from(self.entries, off)
+            data = bytes(self.entries[off + self._ENTRY.size:off + self._ENTRY.size + min(n, self.line_bytes)])
+            again, _, _ = self._ENTRY.unpack_from(self.entries, off)
+            self.next += 1
+            if seq == again == self.next:
+                # a line cut inside a multi-byte character loses that character
+                return data.decode("utf-8", errors="ignore")
+            self.header[1] += 1
+
+    def get(self, block=True, timeout=None):
+        while True:
+            self.changed.clear()
+            line = self._take()
+            if line is not None:
+                return line
+            self.changed.wait(self.poll)
+
+    def close(self):
+        if self.shm is None:
+            return
+        self.header.release()
+        self.entries.release()
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except Exception:
+                pass
+        self.shm = None
@@ -0,0 +1,163 @@
+# energy_stats.py
+# Energy statistics of a population kept up to date message by message (telemetry, deaths),
+# instead of rebuilding a list of every energy each tick:
+#  - running sum / count                          -> mean in O(1)
+#  - one bucket per energy unit (floor(energy)), updated in place, and the sorted list of
+#    non-empty units                              -> O(1) per message (O(distinct units) when a
+#                                                    bucket appears or empties)
+#  - min / max: each bucket keeps its own (value, how many members hold it), updated with the
+#    bucket; a bucket rescans its members only when the last one holding its min (max) leaves,
+#    and only if that bucket is the lowest (highest) when a Snapshot is built. Process-mode
+#    energies are whole numbers, so a bucket's members all hold its min and max: no rescans
+#  - percentiles and histogram from the bucket sizes, in O(distinct units)
+# The work per tick follows the messages received, not the population: an animal whose
+# energy did not change sends nothing (or set() returns at once). Energy decay does change
+# every living animal each tick, so in process mode that is still one update per animal, at
+# the cost of a dict write instead of a list rebuild.
+
+import math
+import bisect
+
+
+class EnergyStats:
+    def __init__(self):
+        self.values = {}    # id -> energy
+        self.total = 0.0
+        self.buckets = {}   # floor(energy) -> {id: energy}
+        self._units = []    # sorted keys of the non-empty buckets
+        self._low = {}      # unit -> (min of the bucket, members holding it); None = to rescan
+        self._high = {}     # unit -> (max, members holding it); None = to rescan
+        self._changes = 0   # since the running sum was last recomputed
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, key):
+        return key in self.values
+
+    def clear(self):
+        self.values.clear()
+        self.total = 0.0
+        self.buckets.clear()
+        self._units.clear()
+        self._low.clear()
+        self._high.clear()
+        self._changes = 0
+
+    def _enter(self, u: int, e: float):
+        """Bucket extremes after `e` joined bucket `u`."""
+        low = self._low[u]
+        if low is not None:
+            if e < low[0]:
+                self._low[u] = (e, 1)
+            elif e == low[0]:
+                self._low[u] = (e, low[1] + 1)
+        high = self._high[u]
+        if high is not None:
+            if e > high[0]:
+                self._high[u] = (e, 1)
+            elif e == high[0]:
+                self._high[u] = (e, high[1] + 1)
+
+    def _leave(self, u: int, e: float):
+        """Bucket extremes after `e` left bucket `u` (still non-empty)."""
+        low = self._low[u]
+        if low is not None and e == low[0]:
+            self._low[u] = (e, low[1] - 1) if low[1] > 1 else None
+        high = self._high[u]
+        if high is not None and e == high[0]:
+            self._high[u] = (e, high[1] - 1) if high[1] > 1 else None
+
+    def _forget(self, key, e: float):
+        self.total -= e
+        u = math.floor(e)
+        bucket = self.buckets[u]
+        del bucket[key]
+        if bucket:
+            self._leave(u, e)
+        else:
+            del self.buckets[u]
+            del self._low[u]
+            del self._high[u]
+            del self._units[bisect.bisect_left(self._units, u)]
+
+    def _add(self, key, e: float):
+        self.total += e
+        u = math.floor(e)
+        bucket = self.buckets.get(u)
+        if bucket is None:
+            self.buckets[u] = {key: e}
+            self._low[u] = self._high[u] = (e, 1)
+            bisect.insort(self._units, u)
+        else:
+            bucket[key] = e
+            self._enter(u, e)
+
+    def set(self, key, e: float):
+        e = float(e)
+        old = self.values.get(key)
+        if old == e:
+            return
+        self.values[key] = e
+        if old is not None and math.floor(old) == math.floor(e):
+            # same bucket (the usual case for a tick of decay): update in place
+            u = math.floor(e)
+            self.buckets[u][key] = e
+            self._leave(u, old)
+            self._enter(u, e)
+            self.total += e - old
+        else:
+            if old is not None:
+                self._forget(key, old)
+            self._add(key, e)
+        self._changes += 1
+        if self._changes > 4 * len(self.values) + 64:
+            # float drift of the running sum, amortized O(1) per change
+            self.total = math.fsum(self.values.values())
+            self._changes = 0
+
+    def remove(self, key):
+        old = self.values.pop(key, None)
+        if old is not None:
+            self._forget(key, old)
+            if not self.values:
+                self.clear()
+
+    def _extreme(self, u: int, table: dict, pick) -> float:
+        got = table[u]
+        if got is None:
+            values = self.buckets[u].values()
+            e = pick(values)
+            got = table[u] = (e, sum(1 for v in values if v == e))
+        return got[0]
+
+    def stats(self):
+        """(min, mean, max), (0, 0, 0) when empty."""
+        if not self.values:
+            return (0.0, 0.0, 0.0)
+        low = self._extreme(self._units[0], self._low, min)
+        high = self._extreme(self._units[-1], self._high, max)
+        return (low, self.total / len(self.values), high)
+
+    def percentiles(self, qs):
+        """Energy below which a fraction q of the population lies, to the energy unit."""
+        n = len(self.values)
+        if not n:
+            return tuple(0.0 for _ in qs)
+        out = []
+        for q in qs:
+            rank = min(n - 1, int(q * n))
+            seen = 0
+            for u in self._units:
+                seen += len(self.buckets[u])
+                if seen > rank:
+                    out.append(float(u))
+                    break
+        return tuple(out)
+
+    def histogram(self, width: float, bins: int):
+        """Counts in [0, w), [w, 2w), ...; the last bin takes everything above, the first anything below 0."""
+        hist = [0] * bins
+        for u, bucket in self.buckets.items():
+            hist[max(0, min(bins - 1, int(u // width)))] += len(bucket)
+        return tuple(hist)
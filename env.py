@@ -7,17 +7,76 @@ import threading
 import multiprocessing
 import random
 import signal
+import collections
+import itertools
+from array import array
 
 import config
+import seeding
 from ipc import Snapshot
+from tick_metrics import TickMetrics
+from tick_log import TickLog
+from snapshot_log import SnapshotLogWriter
+import checkpoint
+from energy_stats import EnergyStats
+from grass import allocate_grass
 from prey import run_prey
 from predator import run_predator
+from agent_pool import ShardPool
+from warm_pool import WarmPool
+from agent_link import AgentServer
+from shm_slots import (TelemetryTable, SlotAllocator, SlotWriter,
+                       ControlMailbox, MailboxWriter, MailboxReader)
 
 
-def _energy_stats(values):
-    if not values:
-        return (0.0, 0.0, 0.0)
-    return (float(min(values)), float(sum(values) / len(values)), float(max(values)))
+def _percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    i = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return float(sorted_values[i])
+
+
+class _RandomSet:
+    """Set with O(1) add, discard and uniform random pop (list + position index, swap-remove)."""
+    def __init__(self):
+        self.items = []
+        self.pos = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, x):
+        return x in self.pos
+
+    def add(self, x):
+        if x not in self.pos:
+            self.pos[x] = len(self.items)
+            self.items.append(x)
+
+    def discard(self, x):
+        i = self.pos.pop(x, None)
+        if i is None:
+            return
+        last = self.items.pop()
+        if i < len(self.items):
+            self.items[i] = last
+            self.pos[last] = i
+
+    def pop_random(self, rng):
+        if not self.items:
+            return None
+        x = self.items[rng.randrange(len(self.items))]
+        self.discard(x)
+        return x
+
+    def clear(self):
+        self.items.clear()
+        self.pos.clear()
+
+
+def _msg_count(msg) -> int:
+    """Messages carried by one queue message (a batch holds several)."""
+    return len(msg[1]) if msg[0] == "batch" else 1
 
 
 def _log(log_to_display, msg: str):
@@ -28,35 +87,146 @@ def _log(log_to_display, msg: str):
         pass
 
 
+class NoLog:
+    """log_to_display for headless runs (bench.py, sweep.py): log lines are dropped."""
+    def put_nowait(self, line):
+        pass
+
+
 def run_env(shared_env, env_to_display, display_to_env,
-            energies_to_env, events_to_env, log_to_display):
+            energies_to_env, events_to_env, log_to_display, max_ticks=None, resume=None):
+
+    if config.ENGINE_MODE == "cluster":
+        # the animals live in shard processes reached over TCP; this process only coordinates them
+        from cluster import run_coordinator
+        return run_coordinator(shared_env, env_to_display, display_to_env, log_to_display, max_ticks, resume)
 
     server_socket = None
+    # AGENT_LINK = "socket": persistent agent connections served by an asyncio loop (agent_link.py)
+    agent_server = None
 
     prey_procs = {}
     pred_procs = {}
     prey_ctrl = {}
     pred_ctrl = {}
 
-    prey_energy = {}
-    pred_energy = {}
-    prey_active = {}
+    # energies from telemetry, with statistics kept up to date per message
+    prey_energy = EnergyStats()
+    pred_energy = EnergyStats()
+    # preys a hunt can take: active (last telemetry), alive, not already killed by another hunt
+    huntable = _RandomSet()
     reserved_preys = set()
+    active_preds = set()   # last telemetry flag, for checkpoints
+    # energy env has credited (hunt_result meals, grass_grants) that the animal's telemetry does not
+    # show yet, for checkpoints: dropped on its next report (exact in lockstep, where that report
+    # comes after the animal has read its ctrl messages)
+    pending_gain = {}
+    env_rng = seeding.stream("env")
+
+    # eat_grass requests of the current tick (pid, units), granted together by grant_grass()
+    grass_requests = []
+
+    # spawn latency: request time until the animal is up and reports "ready"
+    spawn_requested = {}
+    spawn_latencies = collections.deque(maxlen=1000)
+
+    # spawn serials key each animal's random stream (seeding.py) and order lockstep messages
+    serials = itertools.count()
+    serial_of = {}   # pid -> serial
+    resumed_state = {}   # pid -> (energy, active) of animals re-created from a checkpoint, until they die
+
+    # shared-memory slots (not for the vectorized engine):
+    #  telemetry = one slot per animal (death flag included), control = mailbox indexed by the same slot
+    telemetry_shm = None
+    control_shm = None
+    slots = None
+    slot_of = {}     # pid -> (slot, gen)
+    slot_owner = {}  # slot -> (kind, pid, gen)
+    if config.ENGINE_MODE != "vectorized":
+        if config.TELEMETRY_TRANSPORT == "shm":
+            telemetry_shm = TelemetryTable(config.SHM_SLOTS)
+        if config.CONTROL_TRANSPORT == "shm":
+            control_shm = ControlMailbox(config.SHM_SLOTS)
+        if telemetry_shm is not None or control_shm is not None:
+            slots = SlotAllocator(config.SHM_SLOTS)
+
+    # vectorized engine: every animal lives in NumPy tables inside env
+    population = None
+    # optional grid world of the vectorized engine (config.WORLD_SIZE): per-cell grass, positions
+    world = None
+    # sharded engine: animals hosted by a pool of worker processes
+    pool = None
+
+    if config.ENGINE_MODE == "vectorized":
+        from vector_engine import VectorPopulation, PREY, PREDATOR
+        if config.WORLD_SIZE:
+            from grid_world import GridWorld
+            world = GridWorld(*config.WORLD_SIZE)
+        population = VectorPopulation(seed=seeding.np_seed("vector"), world=world)
+        max_preys = int(config.VECTOR_MAX_PREYS)
+        max_predators = int(config.VECTOR_MAX_PREDATORS)
+    elif config.ENGINE_MODE == "sharded":
+        pool = ShardPool(shared_env, energies_to_env, events_to_env, workers=config.SHARD_WORKERS,
+                         telemetry_shm=telemetry_shm, control_shm=control_shm)
+        max_preys = int(config.SHARDED_MAX_PREYS)
+        max_predators = int(config.SHARDED_MAX_PREDATORS)
+    else:
+        max_preys = int(config.MAX_PREYS)
+        max_predators = int(config.MAX_PREDATORS)
+
+    # lockstep ticks: env publishes each tick and waits for every participant's ack
+    lockstep = config.TICK_MODE == "lockstep"
+    barrier = shared_env.barrier
+    received = 0     # queue messages taken by env (compared with barrier.sent())
+    stragglers = 0   # animals told to die by a reset, acking one last tick
+    dying = []       # their (process, ctrl queue), kept until the process has exited
+
+    # per-phase tick timings and message counters, sent to the display every METRICS_EVERY_TICKS
+    metrics = TickMetrics(config.METRICS_BUCKETS_MS)
+
+    # every Snapshot of the run appended to a memory-mapped file (replay: snapshot_log.py)
+    snap_log = None
+    if config.SNAPSHOT_LOG_PATH:
+        snap_log = SnapshotLogWriter(config.SNAPSHOT_LOG_PATH, len(config.ENERGY_PERCENTILES),
+                                     int(config.ENERGY_HIST_BINS))
+
+    # full state saved every CHECKPOINT_EVERY_TICKS (written by a background thread); `resume` = checkpoint file
+    checkpointer = checkpoint.Checkpointer(config.CHECKPOINT_PATH) if config.CHECKPOINT_PATH else None
+
+    # animal events: one line each, or one summary line per tick (LOG_LEVEL, "set_log_level" command)
+    ticklog = TickLog(lambda line: _log(log_to_display, line), config.LOG_LEVEL,
+                      config.LOG_SAMPLE_RATE, seeding.stream("log"))
+
+    # process mode: pre-started idle processes take births
+    warm = None
+    if config.ENGINE_MODE == "process" and int(config.WARM_POOL_SIZE) > 0:
+        warm = WarmPool(shared_env, energies_to_env, events_to_env, size=int(config.WARM_POOL_SIZE),
+                        telemetry_shm=telemetry_shm, control_shm=control_shm)
 
     # =======================
     # DROUGHT = POSIX SIGNALS
     # =======================
 
     DROUGHT_SIGNAL = signal.SIGUSR1
+    # signals received, applied at the next tick boundary: the handler can interrupt env anywhere
+    # (inside `with shared_env.lock:`, or halfway through a GridWorld update)
+    drought_signals = collections.deque()
 
     def drought_signal_handler(signum, frame):
-        """ONLY place where drought state changes"""
-        with shared_env.lock:
-            shared_env.drought.value = not bool(shared_env.drought.value)
-            now = bool(shared_env.drought.value)
-            if now:
-                shared_env.grass.value //= 2
-        _log(log_to_display, f"🌵 Drought toggled by SIGNAL (drought={now})")
+        drought_signals.append(signum)   # deque.append: atomic against the main loop's popleft
+
+    def apply_drought_signals():
+        """ONLY place where drought state changes: one toggle per signal received since the last tick"""
+        while drought_signals:
+            drought_signals.popleft()
+            with shared_env.lock:
+                shared_env.drought.value = not bool(shared_env.drought.value)
+                now = bool(shared_env.drought.value)
+                if now:
+                    shared_env.grass.value //= 2
+                    if world is not None:
+                        world.grass *= 0.5
+            _log(log_to_display, f"🌵 Drought toggled by SIGNAL (drought={now})")
 
     def alarm_handler(signum, frame):
         # SIGALRM -> trigger SIGUSR1
@@ -76,7 +246,29 @@ def run_env(shared_env, env_to_display, display_to_env,
         except Exception:
             pass
 
+    def stop_animals(timeout: float):
+        """At shutdown: give every animal process `timeout` (overall) to exit, then terminate the rest."""
+        procs = list(prey_procs.values()) + list(pred_procs.values()) + [p for p, _q in dying]
+        deadline = time.monotonic() + timeout
+        for p in procs:
+            try:
+                p.join(timeout=max(0.0, deadline - time.monotonic()))
+            except Exception:
+                pass
+        late = [p for p in procs if p.is_alive()]
+        for p in late:
+            try:
+                p.terminate()
+            except Exception:
+                pass
+        for p in late:
+            try:
+                p.join(timeout=0.5)
+            except Exception:
+                pass
+
     def reset_to_initial():
+        nonlocal stragglers, serials
         # ask all animals to die
         for q in list(prey_ctrl.values()):
             try:
@@ -89,9 +281,18 @@ def run_env(shared_env, env_to_display, display_to_env,
             except Exception:
                 pass
 
-        # terminate everything (fast)
-        for p in list(prey_procs.values()) + list(pred_procs.values()):
-            _terminate_process(p)
+        # terminate everything (fast); in lockstep mode animals wait on the tick barrier and a killed
+        # waiter would block its next notify, so they act on "die" at the next tick and exit instead
+        procs = list(prey_procs.values()) + list(pred_procs.values())
+        if lockstep:
+            stragglers += len(procs)
+            # env holds the only reference to each ctrl queue (Process.start() drops its args): a child
+            # spawned a tick ago may still be unpickling it, and would die without acking if it were freed
+            ctrl = {**prey_ctrl, **pred_ctrl}
+            dying.extend((p, ctrl.get(p.pid)) for p in procs)
+        else:
+            for p in procs:
+                _terminate_process(p)
 
         prey_procs.clear()
         pred_procs.clear()
@@ -99,80 +300,455 @@ def run_env(shared_env, env_to_display, display_to_env,
         pred_ctrl.clear()
         prey_energy.clear()
         pred_energy.clear()
-        prey_active.clear()
+        huntable.clear()
         reserved_preys.clear()
+        active_preds.clear()
+        pending_gain.clear()
+        grass_requests.clear()
+        if population is not None:
+            population.clear()
+        if pool is not None:
+            pool.reset()
+        if warm is not None:
+            stragglers += warm.reset()
+        spawn_requested.clear()
+        serials = itertools.count()
+        serial_of.clear()
+        resumed_state.clear()
+        if slots is not None:
+            slots.reset()
+        slot_of.clear()
+        slot_owner.clear()
 
         shared_env.set_initial(grass=int(config.INITIAL_GRASS), drought=False)
+        if world is not None:
+            world.fill(int(config.INITIAL_GRASS))
+            with shared_env.lock:
+                shared_env.grass.value = world.total()
         _log(log_to_display, "🔄 Reset environment (0 prey, 0 predator)")
 
-    def spawn_prey(n: int, origin: str = "UI"):
+    def claim_slot():
+        """(slot, gen) in the shared tables for a new animal; None -> it uses the queues."""
+        if slots is None:
+            return None
+        got = slots.allocate()
+        if got is not None:
+            if telemetry_shm is not None:
+                telemetry_shm.claim(*got)
+            if control_shm is not None:
+                control_shm.claim(*got)
+        return got
+
+    def slot_writer(slot):
+        """What the animal gets as energies_to_env."""
+        if slot is not None and telemetry_shm is not None:
+            return SlotWriter(telemetry_shm, energies_to_env, *slot)
+        return energies_to_env
+
+    def slot_ctrl(slot, fallback):
+        """What env keeps as the animal's ctrl queue."""
+        if slot is not None and control_shm is not None:
+            return MailboxWriter(control_shm, slot[0])
+        return fallback
+
+    def bind_slot(kind: str, pid, slot):
+        if slot is not None:
+            slot_of[pid] = slot
+            slot_owner[slot[0]] = (kind, pid, slot[1])
+
+    def free_slot(pid):
+        slot = slot_of.pop(pid, None)
+        if slot is not None:
+            slot_owner.pop(slot[0], None)
+            slots.release(slot[0])
+
+    def log_spawn(line: str, origin: str):
+        # births are already counted by the reproduction event that asked for them
+        if origin == "UI":
+            _log(log_to_display, line)
+        else:
+            ticklog.event(line)
+
+    def _spawn(kind: str, n: int, origin: str, states, counter, limit: int, target, procs: dict, ctrl: dict,
+               label: str):
+        """
+        n new animals of `kind`; `counter` is its shared_env count, `target` its process function,
+        `procs` / `ctrl` its tables. `states`: one (serial, (energy, active, tick)) per animal when resuming
+        from a checkpoint: the animal keeps its serial and its stream restarts at `tick` (seeding.agent_stream).
+        """
         n = int(n)
         if n <= 0:
             return
 
         with shared_env.lock:
-            can_add = max(0, int(config.MAX_PREYS) - int(shared_env.preys.value))
+            can_add = max(0, limit - int(counter.value))
             n = min(n, can_add)
             if n <= 0:
                 return
-            shared_env.preys.value += n
+            counter.value += n
 
-        for _ in range(n):
-            q = multiprocessing.Queue()
-            p = multiprocessing.Process(
-                target=run_prey,
-                args=(shared_env, energies_to_env, events_to_env, q)
-            )
-            p.start()
-            prey_procs[p.pid] = p
-            prey_ctrl[p.pid] = q
+        if population is not None:
+            population.spawn(PREY if kind == "prey" else PREDATOR, n)
+            log_spawn(f"{label} +{n} {kind}", origin)
+            return
 
-        _log(log_to_display, f"🐇 +{n} prey")
+        for i in range(n):
+            t0 = time.monotonic()
+            serial, state = states[i] if states else (next(serials), None)
+            slot = claim_slot()
+
+            if pool is not None:
+                aid, q = pool.add(kind, serial, slot, state)
+            else:
+                got = warm.acquire(kind, serial, slot, state) if warm is not None else None
+                if got is not None:
+                    aid, q = got
+                else:
+                    if slot is not None and control_shm is not None:
+                        q = MailboxReader(control_shm, *slot)
+                    elif agent_server is not None:
+                        q = None   # control comes over the animal's connection
+                    else:
+                        q = multiprocessing.Queue()
+                    p = multiprocessing.Process(
+                        target=target,
+                        args=(shared_env, slot_writer(slot), events_to_env, q, serial, barrier.next_tick(), state)
+                    )
+                    p.start()
+                    aid = p.pid
+                    procs[aid] = p
+                    if q is None:
+                        q = agent_server.ctrl(aid)
+
+            ctrl[aid] = slot_ctrl(slot, q)
+            serial_of[aid] = serial
+            if state is not None:
+                resumed_state[aid] = state[:2]
+            bind_slot(kind, aid, slot)
+            spawn_requested[aid] = t0
+
+        log_spawn(f"{label} +{n} {kind}", origin)
+
+    def spawn_prey(n: int, origin: str = "UI", states=None):
+        _spawn("prey", n, origin, states, shared_env.preys, max_preys, run_prey, prey_procs, prey_ctrl, "🐇")
+
+    def spawn_predator(n: int, origin: str = "UI", states=None):
+        _spawn("predator", n, origin, states, shared_env.predators, max_predators, run_predator,
+               pred_procs, pred_ctrl, "🦁")
 
-    def spawn_predator(n: int, origin: str = "UI"):
-        n = int(n)
-        if n <= 0:
-            return
+    def kill_one_active_prey():
+        # rule: only active preys can be predated (uniform choice among them)
+        pid = huntable.pop_random(env_rng)
+        if pid is None:
+            return None
+
+        reserved_preys.add(pid)
+        try:
+            prey_ctrl[pid].put(("die",))
+            return pid
+        except Exception:
+            reserved_preys.discard(pid)
+            return None
 
+    # =======================
+    # TELEMETRY / ACTIONS
+    # =======================
+
+    def on_telemetry(msg):
+        if msg[0] == "batch":
+            for m in msg[1]:
+                on_telemetry(m)
+
+        elif msg[0] == "prey":
+            _, pid, e, a = msg
+            prey_energy.set(pid, e)
+            if pending_gain:
+                pending_gain.pop(pid, None)
+            if a and pid in prey_ctrl and pid not in reserved_preys:
+                huntable.add(pid)
+            else:
+                huntable.discard(pid)
+
+        elif msg[0] == "predator":
+            _, pid, e, a = msg
+            pred_energy.set(pid, e)
+            if pending_gain:
+                pending_gain.pop(pid, None)
+            if a:
+                active_preds.add(pid)
+            else:
+                active_preds.discard(pid)
+
+        elif msg[0] == "ready":
+            # ready time is taken by the animal (monotonic clock is system-wide)
+            _, _kind, pid, t_ready = msg
+            t0 = spawn_requested.pop(pid, None)
+            if t0 is not None:
+                spawn_latencies.append(max(0.0, t_ready - t0))
+
+        elif msg[0] == "dead":
+            _, kind, pid = msg
+            spawn_requested.pop(pid, None)
+            serial_of.pop(pid, None)
+            resumed_state.pop(pid, None)
+            pending_gain.pop(pid, None)
+            free_slot(pid)
+            if warm is not None:
+                warm.release(pid)
+
+            if kind == "prey" and pid in prey_ctrl:
+                reserved_preys.discard(pid)
+                prey_energy.remove(pid)
+                huntable.discard(pid)
+                prey_ctrl.pop(pid, None)
+                prey_procs.pop(pid, None)
+                if pool is not None:
+                    pool.remove(pid)
+                with shared_env.lock:
+                    shared_env.preys.value = max(0, int(shared_env.preys.value) - 1)
+                ticklog.event("☠️ Prey {} dead", pid, prey_deaths=1)
+
+            elif kind == "predator" and pid in pred_ctrl:
+                pred_energy.remove(pid)
+                active_preds.discard(pid)
+                pred_ctrl.pop(pid, None)
+                pred_procs.pop(pid, None)
+                if pool is not None:
+                    pool.remove(pid)
+                with shared_env.lock:
+                    shared_env.predators.value = max(0, int(shared_env.predators.value) - 1)
+                ticklog.event("☠️ Predator {} dead", pid, predator_deaths=1)
+
+    def on_event(ev):
+        if ev[0] == "batch":
+            for e in ev[1]:
+                on_event(e)
+
+        elif ev[0] == "eat_grass":
+            _, pid, req = ev
+            grass_requests.append((pid, max(0, int(req))))
+
+        elif ev[0] == "hunt":
+            _, pred_pid = ev
+            killed = kill_one_active_prey()
+            success = killed is not None
+
+            if pred_pid in pred_ctrl:
+                try:
+                    pred_ctrl[pred_pid].put(("hunt_result", success))
+                    if success:
+                        pending_gain[pred_pid] = pending_gain.get(pred_pid, 0.0) + float(config.PREDATOR_EAT_GAIN)
+                except Exception:
+                    pass
+
+            if success:
+                ticklog.event("🦁 Predator {} eats prey {}", pred_pid, killed, hunts=1, kills=1)
+            else:
+                ticklog.event("🦁 Predator {} hunts but fails (no active prey)", pred_pid, hunts=1)
+
+        elif ev[0] == "spawn_prey":
+            _, n = ev
+            n = int(n)
+            if n > 0:
+                spawn_prey(n, origin="reproduction")
+                ticklog.event("🐇 Reproduction: +{} prey", n, prey_births=n)
+
+        elif ev[0] == "spawn_predator":
+            _, n = ev
+            n = int(n)
+            if n > 0:
+                spawn_predator(n, origin="reproduction")
+                ticklog.event("🦁 Reproduction: +{} predator", n, predator_births=n)
+
+    def energy_summary(stats: EnergyStats, kind: str):
+        """((min, mean, max), percentiles, histogram) of one population for the Snapshot."""
+        qs = config.ENERGY_PERCENTILES
+        width, bins = float(config.ENERGY_HIST_WIDTH), int(config.ENERGY_HIST_BINS)
+        if population is not None:
+            k = PREY if kind == "prey" else PREDATOR
+            return (population.energy_stats(k), population.energy_percentiles(k, qs),
+                    population.energy_histogram(k, width, bins))
+        return stats.stats(), stats.percentiles(qs), stats.histogram(width, bins)
+
+    def grant_grass():
+        """All eat_grass requests of the tick in one allocation (config.GRASS_POLICY), one lock."""
+        if not grass_requests:
+            return
+        requests = [req for _pid, req in grass_requests]
         with shared_env.lock:
-            can_add = max(0, int(config.MAX_PREDATORS) - int(shared_env.predators.value))
-            n = min(n, can_add)
-            if n <= 0:
-                return
-            shared_env.predators.value += n
+            grants = allocate_grass(requests, int(shared_env.grass.value), config.GRASS_POLICY, env_rng)
+            eaten = sum(grants)
+            shared_env.grass.value -= eaten
 
-        for _ in range(n):
-            q = multiprocessing.Queue()
-            p = multiprocessing.Process(
-                target=run_predator,
-                args=(shared_env, energies_to_env, events_to_env, q)
-            )
-            p.start()
-            pred_procs[p.pid] = p
-            pred_ctrl[p.pid] = q
+        for (pid, _req), granted in zip(grass_requests, grants):
+            if granted > 0 and pid in prey_ctrl:
+                try:
+                    prey_ctrl[pid].put(("grass_grant", granted))
+                    pending_gain[pid] = pending_gain.get(pid, 0.0) + granted * float(config.PREY_GRASS_GAIN_PER_UNIT)
+                except Exception:
+                    pass
+        grass_requests.clear()
 
-        _log(log_to_display, f"🦁 +{n} predator")
+        starving = grants.count(0)
+        ticklog.event("🐇 {} preys eat {} grass ({} without grass)", len(grants), eaten, starving,
+                      eaters=len(grants), grass=eaten, starving=starving)
 
-    def kill_one_active_prey():
-        # rule: only active preys can be predated
-        for pid, active in list(prey_active.items()):
-            if not active:
-                continue
-            if pid in reserved_preys:
-                continue
-            if pid not in prey_ctrl:
-                continue
-
-            reserved_preys.add(pid)
-            prey_active[pid] = False
-            try:
-                prey_ctrl[pid].put(("die",))
-                return pid
-            except Exception:
-                reserved_preys.discard(pid)
-                return None
+    # =======================
+    # CHECKPOINTS
+    # =======================
+
+    def capture(next_tick: int) -> dict:
+        """
+        Copy of the state at the end of a tick (flat buffers); serialized later by the Checkpointer.
+        Preys already taken by a hunt (reserved, "dead" not in yet) are left out; meals and grass grants
+        sent this tick but not yet in the animals' telemetry are added to their saved energy.
+        """
+        nonlocal serials
+        if population is not None:
+            kinds, energies, active = population.export()
+            vector_rng = population.rng.bit_generator.state
+            serials_of = None
+        else:
+            # animals in spawn order; energies and flags from their last telemetry. Those spawned but not
+            # reported yet are saved at their initial energy: the checkpointed one if they were resumed,
+            # else the first draw of their stream (exact with SEED, a fresh draw of the same range without)
+            ids = sorted([a for a in prey_ctrl if a not in reserved_preys] + list(pred_ctrl),
+                         key=lambda a: serial_of.get(a, 0))
+            kinds = bytes(checkpoint.PREY if a in prey_ctrl else checkpoint.PREDATOR for a in ids)
+            energies = array("d")
+            active = bytearray()
+            for a in ids:
+                stats = prey_energy if a in prey_ctrl else pred_energy
+                e = stats.values.get(a)
+                if e is not None:
+                    energies.append(e)
+                    active.append(a in huntable or a in active_preds)
+                elif a in resumed_state:
+                    e, was_active = resumed_state[a]
+                    energies.append(e)
+                    active.append(bool(was_active))
+                else:
+                    rng = seeding.agent_stream(serial_of.get(a, 0))
+                    energies.append(float(rng.randint(config.INITIAL_ENERGY_MIN, config.INITIAL_ENERGY_MAX)))
+                    active.append(False)
+                if pending_gain:
+                    energies[-1] += pending_gain.get(a, 0.0)
+            energies = energies.tobytes()
+            active = bytes(active)
+            serials_of = array("q", (serial_of.get(a, 0) for a in ids)).tobytes()
+            vector_rng = None
+        serial = next(serials)
+        serials = itertools.count(serial)
+
+        with shared_env.lock:
+            grass = int(shared_env.grass.value)
+            drought = bool(shared_env.drought.value)
+        return {
+            "tick": next_tick,
+            "grass": grass,
+            "drought": drought,
+            "kind": kinds,
+            "energy": energies,
+            "active": active,
+            "serial": serial,
+            "serials": serials_of,
+            "env_rng": env_rng.getstate(),
+            "log_rng": ticklog.rng.getstate(),
+            "vector_rng": vector_rng,
+            "world": world.dump() if world is not None else None,
+        }
+
+    def restore(state: dict) -> int:
+        """Re-create a checkpointed world (after reset_to_initial); returns the tick to run next."""
+        nonlocal serials
+        serials = itertools.count(state["serial"])
+        env_rng.setstate(state["env_rng"])
+        ticklog.rng.setstate(state["log_rng"])
+        with shared_env.lock:
+            shared_env.grass.value = int(state["grass"])
+            shared_env.drought.value = bool(state["drought"])
 
-        return None
+        kinds = state["kind"]
+        energies = array("d")
+        energies.frombytes(state["energy"])
+        if population is not None:
+            with shared_env.lock:
+                shared_env.preys.value = kinds.count(PREY)
+                shared_env.predators.value = kinds.count(PREDATOR)
+            population.restore(kinds, state["energy"], state["active"])
+            if state["vector_rng"] is not None:
+                population.rng.bit_generator.state = state["vector_rng"]
+            if world is not None:
+                # positions are not saved: restored animals are scattered again
+                if not world.load(state.get("world")):
+                    world.fill(int(state["grass"]))
+                with shared_env.lock:
+                    shared_env.grass.value = world.total()
+        else:
+            # animals keep their serial; their streams restart from (SEED, serial, resume tick)
+            tick = int(state["tick"])
+            serials_of = array("q")
+            if state.get("serials") is not None:
+                serials_of.frombytes(state["serials"])
+            else:
+                serials_of.extend(next(serials) for _ in kinds)
+            animals = list(zip(kinds, energies, state["active"], serials_of))
+            preys = [(s, (e, bool(a), tick)) for k, e, a, s in animals if k == checkpoint.PREY]
+            predators = [(s, (e, bool(a), tick)) for k, e, a, s in animals if k == checkpoint.PREDATOR]
+            spawn_prey(len(preys), origin="checkpoint", states=preys)
+            spawn_predator(len(predators), origin="checkpoint", states=predators)
+        return int(state["tick"])
+
+    # =======================
+    # LOCKSTEP TICKS
+    # =======================
+
+    def participants() -> int:
+        if pool is not None:
+            return pool.n
+        return len(prey_ctrl) + len(pred_ctrl)
+
+    def collect_tick_messages(tel_msgs, ev_msgs):
+        """After the acks: take queue messages until all those put during the tick are in."""
+        nonlocal received
+        deadline = time.monotonic() + float(config.LOCKSTEP_TIMEOUT)
+        while True:
+            for q, out in ((energies_to_env, tel_msgs), (events_to_env, ev_msgs)):
+                while not q.empty():
+                    try:
+                        out.append(q.get_nowait())
+                    except Exception:
+                        break
+                    received += 1
+            if agent_server is not None:
+                for messages, out in ((agent_server.telemetry, tel_msgs), (agent_server.events, ev_msgs)):
+                    got = agent_server.drain(messages)
+                    out.extend(got)
+                    received += len(got)
+            if received >= barrier.sent() or time.monotonic() > deadline:
+                return
+            time.sleep(0.0002)
+
+    def in_spawn_order(msgs):
+        """
+        A tick's messages (batches unpacked) sorted by sender serial: queue arrival order
+        depends on the OS scheduler, spawn order does not. Births go last, preys first
+        (they carry no sender, and all births of one kind are alike).
+        """
+        flat = []
+        for m in msgs:
+            flat.extend(m[1] if m[0] == "batch" else (m,))
+
+        def key(m):
+            if m[0] == "spawn_prey":
+                return (1, 0)
+            if m[0] == "spawn_predator":
+                return (2, 0)
+            pid = m[2] if m[0] in ("ready", "dead") else m[1]
+            return (0, serial_of.get(pid, -1))
+
+        flat.sort(key=key)   # stable: one sender's messages keep their order
+        return flat
 
     # =======================
     # SOCKET JOIN (SPEC)
@@ -202,17 +778,32 @@ def run_env(shared_env, env_to_display, display_to_env,
         signal.signal(DROUGHT_SIGNAL, drought_signal_handler)
         signal.signal(signal.SIGALRM, alarm_handler)
 
-        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        server_socket.bind((config.ENV_HOST, config.ENV_PORT))
-        server_socket.listen(10)
+        if config.AGENT_LINK == "socket":
+            agent_server = AgentServer(config.ENV_HOST, config.ENV_PORT)
+            agent_server.start()
+        else:
+            server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            server_socket.bind((config.ENV_HOST, config.ENV_PORT))
+            server_socket.listen(10)
+
+            threading.Thread(target=accept_clients, daemon=True).start()
 
-        threading.Thread(target=accept_clients, daemon=True).start()
+        if pool is not None:
+            pool.start()
+        if warm is not None:
+            warm.start()
 
         reset_to_initial()
         tick = 0
+        if resume:
+            tick = restore(checkpoint.load(resume))
+            _log(log_to_display, f"♻️ Resumed from {resume} at tick {tick} "
+                                 f"({int(shared_env.preys.value)} prey, {int(shared_env.predators.value)} predator)")
 
         while shared_env.running.value:
+            tick_start = time.monotonic()
+            metrics.start()
             with shared_env.lock:
                 shared_env.tick.value = tick
 
@@ -240,126 +831,195 @@ def run_env(shared_env, env_to_display, display_to_env,
                     val = int(float(cmd.args.get("value", 0)))
                     with shared_env.lock:
                         shared_env.grass.value = max(0, min(val, int(config.MAX_GRASS)))
+                        if world is not None:
+                            world.fill(int(shared_env.grass.value))
+                            shared_env.grass.value = world.total()
                     _log(log_to_display, f"🌿 Grass set to {int(shared_env.grass.value)}")
 
+                elif cmd.cmd == "set_log_level":
+                    try:
+                        ticklog.set_level(str(cmd.args.get("value", "")), cmd.args.get("sample"))
+                        _log(log_to_display, f"📝 Log level: {ticklog.level} (sample {ticklog.sample_rate:g})")
+                    except (TypeError, ValueError) as e:
+                        _log(log_to_display, f"📝 {e}")
+
+            # ---- Drought (signals since the last tick, trigger_drought included) ----
+            apply_drought_signals()
+            metrics.lap("commands")
+
+            # ---- Tick barrier (lockstep) ----
+            tel_msgs = []
+            ev_msgs = []
+            if lockstep:
+                dying[:] = [(p, q) for p, q in dying if p.is_alive()]
+                if pool is not None:
+                    pool.flush(always=True)
+                barrier.publish(tick)
+                if not barrier.wait_acks(participants() + stragglers, float(config.LOCKSTEP_TIMEOUT)):
+                    _log(log_to_display, f"⏱️ Tick {tick}: missing acks after {config.LOCKSTEP_TIMEOUT}s")
+                stragglers = 0
+                collect_tick_messages(tel_msgs, ev_msgs)
+                metrics.drain("energies_to_env", len(tel_msgs), sum(map(_msg_count, tel_msgs)))
+                metrics.drain("events_to_env", len(ev_msgs), sum(map(_msg_count, ev_msgs)))
+                tel_msgs = in_spawn_order(tel_msgs)
+                ev_msgs = in_spawn_order(ev_msgs)
+            metrics.lap("barrier")
+
             # ---- Telemetry ----
+            if telemetry_shm is not None:
+                # one pass over the slot table (slots not written since the last tick are skipped);
+                # a slot's death flag is read after its telemetry, which it follows
+                table = telemetry_shm
+                reads = 0
+                for slot, (kind, pid, gen) in list(slot_owner.items()):
+                    got = table.read(slot, gen)
+                    if got is not None:
+                        on_telemetry((kind, pid, got[0], got[1]))
+                        reads += 1
+                    if table.is_dead(slot):
+                        on_telemetry(("dead", kind, pid))
+                        reads += 1
+                metrics.drain("telemetry_shm", 0, reads)
+
+            for msg in tel_msgs:
+                on_telemetry(msg)
+            drained = items = 0
             while not energies_to_env.empty():
                 msg = energies_to_env.get_nowait()
-
-                if msg[0] == "prey":
-                    _, pid, e, a = msg
-                    prey_energy[pid] = float(e)
-                    prey_active[pid] = bool(a)
-
-                elif msg[0] == "predator":
-                    _, pid, e, _a = msg
-                    pred_energy[pid] = float(e)
-
-                elif msg[0] == "dead":
-                    _, kind, pid = msg
-
-                    if kind == "prey":
-                        reserved_preys.discard(pid)
-                        prey_energy.pop(pid, None)
-                        prey_active.pop(pid, None)
-                        prey_ctrl.pop(pid, None)
-                        prey_procs.pop(pid, None)
-                        with shared_env.lock:
-                            shared_env.preys.value = max(0, int(shared_env.preys.value) - 1)
-                        _log(log_to_display, f"☠️ Prey {pid} dead")
-
-                    elif kind == "predator":
-                        pred_energy.pop(pid, None)
-                        pred_ctrl.pop(pid, None)
-                        pred_procs.pop(pid, None)
-                        with shared_env.lock:
-                            shared_env.predators.value = max(0, int(shared_env.predators.value) - 1)
-                        _log(log_to_display, f"☠️ Predator {pid} dead")
+                on_telemetry(msg)
+                drained += 1
+                items += _msg_count(msg)
+            received += drained
+            metrics.drain("energies_to_env", drained, items)
+            if agent_server is not None:
+                msgs = agent_server.drain(agent_server.telemetry)
+                for msg in msgs:
+                    on_telemetry(msg)
+                received += len(msgs)
+                metrics.drain("agent_link", len(msgs), sum(map(_msg_count, msgs)))
+            metrics.lap("telemetry")
 
             # ---- Actions ----
+            for ev in ev_msgs:
+                on_event(ev)
+            drained = items = 0
             while not events_to_env.empty():
                 ev = events_to_env.get_nowait()
-
-                if ev[0] == "eat_grass":
-                    _, pid, req = ev
-                    req = max(0, int(req))
-                    with shared_env.lock:
-                        granted = min(req, int(shared_env.grass.value))
-                        shared_env.grass.value -= granted
-
-                    if pid in prey_ctrl:
-                        try:
-                            prey_ctrl[pid].put(("grass_grant", granted))
-                        except Exception:
-                            pass
-
-                    if granted > 0:
-                        _log(log_to_display, f"🐇 Prey {pid} eats {granted} grass")
+                on_event(ev)
+                drained += 1
+                items += _msg_count(ev)
+            received += drained
+            metrics.drain("events_to_env", drained, items)
+            if agent_server is not None:
+                msgs = agent_server.drain(agent_server.events)
+                for ev in msgs:
+                    on_event(ev)
+                received += len(msgs)
+                metrics.drain("agent_link", len(msgs), sum(map(_msg_count, msgs)))
+            grant_grass()
+
+            if pool is not None and not lockstep:
+                pool.flush()
+            if agent_server is not None:
+                agent_server.flush()
+            metrics.lap("actions")
+
+            # ---- Vectorized population ----
+            if population is not None:
+                with shared_env.lock:
+                    available = int(shared_env.grass.value)
+                out = population.step(available)
+                with shared_env.lock:
+                    if world is not None:
+                        shared_env.grass.value = world.total()
                     else:
-                        _log(log_to_display, f"🐇 Prey {pid} wants grass but none left")
-
-                elif ev[0] == "hunt":
-                    _, pred_pid = ev
-                    killed = kill_one_active_prey()
-                    success = killed is not None
-
-                    if pred_pid in pred_ctrl:
-                        try:
-                            pred_ctrl[pred_pid].put(("hunt_result", success))
-                        except Exception:
-                            pass
-
-                    if success:
-                        _log(log_to_display, f"🦁 Predator {pred_pid} eats prey {killed}")
-                    else:
-                        _log(log_to_display, f"🦁 Predator {pred_pid} hunts but fails (no active prey)")
-
-                elif ev[0] == "spawn_prey":
-                    _, n = ev
-                    n = int(n)
-                    if n > 0:
-                        spawn_prey(n, origin="reproduction")
-                        _log(log_to_display, f"🐇 Reproduction: +{n} prey")
-
-                elif ev[0] == "spawn_predator":
-                    _, n = ev
-                    n = int(n)
-                    if n > 0:
-                        spawn_predator(n, origin="reproduction")
-                        _log(log_to_display, f"🦁 Reproduction: +{n} predator")
+                        shared_env.grass.value -= out.eaten
+                    shared_env.preys.value = population.count(PREY)
+                    shared_env.predators.value = population.count(PREDATOR)
+
+                if out.eaters:
+                    ticklog.event("🐇 {} preys eat {} grass ({} without grass)", out.eaters, out.eaten, out.starving,
+                                  eaters=out.eaters, grass=out.eaten, starving=out.starving)
+                if out.hunters:
+                    ticklog.event("🦁 {} predators hunt, {} preys eaten", out.hunters, out.kills,
+                                  hunts=out.hunters, kills=out.kills)
+                if out.prey_deaths or out.predator_deaths:
+                    ticklog.event("☠️ {} prey / {} predator dead", out.prey_deaths, out.predator_deaths,
+                                  prey_deaths=out.prey_deaths, predator_deaths=out.predator_deaths)
+                if out.prey_births:
+                    spawn_prey(out.prey_births, origin="reproduction")
+                    ticklog.event("🐇 Reproduction: +{} prey", out.prey_births, prey_births=out.prey_births)
+                if out.predator_births:
+                    spawn_predator(out.predator_births, origin="reproduction")
+                    ticklog.event("🦁 Reproduction: +{} predator", out.predator_births,
+                                  predator_births=out.predator_births)
+            metrics.lap("engine")
 
             # ---- Grass growth ----
             with shared_env.lock:
-                if not shared_env.drought.value:
-                    shared_env.grass.value += int(config.GRASS_GROWTH_PER_TICK)
+                if world is not None:
+                    # per-cell growth, capped per cell (WORLD_CELL_MAX_GRASS)
+                    world.grow(bool(shared_env.drought.value))
+                    shared_env.grass.value = world.total()
                 else:
-                    shared_env.grass.value += int(config.GRASS_GROWTH_PER_TICK * config.DROUGHT_GRASS_FACTOR)
+                    if not shared_env.drought.value:
+                        shared_env.grass.value += int(config.GRASS_GROWTH_PER_TICK)
+                    else:
+                        shared_env.grass.value += int(config.GRASS_GROWTH_PER_TICK * config.DROUGHT_GRASS_FACTOR)
 
-                if shared_env.grass.value > int(config.MAX_GRASS):
-                    shared_env.grass.value = int(config.MAX_GRASS)
-                if shared_env.grass.value < 0:
-                    shared_env.grass.value = 0
+                    if shared_env.grass.value > int(config.MAX_GRASS):
+                        shared_env.grass.value = int(config.MAX_GRASS)
+                    if shared_env.grass.value < 0:
+                        shared_env.grass.value = 0
 
                 predators_n = int(shared_env.predators.value)
                 preys_n = int(shared_env.preys.value)
                 grass_n = int(shared_env.grass.value)
                 drought_b = bool(shared_env.drought.value)
+            metrics.lap("grass")
 
+            ticklog.flush(tick)
+            latencies = sorted(spawn_latencies)
+            prey_stats, prey_pct, prey_hist = energy_summary(prey_energy, "prey")
+            pred_stats, pred_pct, pred_hist = energy_summary(pred_energy, "predator")
             snapshot = Snapshot(
                 tick=tick,
                 predators=predators_n,
                 preys=preys_n,
                 grass=grass_n,
                 drought=drought_b,
-                prey_energy_stats=_energy_stats(list(prey_energy.values())),
-                predator_energy_stats=_energy_stats(list(pred_energy.values())),
+                prey_energy_stats=prey_stats,
+                predator_energy_stats=pred_stats,
                 prey_probs=(config.PREY_EAT_PROB, config.PREY_REPRO_PROB),
                 pred_probs=(config.PRED_HUNT_PROB, config.PRED_REPRO_PROB),
+                spawn_latency_ms=(_percentile(latencies, 0.50) * 1000.0, _percentile(latencies, 0.99) * 1000.0),
+                prey_energy_pct=prey_pct,
+                predator_energy_pct=pred_pct,
+                prey_energy_hist=prey_hist,
+                predator_energy_hist=pred_hist,
             )
             env_to_display.put(snapshot)
+            if snap_log is not None:
+                snap_log.append(snapshot)
+            if checkpointer is not None and (tick + 1) % int(config.CHECKPOINT_EVERY_TICKS) == 0:
+                if checkpointer.error is not None:
+                    _log(log_to_display, f"💾 Checkpoint failed: {checkpointer.error}")
+                    checkpointer.error = None
+                if not checkpointer.submit(capture(tick + 1)):
+                    _log(log_to_display, f"💾 Tick {tick}: checkpoint skipped, previous one still being written")
+            metrics.lap("snapshot")
+
+            metrics.end_tick(float(config.TICK_DURATION))
+            if config.METRICS_EVERY_TICKS and (tick + 1) % int(config.METRICS_EVERY_TICKS) == 0:
+                env_to_display.put(metrics.report(tick))
 
             tick += 1
-            time.sleep(config.TICK_DURATION)
+            if max_ticks is not None and tick >= max_ticks:
+                break
+            if not lockstep:
+                time.sleep(config.TICK_DURATION)
+            elif not config.LOCKSTEP_MAX_SPEED:
+                time.sleep(max(0.0, config.TICK_DURATION - (time.monotonic() - tick_start)))
 
     finally:
         try:
@@ -368,6 +1028,24 @@ def run_env(shared_env, env_to_display, display_to_env,
         except Exception:
             pass
 
+        if pool is not None:
+            pool.stop()
+        if warm is not None:
+            warm.stop()
+        if agent_server is not None:
+            agent_server.stop()
+        # animals spawned in the last ticks may still be unpickling the telemetry table or mailbox:
+        # unlink them once they are gone (they see running = False within a barrier poll, 0.5 s)
+        stop_animals(float(config.TICK_DURATION) + 1.0)
+        if telemetry_shm is not None:
+            telemetry_shm.close()
+        if control_shm is not None:
+            control_shm.close()
+        if snap_log is not None:
+            snap_log.close()
+        if checkpointer is not None:
+            checkpointer.wait(10.0)
+
         try:
             if server_socket:
                 server_socket.close()
@@ -0,0 +1,34 @@
+# grass.py
+# Per-tick grass allocation: env collects every eat_grass request of a tick and grants them in one step.
+# Policies (config.GRASS_POLICY) when the requests exceed the grass available:
+#  - "fifo"         : in the order the requests were handled (original behaviour)
+#  - "random"       : in a random order
+#  - "proportional" : everyone gets the same fraction of what they asked for (integer units)
+
+
+def allocate_grass(requests, available: int, policy: str, rng):
+    """Grants (same order as `requests`, list of ints) out of `available` grass units."""
+    total = sum(requests)
+    available = max(0, int(available))
+    if total <= available:
+        return list(requests)
+
+    if policy == "proportional":
+        grants = [r * available // total for r in requests]
+        left = available - sum(grants)
+        # units lost to rounding go to the largest remainders
+        order = sorted(range(len(requests)), key=lambda i: (-(requests[i] * available % total), i))
+        for i in order[:left]:
+            grants[i] += 1
+        return grants
+
+    order = list(range(len(requests)))
+    if policy == "random":
+        rng.shuffle(order)
+    grants = [0] * len(requests)
+    for i in order:
+        if available <= 0:
+            break
+        grants[i] = min(requests[i], available)
+        available -= grants[i]
+    return grants
@@ -0,0 +1,153 @@
+# grid_world.py
+# Optional 2D world for the vectorized engine (config.WORLD_SIZE = (width, height)):
+#  - grass lives in a NumPy array, one value per cell, growing per cell (scaled down during drought)
+#  - animals have positions in [0, width) x [0, height) (a torus) and take a random step every tick
+#  - a prey eats from the grass of its own cell only
+#  - a predator can only catch an active prey within WORLD_HUNT_RADIUS: preys are bucketed in a
+#    uniform grid of buckets at least one radius wide (spatial hash), so a hunt looks at 3x3 buckets,
+#    whatever the size of the world or of the population
+# With wrap_x=False the world is one vertical strip of a larger one (cluster.py): animals may step
+# past the left/right edges (their shard hands them over) and hunts see preys just outside them.
+
+import numpy as np
+
+import config
+
+
+class GridWorld:
+    def __init__(self, width: int, height: int, wrap_x: bool = True):
+        self.width = int(width)
+        self.height = int(height)
+        self.wrap_x = bool(wrap_x)
+        self.grass = np.zeros((self.height, self.width), dtype=np.float64)
+
+    @property
+    def cells(self) -> int:
+        return self.width * self.height
+
+    def total(self) -> int:
+        return int(self.grass.sum())
+
+    def fill(self, total: int):
+        """Spread `total` grass evenly over the cells (UI "set_grass", reset)."""
+        per_cell = min(float(config.WORLD_CELL_MAX_GRASS), max(0, int(total)) / self.cells)
+        self.grass.fill(per_cell)
+
+    def grow(self, drought: bool):
+        growth = float(config.WORLD_GRASS_GROWTH_PER_CELL)
+        if drought:
+            growth *= float(config.DROUGHT_GRASS_FACTOR)
+        self.grass += growth
+        np.minimum(self.grass, float(config.WORLD_CELL_MAX_GRASS), out=self.grass)
+
+    def dump(self) -> bytes:
+        return self.grass.tobytes()
+
+    def load(self, data) -> bool:
+        """Cells saved by dump(); False (nothing loaded) if missing or from a world of another size."""
+        if data is None or len(data) != self.grass.nbytes:
+            return False
+        self.grass[:] = np.frombuffer(data, dtype=np.float64).reshape(self.grass.shape)
+        return True
+
+    # =======================
+    # POSITIONS
+    # =======================
+
+    def random_positions(self, rng, n: int):
+        return rng.random(n) * self.width, rng.random(n) * self.height
+
+    def move(self, rng, x, y, step: float):
+        """Random step of at most `step` cells on each axis, in place, wrapping around the edges."""
+        n = x.shape[0]
+        x += rng.uniform(-step, step, n)
+        y += rng.uniform(-step, step, n)
+        if self.wrap_x:
+            np.mod(x, self.width, out=x)
+        np.mod(y, self.height, out=y)
+
+    def cell_of(self, x, y):
+        # positions past a strip edge belong to its border cells
+        cx = np.clip(np.floor(x).astype(np.int64), 0, self.width - 1)
+        cy = np.minimum(y.astype(np.int64), self.height - 1)
+        return cy * self.width + cx
+
+    # =======================
+    # EAT
+    # =======================
+
+    def eat(self, cells, requested, policy: str, rng):
+        """
+        Grants for eat requests made from `cells` (flat indices); each cell's grass is shared by
+        config.GRASS_POLICY between the preys standing on it ("proportional": rounded down).
+        """
+        grass = self.grass.reshape(-1)
+        available = np.floor(grass[cells]).astype(np.int64)
+        if policy == "proportional":
+            wanted = np.bincount(cells, weights=requested, minlength=self.cells)[cells]
+            granted = np.where(wanted > available, requested * available // np.maximum(wanted, 1), requested)
+            granted = granted.astype(np.int64)
+        else:
+            # served in row order ("fifo") or shuffled ("random") inside each cell
+            order = rng.permutation(cells.size) if policy == "random" else np.arange(cells.size)
+            order = order[np.argsort(cells[order], kind="stable")]
+            c = cells[order]
+            r = requested[order]
+            cum = np.cumsum(r)
+            first = np.flatnonzero(np.r_[True, c[1:] != c[:-1]])
+            before = cum - r - np.repeat(cum[first] - r[first], np.diff(np.r_[first, c.size]))
+            granted = np.empty_like(requested)
+            granted[order] = np.clip(available[order] - before, 0, r)
+        np.subtract.at(grass, cells, granted)
+        return granted
+
+    # =======================
+    # HUNT
+    # =======================
+
+    def hunt(self, rng, hx, hy, px, py, radius: float):
+        """
+        For each hunter (hx, hy), in random order, a distinct prey among (px, py) within `radius`
+        (torus distance), chosen uniformly; -1 when there is none.
+        """
+        caught = np.full(hx.shape[0], -1, dtype=np.int64)
+        if px.shape[0] == 0 or hx.shape[0] == 0:
+            return caught
+
+        # a whole number of buckets per axis, each at least `radius` wide (also across the wrap-around)
+        gw = max(1, int(self.width // max(float(radius), 1e-9)))
+        gh = max(1, int(self.height // max(float(radius), 1e-9)))
+        sx, sy = self.width / gw, self.height / gh
+        pbx = np.clip(np.floor(px / sx).astype(np.int64), 0, gw - 1)
+        pby = np.minimum((py / sy).astype(np.int64), gh - 1)
+        order = np.argsort(pby * gw + pbx, kind="stable")
+        buckets = (pby * gw + pbx)[order]
+        starts = np.searchsorted(buckets, np.arange(gw * gh), side="left")
+        ends = np.searchsorted(buckets, np.arange(gw * gh), side="right")
+
+        taken = np.zeros(px.shape[0], dtype=bool)
+        r2 = float(radius) ** 2
+        for i in rng.permutation(hx.shape[0]):
+            bx = max(0, min(int(hx[i] // sx), gw - 1))
+            by = min(int(hy[i] / sy), gh - 1)
+            if self.wrap_x:
+                cols = {(bx + dx) % gw for dx in (-1, 0, 1)}
+            else:
+                cols = {bx + dx for dx in (-1, 0, 1) if 0 <= bx + dx < gw}
+            near = {((by + dy) % gh) * gw + c for dy in (-1, 0, 1) for c in cols}
+            cand = np.concatenate([order[starts[b]:ends[b]] for b in near])
+            cand = cand[~taken[cand]]
+            if cand.size == 0:
+                continue
+            dx = np.abs(px[cand] - hx[i])
+            dy = np.abs(py[cand] - hy[i])
+            if self.wrap_x:
+                dx = np.minimum(dx, self.width - dx)
+            dy = np.minimum(dy, self.height - dy)
+            cand = cand[dx * dx + dy * dy <= r2]
+            if cand.size == 0:
+                continue
+            prey = cand[rng.integers(cand.size)]
+            taken[prey] = True
+            caught[i] = prey
+        return caught
@@ -0,0 +1,116 @@
+# history.py
+# Display-side time series of the last N snapshots (/api/history):
+# one array('d') column per Snapshot value (tuples flattened: prey_energy_min/avg/max, ...),
+# written as a ring, and queried as min / max / avg per bucket of `step` ticks.
+
+import math
+import threading
+from array import array
+from bisect import bisect_left
+
+
+class SnapshotHistory:
+    def __init__(self, capacity: int, percentiles=()):
+        self.capacity = max(1, int(capacity))
+        self.percentiles = tuple(percentiles)
+        pct = [f"p{q * 100:g}" for q in self.percentiles]
+        self.fields = (
+            ["tick", "preys", "predators", "grass", "drought"]
+            + [f"prey_energy_{s}" for s in ["min", "avg", "max"] + pct]
+            + [f"predator_energy_{s}" for s in ["min", "avg", "max"] + pct]
+            + ["prey_eat_prob", "prey_repro_prob", "pred_hunt_prob", "pred_repro_prob",
+               "spawn_latency_p50", "spawn_latency_p99"]
+        )
+        self.columns = {f: array("d", bytes(8 * self.capacity)) for f in self.fields}
+        self.start = 0   # ring position of the oldest row
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.size
+
+    def _row(self, s):
+        def pct(values):
+            values = tuple(values)[:len(self.percentiles)]
+            return values + (0.0,) * (len(self.percentiles) - len(values))
+
+        return ((s.tick, s.preys, s.predators, s.grass, bool(s.drought))
+                + tuple(s.prey_energy_stats) + pct(s.prey_energy_pct)
+                + tuple(s.predator_energy_stats) + pct(s.predator_energy_pct)
+                + tuple(s.prey_probs) + tuple(s.pred_probs) + tuple(s.spawn_latency_ms))
+
+    def append(self, snapshot):
+        with self.lock:
+            if self.size and snapshot.tick <= self.columns["tick"][self._pos(self.size - 1)]:
+                # ticks went back: a new env run, its history starts over
+                self.start = self.size = 0
+            if self.size < self.capacity:
+                pos = self._pos(self.size)
+                self.size += 1
+            else:
+                pos = self.start
+                self.start = (self.start + 1) % self.capacity
+            for f, v in zip(self.fields, self._row(snapshot)):
+                self.columns[f][pos] = v
+
+    def _pos(self, i: int) -> int:
+        return (self.start + i) % self.capacity
+
+    def _rows(self, col, i0: int, i1: int):
+        """Rows [i0, i1) (oldest = 0) of a column, at most two array slices."""
+        p0, p1 = self._pos(i0), self._pos(i0) + (i1 - i0)
+        if p1 <= self.capacity:
+            return col[p0:p1]
+        return col[p0:] + col[:p1 - self.capacity]
+
+    def query(self, first=None, last=None, step=None, fields=None, max_points: int = 1000):
+        """
+        Ticks [first, last] in buckets of `step` ticks (raised so there are at most `max_points` buckets):
+        {"from", "to", "step", "ticks": bucket start, "n": rows per bucket, "series": {field: {"min", "max", "avg"}}}.
+        ValueError on an unknown field.
+        """
+        names = list(fields) if fields else [f for f in self.fields if f != "tick"]
+        unknown = [f for f in names if f not in self.columns]
+        if unknown:
+            raise ValueError(f"unknown fields: {', '.join(unknown)}")
+
+        with self.lock:
+            ticks = self._rows(self.columns["tick"], 0, self.size)
+            if first is None:
+                first = int(ticks[0]) if self.size else 0
+            if last is None:
+                last = int(ticks[-1]) if self.size else first
+            span = max(1, last - first + 1)
+            step = max(1, int(step or 1), math.ceil(span / max(1, int(max_points))))
+
+            i0 = bisect_left(ticks, first)
+            i1 = bisect_left(ticks, last + 1)
+            ticks = ticks[i0:i1]
+            values = {f: self._rows(self.columns[f], i0, i1) for f in names}
+
+        # consecutive rows falling in the same bucket
+        bounds = []
+        a = 0
+        while a < len(ticks):
+            k = (int(ticks[a]) - first) // step
+            b = bisect_left(ticks, first + (k + 1) * step, a)
+            bounds.append((first + k * step, a, b))
+            a = b
+
+        series = {}
+        for f in names:
+            col = values[f]
+            parts = [col[a:b] for _t, a, b in bounds]
+            series[f] = {
+                "min": [min(p) for p in parts],
+                "max": [max(p) for p in parts],
+                "avg": [sum(p) / len(p) for p in parts],
+            }
+        return {
+            "from": first,
+            "to": last,
+            "step": step,
+            "ticks": [t for t, _a, _b in bounds],
+            "n": [b - a for _t, a, b in bounds],
+            "series": series,
+        }
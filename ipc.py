@@ -1,7 +1,7 @@
 # ipc.py
 
 from dataclasses import dataclass, asdict
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 
 @dataclass
@@ -21,7 +21,25 @@ class Snapshot:
     predator_energy_stats: Tuple[float, float, float]
     prey_probs: Tuple[float, float]
     pred_probs: Tuple[float, float]
+    spawn_latency_ms: Tuple[float, float] = (0.0, 0.0)  # p50, p99
+    prey_energy_pct: Tuple[float, ...] = ()             # at config.ENERGY_PERCENTILES
+    predator_energy_pct: Tuple[float, ...] = ()
+    prey_energy_hist: Tuple[int, ...] = ()              # ENERGY_HIST_BINS bins of ENERGY_HIST_WIDTH
+    predator_energy_hist: Tuple[int, ...] = ()
 
     def to_dict(self) -> Dict[str, Any]:
         return asdict(self)
 
+
+@dataclass
+class MetricsReport:
+    """Env tick instrumentation (tick_metrics.py); counters and histograms are cumulative."""
+    tick: int
+    buckets_ms: Tuple[float, ...]
+    phases: Dict[str, List[int]]       # phase -> count per bucket (+ last one for +Inf)
+    phase_sums: Dict[str, float]       # phase -> total seconds
+    ticks: int
+    tick_overruns: int
+    drained: Dict[str, int]            # queue -> messages taken (a batch is one)
+    messages: Dict[str, int]           # queue -> messages handled (batches unpacked)
+    last_tick_messages: Dict[str, int]
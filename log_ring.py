@@ -0,0 +1,36 @@
+# log_ring.py
+# Display-side log buffer: the last `capacity` lines in a fixed ring, each with a sequence number
+# that only grows (1 = first line received). Appending is O(1) and a reader asking for the lines
+# after N only pays for the lines it does not have yet (/api/logs?since=N, /api/stream).
+
+import threading
+
+
+class LogRing:
+    def __init__(self, capacity: int):
+        self.capacity = max(1, int(capacity))
+        self._lines = [None] * self.capacity
+        self.seq = 0   # sequence number of the newest line (0 = nothing yet)
+        self.lock = threading.Lock()
+
+    def append(self, line: str) -> int:
+        with self.lock:
+            self.seq += 1
+            self._lines[self.seq % self.capacity] = line
+            return self.seq
+
+    def since(self, after: int = 0, limit=None):
+        """
+        (newest seq, lines numbered after `after`, oldest first). Lines already dropped by the ring
+        are skipped; with `limit`, only the most recent ones. A number from a previous run
+        (above the current seq) reads from the start.
+        """
+        with self.lock:
+            seq = self.seq
+            after = int(after)
+            if after > seq:
+                after = 0
+            start = max(after + 1, seq - self.capacity + 1)
+            if limit is not None:
+                start = max(start, seq - int(limit) + 1)
+            return seq, [self._lines[s % self.capacity] for s in range(start, seq + 1)]
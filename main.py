@@ -1,21 +1,31 @@
 # main.py
 
+import argparse
 import multiprocessing
 import time
 
 import config
 from shared_env import SharedEnv
+from display_channel import StateChannel, LogChannel
 from env import run_env
 from web_display import run_web_display
 
 def main():
+    ap = argparse.ArgumentParser(description="Circle of Life simulation (env + web display).")
+    ap.add_argument("--resume", metavar="CHECKPOINT", help="restart from a checkpoint file (config.CHECKPOINT_PATH)")
+    args = ap.parse_args()
+
     multiprocessing.set_start_method("spawn", force=True)
 
     shared_env = SharedEnv()
 
-    env_to_display = multiprocessing.Queue()
+    if config.DISPLAY_TRANSPORT == "shm":
+        env_to_display = StateChannel(config.DISPLAY_SLOT_BYTES)
+        log_to_display = LogChannel(config.DISPLAY_LOG_LINES, config.DISPLAY_LOG_LINE_BYTES)
+    else:
+        env_to_display = multiprocessing.Queue()
+        log_to_display = multiprocessing.Queue()
     display_to_env = multiprocessing.Queue()
-    log_to_display = multiprocessing.Queue()
 
     energies_to_env = multiprocessing.Queue()
     events_to_env = multiprocessing.Queue()
@@ -24,6 +34,7 @@ def main():
     env_p = multiprocessing.Process(
         target=run_env,
         args=(shared_env, env_to_display, display_to_env, energies_to_env, events_to_env, log_to_display),
+        kwargs={"resume": args.resume},
         daemon=False,
         name="ENV",
     )
@@ -89,6 +100,10 @@ def main():
         except Exception:
             pass
 
+        if config.DISPLAY_TRANSPORT == "shm":
+            env_to_display.close()
+            log_to_display.close()
+
 
 if __name__ == "__main__":
     main()
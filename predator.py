@@ -1,8 +1,10 @@
 import os
 import time
-import random
 import socket
 import config
+import seeding
+from agent_link import AgentLink
+from tick_sync import Pacer
 
 
 def _join_env_socket(kind: str, host: str, port: int, pid: int):
@@ -18,47 +20,88 @@ def _join_env_socket(kind: str, host: str, port: int, pid: int):
             pass
 
 
-def run_predator(shared_env, energies_to_env, events_to_env, ctrl_q):
-    pid = os.getpid()
-    _join_env_socket("predator", config.ENV_HOST, config.ENV_PORT, pid)
+def predator_on_ctrl(me, msg) -> bool:
+    """Apply one control message to a predator state. False means the predator must die."""
+    if msg[0] == "die":
+        return False
+    elif msg[0] == "hunt_result":
+        if bool(msg[1]):
+            me["energy"] += float(config.PREDATOR_EAT_GAIN)
+    return True
+
+
+def predator_step(me, pid, events_to_env):
+    """One tick of predator behaviour (after control messages)."""
+    # decay
+    me["energy"] -= float(config.PREDATOR_ENERGY_DECAY)
+
+    # active/passive with hysteresis
+    if me["energy"] < config.H_ENERGY:
+        me["active"] = True
+    elif me["energy"] > config.H_ENERGY * 1.5:
+        me["active"] = False
+
+    # Hunt: every tick if active (probabilistic)
+    if me["active"] and me["rng"].random() < config.PRED_HUNT_PROB:
+        events_to_env.put(("hunt", pid))
+
+    # Reproduction: every tick if enough energy (probabilistic)
+    if me["energy"] > config.R_ENERGY and me["rng"].random() < config.PRED_REPRO_PROB:
+        events_to_env.put(("spawn_predator", 1))
+        me["energy"] -= float(config.PRED_REPRO_COST)
 
-    my_energy = float(config.PREDATOR_INITIAL_ENERGY)
-    active = False
 
-    while my_energy > 0 and shared_env.running.value:
-        time.sleep(config.TICK_DURATION)
+def live_predator(shared_env, energies_to_env, events_to_env, ctrl_q, pid, serial: int, first_tick: int = 0,
+              state=None):
+    """
+    One predator life under identity `pid`; returns when it dies (after notifying env).
+    `state` = (energy, active, resume tick) of an animal resumed from a checkpoint, None for a newborn.
+    """
+    pacer = Pacer(shared_env, first_tick)
+    energies_to_env = pacer.track(energies_to_env)
+    events_to_env = pacer.track(events_to_env)
+
+    energies_to_env.put(("ready", "predator", pid, time.monotonic()))
+
+    # own random stream: initial energy and every decision of this life
+    rng = seeding.agent_stream(serial, state[2] if state is not None else None)
+    me = {"energy": float(rng.randint(config.INITIAL_ENERGY_MIN, config.INITIAL_ENERGY_MAX)),
+          "active": False, "rng": rng}
+    if state is not None:
+        me["energy"], me["active"] = float(state[0]), bool(state[1])
+
+    while me["energy"] > 0 and shared_env.running.value:
+        if not pacer.wait():
+            break
 
         # control messages: die / hunt_result
         try:
             while True:
                 msg = ctrl_q.get_nowait()
-                if msg[0] == "die":
+                if not predator_on_ctrl(me, msg):
                     energies_to_env.put(("dead", "predator", pid))
+                    pacer.done()
                     return
-                elif msg[0] == "hunt_result":
-                    if bool(msg[1]):
-                        my_energy += float(config.PREDATOR_EAT_GAIN)
         except Exception:
             pass
 
-        # decay
-        my_energy -= float(config.PREDATOR_ENERGY_DECAY)
+        predator_step(me, pid, events_to_env)
 
-        # active/passive with hysteresis
-        if my_energy < config.H_ENERGY:
-            active = True
-        elif my_energy > config.H_ENERGY * 1.5:
-            active = False
+        energies_to_env.put(("predator", pid, float(me["energy"]), bool(me["active"])))
 
-        # Hunt: every tick if active (probabilistic)
-        if active and random.random() < config.PRED_HUNT_PROB:
-            events_to_env.put(("hunt", pid))
+        if me["energy"] <= 0:
+            break
+        pacer.done()
 
-        # Reproduction: every tick if enough energy (probabilistic)
-        if my_energy > config.R_ENERGY and random.random() < config.PRED_REPRO_PROB:
-            events_to_env.put(("spawn_predator", 1))
-            my_energy -= float(config.PRED_REPRO_COST)
+    energies_to_env.put(("dead", "predator", pid))
+    pacer.done()
 
-        energies_to_env.put(("predator", pid, float(my_energy), bool(active)))
 
-    energies_to_env.put(("dead", "predator", pid))
+def run_predator(shared_env, energies_to_env, events_to_env, ctrl_q, serial: int, first_tick: int = 0, state=None):
+    pid = os.getpid()
+    if config.AGENT_LINK == "socket":
+        link = AgentLink(config.ENV_HOST, config.ENV_PORT, "predator", pid)
+        energies_to_env, events_to_env, ctrl_q = link.attach(energies_to_env, events_to_env, ctrl_q)
+    else:
+        _join_env_socket("predator", config.ENV_HOST, config.ENV_PORT, pid)
+    live_predator(shared_env, energies_to_env, events_to_env, ctrl_q, pid, serial, first_tick, state)
@@ -1,8 +1,10 @@
 import os
 import time
-import random
 import socket
 import config
+import seeding
+from agent_link import AgentLink
+from tick_sync import Pacer
 
 
 def _join_env_socket(kind: str, host: str, port: int, pid: int):
@@ -18,48 +20,89 @@ def _join_env_socket(kind: str, host: str, port: int, pid: int):
             pass
 
 
-def run_prey(shared_env, energies_to_env, events_to_env, ctrl_q):
-    pid = os.getpid()
-    _join_env_socket("prey", config.ENV_HOST, config.ENV_PORT, pid)
+def prey_on_ctrl(me, msg) -> bool:
+    """Apply one control message to a prey state. False means the prey must die."""
+    if msg[0] == "die":
+        return False
+    elif msg[0] == "grass_grant":
+        granted = int(msg[1])
+        me["energy"] += granted * float(config.PREY_GRASS_GAIN_PER_UNIT)
+    return True
+
+
+def prey_step(me, pid, events_to_env):
+    """One tick of prey behaviour (after control messages)."""
+    # decay
+    me["energy"] -= float(config.PREY_ENERGY_DECAY)
+
+    # active/passive
+    if me["energy"] < config.H_ENERGY:
+        me["active"] = True
+    elif me["energy"] > config.H_ENERGY:
+        me["active"] = False
+
+    # Eat: every tick if active (probabilistic)
+    if me["active"] and me["rng"].random() < config.PREY_EAT_PROB:
+        requested = me["rng"].randint( int(config.PREY_MIN_EAT), int(config.R_ENERGY))
+        events_to_env.put(("eat_grass", pid, requested))
 
-    my_energy = float(config.PREY_INITIAL_ENERGY)
-    active = False
+    # Reproduction: every tick if enough energy (probabilistic)
+    if me["energy"] > config.R_ENERGY and me["rng"].random() < config.PREY_REPRO_PROB:
+        events_to_env.put(("spawn_prey", 1))
+        me["energy"] -= config.PREY_REPRO_COST
 
-    while my_energy > 0 and shared_env.running.value:
-        time.sleep(config.TICK_DURATION)
+
+def live_prey(shared_env, energies_to_env, events_to_env, ctrl_q, pid, serial: int, first_tick: int = 0,
+              state=None):
+    """
+    One prey life under identity `pid`; returns when it dies (after notifying env).
+    `state` = (energy, active, resume tick) of an animal resumed from a checkpoint, None for a newborn.
+    """
+    pacer = Pacer(shared_env, first_tick)
+    energies_to_env = pacer.track(energies_to_env)
+    events_to_env = pacer.track(events_to_env)
+
+    energies_to_env.put(("ready", "prey", pid, time.monotonic()))
+
+    # own random stream: initial energy and every decision of this life
+    rng = seeding.agent_stream(serial, state[2] if state is not None else None)
+    me = {"energy": float(rng.randint(config.INITIAL_ENERGY_MIN, config.INITIAL_ENERGY_MAX)),
+          "active": False, "rng": rng}
+    if state is not None:
+        me["energy"], me["active"] = float(state[0]), bool(state[1])
+
+    while me["energy"] > 0 and shared_env.running.value:
+        if not pacer.wait():
+            break
 
         # control messages: die / grass_grant
         try:
             while True:
                 msg = ctrl_q.get_nowait()
-                if msg[0] == "die":
+                if not prey_on_ctrl(me, msg):
                     energies_to_env.put(("dead", "prey", pid))
+                    pacer.done()
                     return
-                elif msg[0] == "grass_grant":
-                    granted = int(msg[1])
-                    my_energy += granted * float(config.PREY_GRASS_GAIN_PER_UNIT)
         except Exception:
             pass
 
-        # decay
-        my_energy -= float(config.PREY_ENERGY_DECAY)
+        prey_step(me, pid, events_to_env)
 
-        # active/passive
-        if my_energy < config.H_ENERGY:
-            active = True
-        elif my_energy > config.H_ENERGY:
-            active = False
+        energies_to_env.put(("prey", pid, float(me["energy"]), bool(me["active"])))
 
-        # Eat: every tick if active (probabilistic)
-        if active and random.random() < config.PREY_EAT_PROB:
-            requested = random.randint( int(config.PREY_MIN_EAT), int(config.R_ENERGY))
-            events_to_env.put(("eat_grass", pid, requested))
+        if me["energy"] <= 0:
+            break
+        pacer.done()
 
-        # Reproduction: every tick if enough energy (probabilistic)
-        if my_energy > config.R_ENERGY and random.random() < config.PREY_REPRO_PROB:
-            events_to_env.put(("spawn_prey", 1))
-            my_energy -= config.PREY_REPRO_COST
+    energies_to_env.put(("dead", "prey", pid))
+    pacer.done()
 
-        energies_to_env.put(("prey", pid, float(my_energy), bool(active)))
 
-    energies_to_env.put(("dead", "prey", pid))
\ No newline at end of file
+def run_prey(shared_env, energies_to_env, events_to_env, ctrl_q, serial: int, first_tick: int = 0, state=None):
+    pid = os.getpid()
+    if config.AGENT_LINK == "socket":
+        link = AgentLink(config.ENV_HOST, config.ENV_PORT, "prey", pid)
+        energies_to_env, events_to_env, ctrl_q = link.attach(energies_to_env, events_to_env, ctrl_q)
+    else:
+        _join_env_socket("prey", config.ENV_HOST, config.ENV_PORT, pid)
+    live_prey(shared_env, energies_to_env, events_to_env, ctrl_q, pid, serial, first_tick, state)
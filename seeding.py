@@ -0,0 +1,45 @@
+# seeding.py
+# Reproducible randomness (config.SEED):
+#  - every animal draws from its own stream, keyed by the spawn serial env gives it
+#    (not its OS pid), so its behaviour does not depend on where or when it runs
+#  - env-side engines (vectorized population) get their own streams too
+# With SEED = None every stream is seeded from OS entropy (original behaviour).
+#
+# Same seed -> same Snapshot sequence needs TICK_MODE = "lockstep" (or the vectorized engine
+# driven by sweep.py): in realtime mode, which tick a message lands in depends on the scheduler.
+
+import random
+import hashlib
+
+import config
+
+
+def _key(*parts) -> str:
+    return ":".join(str(p) for p in (config.SEED,) + parts)
+
+
+def stream(*parts) -> random.Random:
+    """Independent random.Random for the key `parts` (e.g. ("agent", serial))."""
+    if config.SEED is None:
+        return random.Random()
+    # str seeds are hashed with SHA-512 by random.seed: stable across processes and runs
+    return random.Random(_key(*parts))
+
+
+def agent_stream(serial: int, resumed_at=None) -> random.Random:
+    """
+    Stream of the animal with spawn serial `serial`. Env cannot read an animal's stream state, so a
+    checkpoint does not hold it: an animal resumed at tick T (checkpoint.py) keeps its serial and
+    draws from ("agent", serial, "resumed", T) instead. Resuming the same file twice replays the
+    same run; it is not the continuation the uninterrupted run would have drawn.
+    """
+    if resumed_at is None:
+        return stream("agent", int(serial))
+    return stream("agent", int(serial), "resumed", int(resumed_at))
+
+
+def np_seed(*parts):
+    """Seed for numpy.random.default_rng (None -> OS entropy)."""
+    if config.SEED is None:
+        return None
+    return int.from_bytes(hashlib.sha256(_key(*parts).encode("utf-8")).digest()[:8], "little")
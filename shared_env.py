@@ -1,25 +1,106 @@
 # shared_env.py
 # Shared memory structures accessible to ENV + predator/prey processes (NOT display).
+#
+# All global values live in ONE packed shared array of int64, guarded by a seqlock:
+#  - seq | running | tick | grass | drought | preys | predators | generation
+#  - only env writes, inside `with shared_env.lock:` (or one field at a time): the writer lock makes
+#    seq odd for the duration of the write and even again after it
+#  - readers never lock: one field is one aligned 8-byte load, and get_state() copies the whole block
+#    and retries if seq was odd or changed meanwhile
+# So hundreds of animals checking `running.value` every tick never touch env's writer lock.
+# A new global value is one more name in FIELDS.
 
+import time
+import threading
 import multiprocessing
 
+from tick_sync import TickBarrier
+
+
+FIELDS = ("running", "tick", "grass", "drought", "preys", "predators", "generation")
+_BOOLS = {"running", "drought"}
+_SEQ = 0
+
+
+class _Field:
+    """One value of the packed block, with the `.value` interface of multiprocessing.Value."""
+    __slots__ = ("data", "index", "lock")
+
+    def __init__(self, data, index: int, lock):
+        self.data = data
+        self.index = index
+        self.lock = lock
+
+    @property
+    def value(self) -> int:
+        return self.data[self.index]
+
+    @value.setter
+    def value(self, v):
+        if self.lock.held():
+            self.data[self.index] = int(v)
+        else:
+            with self.lock:
+                self.data[self.index] = int(v)
+
+
+class _WriteLock:
+    """`with shared_env.lock:` (env only): serializes writers and bumps the sequence number around the write."""
+    def __init__(self, data, lock=None):
+        self.data = data
+        self.lock = lock or multiprocessing.Lock()
+        self.owner = None   # thread of this process holding the lock
+
+    def __getstate__(self):
+        return {"data": self.data, "lock": self.lock}
+
+    def __setstate__(self, state):
+        self.__init__(state["data"], state["lock"])
+
+    def held(self) -> bool:
+        return self.owner == threading.get_ident()
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.owner = threading.get_ident()
+        self.data[_SEQ] += 1   # odd: write in progress
+        return self
+
+    def __exit__(self, *exc):
+        self.data[_SEQ] += 1
+        self.owner = None
+        self.lock.release()
+        return False
+
 
 class SharedEnv:
     """
-    Shared state stored in shared memory primitives (Value) + a Lock.
+    Shared state in one packed shared-memory block + a writer lock.
     Predator/Prey should READ these values.
     Only env should WRITE them.
     """
     def __init__(self):
-        self.lock = multiprocessing.Lock()
+        self.data = multiprocessing.RawArray("q", 1 + len(FIELDS))
+        self.lock = _WriteLock(self.data)
+        self._fields()
+        with self.lock:
+            self.running.value = True
+
+        # lockstep tick scheduling (config.TICK_MODE = "lockstep")
+        self.barrier = TickBarrier()
 
-        self.running = multiprocessing.Value("b", True)     # bool
-        self.tick = multiprocessing.Value("i", 0)           # int
-        self.grass = multiprocessing.Value("i", 0)          # int
-        self.drought = multiprocessing.Value("b", False)    # bool
+    def _fields(self):
+        for i, name in enumerate(FIELDS):
+            setattr(self, name, _Field(self.data, 1 + i, self.lock))
 
-        self.preys = multiprocessing.Value("i", 0)
-        self.predators = multiprocessing.Value("i", 0)
+    def __getstate__(self):
+        return {"data": self.data, "lock": self.lock, "barrier": self.barrier}
+
+    def __setstate__(self, state):
+        self.data = state["data"]
+        self.lock = state["lock"]
+        self.barrier = state["barrier"]
+        self._fields()
 
     def set_initial(self, grass: int, drought: bool = False):
         with self.lock:
@@ -28,14 +109,17 @@ class SharedEnv:
             self.drought.value = bool(drought)
             self.preys.value = 0
             self.predators.value = 0
+            self.generation.value += 1   # readers can tell a reset happened
 
     def get_state(self):
-        with self.lock:
-            return {
-                "running": bool(self.running.value),
-                "tick": int(self.tick.value),
-                "grass": int(self.grass.value),
-                "drought": bool(self.drought.value),
-                "preys": int(self.preys.value),
-                "predators": int(self.predators.value),
-            }
+        """Consistent copy of every field, without taking the writer lock."""
+        data = self.data
+        while True:
+            seq = data[_SEQ]
+            if seq & 1:
+                time.sleep(0)   # let the writer finish
+                continue
+            values = data[1:]
+            if data[_SEQ] == seq:
+                break
+        return {name: bool(v) if name in _BOOLS else int(v) for name, v in zip(FIELDS, values)}
@@ -0,0 +1,286 @@
+# shm_slots.py
+# Shared-memory telemetry (config.TELEMETRY_TRANSPORT = "shm"):
+#  - TelemetryTable: one fixed slot per live animal (energy, active flag, death flag), written by the animal
+#  - SlotWriter: drop-in for energies_to_env inside an animal process
+# Env reads the whole table in one pass per tick: no pickling, no pipe, no feeder thread, no lock
+# (every slot has a single writer, deaths included).
+#
+# Shared-memory control (config.CONTROL_TRANSPORT = "shm"):
+#  - ControlMailbox: same slots, written by env only (grass granted, meals, kill flag, generation)
+#  - MailboxWriter: drop-in for an animal's ctrl Queue on the env side
+#  - MailboxReader: drop-in for the ctrl Queue inside the animal, polled once per tick
+#
+# A slot is handed out with a generation number; the animal tags every write with it,
+# so writes from a previous occupant of the slot are recognised and ignored by env.
+# Each telemetry slot is a seqlock: seq is odd while the animal writes it, so env never
+# takes the gen of one write with the energy of another, and env skips slots whose seq
+# has not moved since its last read.
+
+import atexit
+import queue
+from array import array
+from multiprocessing import shared_memory
+
+
+class TelemetryTable:
+    """
+    Layout (one shared memory block, column by column):
+      energy f64[cap] | gen u32[cap] | seq u32[cap] | claimed u32[cap] | active u8[cap] | dead u8[cap]
+    seq: 0 = not written since claim(), odd = write in progress, even = stable.
+    claimed: generation the slot was claimed for (env); dead: set by that occupant as its last write,
+    swept by env with the telemetry.
+    """
+    READ_RETRIES = 100
+    def __init__(self, capacity: int, name=None):
+        self.capacity = int(capacity)
+        size = self.capacity * (8 + 4 + 4 + 4 + 1 + 1)
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self._views()
+        self.last_seq = array("I", bytes(4 * self.capacity))   # env side: seq of the last read per slot
+
+    def _views(self):
+        cap = self.capacity
+        buf = self.shm.buf
+        self.energy = buf[0:8 * cap].cast("d")
+        self.gen = buf[8 * cap:12 * cap].cast("I")
+        self.seq = buf[12 * cap:16 * cap].cast("I")
+        self.claimed = buf[16 * cap:20 * cap].cast("I")
+        self.active = buf[20 * cap:21 * cap]
+        self.dead = buf[21 * cap:22 * cap]
+
+    def __getstate__(self):
+        return {"capacity": self.capacity, "name": self.shm.name}
+
+    def __setstate__(self, state):
+        self.capacity = state["capacity"]
+        self.shm = shared_memory.SharedMemory(name=state["name"])
+        self.owner = False
+        self._views()
+        self.last_seq = None   # animals only write
+        # views must be released before SharedMemory.__del__ closes the mapping
+        atexit.register(self.close)
+
+    # ---- animal side ----
+    def write(self, slot: int, gen: int, energy: float, active: bool):
+        seq = self.seq[slot]
+        self.seq[slot] = (seq | 1) & 0xFFFFFFFF   # odd: write in progress
+        self.energy[slot] = energy
+        self.active[slot] = 1 if active else 0
+        self.gen[slot] = gen
+        self.seq[slot] = ((seq | 1) + 1) & 0xFFFFFFFF or 2   # even, never 0 again
+
+    def mark_dead(self, slot: int, gen: int) -> bool:
+        """
+        Last write of an animal. False if the slot has been claimed again since (an animal told to
+        die by a reset): env has forgotten it, and its flag must not land on the new occupant.
+        """
+        if self.claimed[slot] != gen:
+            return False
+        self.dead[slot] = 1
+        return True
+
+    # ---- env side ----
+    def claim(self, slot: int, gen: int):
+        """Clear a slot before handing it to a new animal of generation `gen`."""
+        self.gen[slot] = 0
+        self.seq[slot] = 0
+        self.energy[slot] = 0.0
+        self.active[slot] = 0
+        self.dead[slot] = 0
+        self.claimed[slot] = gen
+        self.last_seq[slot] = 0
+
+    def read(self, slot: int, gen: int):
+        """
+        (energy, active) written by the current occupant since the last read, or None if it has
+        written nothing new (or the slot is mid-write for longer than READ_RETRIES copies).
+        """
+        seq_col = self.seq
+        last = self.last_seq[slot]
+        for _ in range(self.READ_RETRIES):
+            seq = seq_col[slot]
+            if seq == last or seq == 0:
+                return None
+            if seq & 1:
+                continue
+            g, energy, active = self.gen[slot], self.energy[slot], self.active[slot]
+            if seq_col[slot] != seq:
+                continue
+            self.last_seq[slot] = seq
+            if g != gen:
+                return None
+            return energy, bool(active)
+        return None
+
+    def is_dead(self, slot: int) -> bool:
+        """The occupant the slot was claimed for has died (read after its last telemetry)."""
+        return bool(self.dead[slot])
+
+    def close(self):
+        if self.shm is None:
+            return
+        for v in (self.energy, self.gen, self.seq, self.claimed, self.active, self.dead):
+            v.release()
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except Exception:
+                pass
+        self.shm = None
+
+
+class ControlMailbox:
+    """
+    Layout (one shared memory block, column by column):
+      grass u64[cap] | gen u32[cap] | meals u32[cap] | kill u8[cap]
+    grass/meals are running totals written only by env; the animal remembers what it has
+    already applied, so there is no read-modify-write race between the two sides.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = int(capacity)
+        self.shm = shared_memory.SharedMemory(create=True, size=self.capacity * (8 + 4 + 4 + 1))
+        self.owner = True
+        self._views()
+
+    def _views(self):
+        cap = self.capacity
+        buf = self.shm.buf
+        self.grass = buf[0:8 * cap].cast("Q")
+        self.gen = buf[8 * cap:12 * cap].cast("I")
+        self.meals = buf[12 * cap:16 * cap].cast("I")
+        self.kill = buf[16 * cap:17 * cap]
+
+    def __getstate__(self):
+        return {"capacity": self.capacity, "name": self.shm.name}
+
+    def __setstate__(self, state):
+        self.capacity = state["capacity"]
+        self.shm = shared_memory.SharedMemory(name=state["name"])
+        self.owner = False
+        self._views()
+        atexit.register(self.close)
+
+    def claim(self, slot: int, gen: int):
+        """Reset a slot for a new animal; the new generation tells a previous occupant to stop."""
+        self.kill[slot] = 0
+        self.grass[slot] = 0
+        self.meals[slot] = 0
+        self.gen[slot] = gen
+
+    def close(self):
+        if self.shm is None:
+            return
+        for v in (self.grass, self.gen, self.meals, self.kill):
+            v.release()
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except Exception:
+                pass
+        self.shm = None
+
+
+class MailboxWriter:
+    """Env side of one animal's mailbox, with the ctrl Queue put() interface."""
+    def __init__(self, mailbox: ControlMailbox, slot: int):
+        self.mailbox = mailbox
+        self.slot = slot
+
+    def put(self, msg):
+        mb = self.mailbox
+        if msg[0] == "die":
+            mb.kill[self.slot] = 1
+        elif msg[0] == "grass_grant":
+            mb.grass[self.slot] += max(0, int(msg[1]))
+        elif msg[0] == "hunt_result":
+            if bool(msg[1]):
+                mb.meals[self.slot] = (mb.meals[self.slot] + 1) & 0xFFFFFFFF
+
+
+class MailboxReader:
+    """
+    Animal side of its mailbox, with the ctrl Queue get_nowait() interface:
+    each drain (get_nowait until queue.Empty) reads the slot once and turns what changed
+    into the usual ("die",) / ("grass_grant", n) / ("hunt_result", True) messages.
+    """
+    def __init__(self, mailbox: ControlMailbox, slot: int, gen: int):
+        self.mailbox = mailbox
+        self.slot = slot
+        self.gen = gen
+        self.grass_seen = 0
+        self.meals_seen = 0
+        self.pending = []
+        self.polled = False
+
+    def _poll(self):
+        mb = self.mailbox
+        slot = self.slot
+        if mb.gen[slot] != self.gen or mb.kill[slot]:
+            self.pending.append(("die",))
+            return
+        grass = mb.grass[slot]
+        if grass != self.grass_seen:
+            self.pending.append(("grass_grant", grass - self.grass_seen))
+            self.grass_seen = grass
+        meals = mb.meals[slot]
+        while self.meals_seen != meals:
+            self.pending.append(("hunt_result", True))
+            self.meals_seen = (self.meals_seen + 1) & 0xFFFFFFFF
+
+    def get_nowait(self):
+        if not self.pending and not self.polled:
+            self._poll()
+            self.polled = True
+        if self.pending:
+            return self.pending.pop(0)
+        self.polled = False
+        raise queue.Empty
+
+
+class SlotAllocator:
+    """Env-side free list of table slots, with a generation counter per hand-out."""
+    def __init__(self, capacity: int):
+        self.capacity = int(capacity)
+        self.free = list(range(self.capacity - 1, -1, -1))
+        self._gen = 0
+
+    def allocate(self):
+        if not self.free:
+            return None
+        self._gen = (self._gen % 0xFFFFFFFF) + 1   # never 0 (0 = unclaimed slot)
+        return self.free.pop(), self._gen
+
+    def release(self, slot: int):
+        self.free.append(slot)
+
+    def reset(self):
+        # generations keep counting, so writers from before the reset stay recognisable
+        self.free = list(range(self.capacity - 1, -1, -1))
+
+
+class SlotWriter:
+    """
+    Given to an animal instead of energies_to_env: per-tick telemetry and its death go to its slot,
+    anything else ("ready", ...) to the real queue.
+    """
+    def __init__(self, table: TelemetryTable, queue, slot: int, gen: int):
+        self.table = table
+        self.queue = queue
+        self.slot = slot
+        self.gen = gen
+
+    def put(self, msg):
+        if msg[0] in ("prey", "predator"):
+            self.table.write(self.slot, self.gen, float(msg[2]), bool(msg[3]))
+        elif msg[0] == "dead":
+            # nobody to tell once the slot has been claimed again (see mark_dead)
+            self.table.mark_dead(self.slot, self.gen)
+        else:
+            self.queue.put(msg)
@@ -0,0 +1,237 @@
+# snapshot_log.py
+# Append-only on-disk log of every Snapshot of a run (config.SNAPSHOT_LOG_PATH), memory-mapped:
+#  - env appends one fixed-width binary record per tick (SnapshotLogWriter)
+#  - records are in tick order, so record i is found by a binary search on the tick column:
+#    any tick is read without parsing the rest of the file (SnapshotLogReader)
+#  - replay() feeds a recorded run to web_display at any speed
+#
+#   python3 snapshot_log.py run.snap --info
+#   python3 snapshot_log.py run.snap --speed 10 --from 500      # replay on http://127.0.0.1:WEB_PORT
+#
+# Layout: 64-byte header (magic, version, percentiles per kind, histogram bins, record size, record count)
+# then the records. The count is written after each record, so a reader never sees a partial one.
+
+import os
+import mmap
+import time
+import struct
+import argparse
+
+import config
+from ipc import Snapshot
+
+
+MAGIC = b"CLSNAP\x00\x01"
+VERSION = 1
+HEADER = struct.Struct("<8sHHHxxIQ")
+HEADER_SIZE = 64
+_COUNT_AT = HEADER.size - 8
+_TICK = struct.Struct("<q")
+
+
+def _record_struct(n_pct: int, n_bins: int) -> struct.Struct:
+    # tick, predators, preys, grass, drought | energy stats x2 | probs x2 | spawn latency | pct x2 | hist x2
+    return struct.Struct(f"<q3i?3d3d2d2d2d{n_pct}d{n_pct}d{n_bins}I{n_bins}I")
+
+
+def _fit(values, n: int, fill):
+    values = tuple(values)[:n]
+    return values + (fill,) * (n - len(values))
+
+
+class SnapshotLogWriter:
+    def __init__(self, path: str, n_pct: int, n_bins: int, grow: int = 4096):
+        self.path = path
+        self.n_pct = int(n_pct)
+        self.n_bins = int(n_bins)
+        self.record = _record_struct(self.n_pct, self.n_bins)
+        self.grow = max(1, int(grow))   # records added to the file at a time
+        self.count = 0
+        self.last_tick = None
+
+        self.f = open(path, "w+b")
+        self.f.write(HEADER.pack(MAGIC, VERSION, self.n_pct, self.n_bins, self.record.size, 0)
+                     .ljust(HEADER_SIZE, b"\0"))
+        self.mm = None
+        self._map(HEADER_SIZE + self.grow * self.record.size)
+
+    def _map(self, size: int):
+        if self.mm is not None:
+            self.mm.close()
+        self.f.truncate(size)
+        self.mm = mmap.mmap(self.f.fileno(), size)
+
+    def append(self, s: Snapshot):
+        if self.last_tick is not None and s.tick <= self.last_tick:
+            raise ValueError(f"snapshot log: tick {s.tick} after {self.last_tick}")
+        off = HEADER_SIZE + self.count * self.record.size
+        if off + self.record.size > len(self.mm):
+            self._map(len(self.mm) + max(len(self.mm) - HEADER_SIZE, self.grow * self.record.size))
+
+        self.record.pack_into(
+            self.mm, off,
+            s.tick, s.predators, s.preys, s.grass, bool(s.drought),
+            *s.prey_energy_stats, *s.predator_energy_stats, *s.prey_probs, *s.pred_probs, *s.spawn_latency_ms,
+            *_fit(s.prey_energy_pct, self.n_pct, 0.0), *_fit(s.predator_energy_pct, self.n_pct, 0.0),
+            *_fit(s.prey_energy_hist, self.n_bins, 0), *_fit(s.predator_energy_hist, self.n_bins, 0),
+        )
+        self.count += 1
+        self.last_tick = s.tick
+        struct.pack_into("<Q", self.mm, _COUNT_AT, self.count)
+
+    def close(self):
+        if self.mm is None:
+            return
+        self.mm.flush()
+        self.mm.close()
+        self.mm = None
+        self.f.truncate(HEADER_SIZE + self.count * self.record.size)
+        self.f.close()
+
+
+class SnapshotLogReader:
+    """Random access to a snapshot log, also while env is still appending to it."""
+    def __init__(self, path: str):
+        self.path = path
+        self.f = open(path, "rb")
+        magic, version, n_pct, n_bins, size, _count = HEADER.unpack(self.f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a snapshot log")
+        self.n_pct = n_pct
+        self.n_bins = n_bins
+        self.record = _record_struct(n_pct, n_bins)
+        if size != self.record.size:
+            raise ValueError(f"{path}: record size {size}, expected {self.record.size}")
+        self.mm = None
+        self._map()
+
+    def _map(self):
+        if self.mm is not None:
+            self.mm.close()
+        self.mm = mmap.mmap(self.f.fileno(), os.fstat(self.f.fileno()).st_size, access=mmap.ACCESS_READ)
+
+    def close(self):
+        self.mm.close()
+        self.f.close()
+
+    def __len__(self):
+        return struct.unpack_from("<Q", self.mm, _COUNT_AT)[0]
+
+    def _offset(self, i: int) -> int:
+        """File offset of record i, remapping first if the writer grew the file (self.mm may change)."""
+        off = HEADER_SIZE + i * self.record.size
+        if off + self.record.size > len(self.mm):
+            self._map()
+        return off
+
+    def tick_at(self, i: int) -> int:
+        off = self._offset(i)
+        return _TICK.unpack_from(self.mm, off)[0]
+
+    def __getitem__(self, i: int) -> Snapshot:
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(i)
+        off = self._offset(i)
+        v = self.record.unpack_from(self.mm, off)
+        p, b = self.n_pct, self.n_bins
+        return Snapshot(
+            tick=v[0], predators=v[1], preys=v[2], grass=v[3], drought=v[4],
+            prey_energy_stats=v[5:8], predator_energy_stats=v[8:11],
+            prey_probs=v[11:13], pred_probs=v[13:15], spawn_latency_ms=v[15:17],
+            prey_energy_pct=v[17:17 + p], predator_energy_pct=v[17 + p:17 + 2 * p],
+            prey_energy_hist=v[17 + 2 * p:17 + 2 * p + b], predator_energy_hist=v[17 + 2 * p + b:],
+        )
+
+    def index(self, tick: int) -> int:
+        """Index of the first record at or after `tick` (len(self) if none)."""
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.tick_at(mid) < tick:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def at(self, tick: int):
+        """Snapshot of `tick`, None if it was not recorded."""
+        i = self.index(tick)
+        if i < len(self) and self.tick_at(i) == tick:
+            return self[i]
+        return None
+
+    def snapshots(self, first=None, last=None):
+        i = 0 if first is None else self.index(first)
+        while i < len(self):
+            s = self[i]
+            if last is not None and s.tick > last:
+                return
+            yield s
+            i += 1
+
+
+def replay(reader: SnapshotLogReader, env_to_display, speed: float = 1.0, first=None, last=None,
+           tick_duration: float = config.TICK_DURATION):
+    """Puts the recorded snapshots on env_to_display, `speed` times faster than recorded (<= 0: no wait)."""
+    t0 = time.monotonic()
+    start = None
+    for s in reader.snapshots(first, last):
+        if start is None:
+            start = s.tick
+        if speed > 0:
+            delay = t0 + (s.tick - start) * tick_duration / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        env_to_display.put(s)
+
+
+def main(argv=None):
+    import multiprocessing
+    from web_display import run_web_display
+
+    ap = argparse.ArgumentParser(description="Inspect or replay a snapshot log into the web display.")
+    ap.add_argument("path")
+    ap.add_argument("--info", action="store_true", help="print the record count and tick range, then exit")
+    ap.add_argument("--speed", type=float, default=1.0, help="replay speed (x real time, 0 = as fast as possible)")
+    ap.add_argument("--from", dest="first", type=int, default=None)
+    ap.add_argument("--to", dest="last", type=int, default=None)
+    ap.add_argument("--port", type=int, default=config.WEB_PORT)
+    args = ap.parse_args(argv)
+
+    reader = SnapshotLogReader(args.path)
+    if args.info:
+        n = len(reader)
+        print(f"{args.path}: {n} snapshots", f"(ticks {reader.tick_at(0)}..{reader.tick_at(n - 1)})" if n else "")
+        return
+
+    multiprocessing.set_start_method("spawn", force=True)
+    env_to_display = multiprocessing.Queue()
+    display_to_env = multiprocessing.Queue()   # UI commands have no env to go to
+    log_to_display = multiprocessing.Queue()
+    disp_p = multiprocessing.Process(
+        target=run_web_display,
+        args=(env_to_display, display_to_env, log_to_display, "127.0.0.1", args.port),
+        daemon=True,
+        name="DISPLAY",
+    )
+    disp_p.start()
+    print(f"Open: http://127.0.0.1:{args.port}")
+
+    try:
+        log_to_display.put(f"⏯️ Replay of {args.path} (x{args.speed:g})")
+        replay(reader, env_to_display, args.speed, args.first, args.last)
+        log_to_display.put("⏹️ Replay finished")
+        while disp_p.is_alive():
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+        disp_p.terminate()
+
+
+if __name__ == "__main__":
+    main()
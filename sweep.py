@@ -0,0 +1,121 @@
+# sweep.py
+# Headless parameter sweeps: no web display, no process per animal.
+# Every combination of the --param grids runs run_env for a fixed number of ticks
+# (vectorized engine, lockstep at max speed) in its own worker of a ProcessPoolExecutor,
+# and the per-tick Snapshot series of all runs are written to one columnar .npz file.
+#
+#   python3 sweep.py --param PRED_HUNT_PROB=0.4,0.6,0.8 --param GRASS_GROWTH_PER_TICK=50,100 \
+#                    --ticks 2000 --preys 2000 --predators 300 --out sweep.npz
+
+import os
+import ast
+import time
+import queue
+import argparse
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import fields
+
+import config
+from ipc import Snapshot, DisplayCommand
+
+
+def _parse_param(text: str):
+    name, _, values = text.partition("=")
+    name = name.strip()
+    if not name or not values:
+        raise argparse.ArgumentTypeError(f"expected NAME=v1,v2,... got {text!r}")
+    if not hasattr(config, name):
+        raise argparse.ArgumentTypeError(f"unknown config parameter {name!r}")
+    return name, [ast.literal_eval(v.strip()) for v in values.split(",")]
+
+
+def _flatten(snapshot: Snapshot):
+    """One row per Snapshot (tuple fields become name_0, name_1, ...)."""
+    row = {}
+    for f in fields(Snapshot):
+        v = getattr(snapshot, f.name)
+        if isinstance(v, (tuple, list)):
+            for i, x in enumerate(v):
+                row[f"{f.name}_{i}"] = float(x)
+        else:
+            row[f.name] = float(v)
+    return row
+
+
+def run_scenario(index: int, overrides: dict, ticks: int, preys: int, predators: int):
+    """Run one scenario in this process; returns (index, list of flattened snapshots)."""
+    for name, value in overrides.items():
+        setattr(config, name, value)
+    config.ENGINE_MODE = "vectorized"
+    config.TICK_MODE = "lockstep"
+    config.LOCKSTEP_MAX_SPEED = True
+    config.ENV_PORT = 0   # any free port: scenarios run side by side
+
+    from shared_env import SharedEnv
+    from env import run_env, NoLog
+
+    shared_env = SharedEnv()
+    env_to_display = queue.Queue()
+    display_to_env = queue.Queue()
+    display_to_env.put(DisplayCommand(cmd="add_prey", args={"value": preys}))
+    display_to_env.put(DisplayCommand(cmd="add_predator", args={"value": predators}))
+
+    run_env(shared_env, env_to_display, display_to_env,
+            queue.Queue(), queue.Queue(), NoLog(), max_ticks=ticks)
+
+    rows = []
+    while not env_to_display.empty():
+        msg = env_to_display.get_nowait()
+        if isinstance(msg, Snapshot):   # skip MetricsReport
+            rows.append(_flatten(msg))
+    return index, rows
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Headless parameter sweep over config.py values.")
+    ap.add_argument("--param", action="append", type=_parse_param, default=[],
+                    help="NAME=v1,v2,... (repeatable; the grid is the cartesian product)")
+    ap.add_argument("--ticks", type=int, default=1000)
+    ap.add_argument("--preys", type=int, default=1000)
+    ap.add_argument("--predators", type=int, default=200)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--out", default="sweep.npz")
+    args = ap.parse_args(argv)
+
+    import numpy as np
+
+    names = [name for name, _ in args.param]
+    grid = [dict(zip(names, combo)) for combo in itertools.product(*(values for _, values in args.param))]
+    print(f"{len(grid)} scenarios x {args.ticks} ticks on {args.workers} workers")
+
+    t0 = time.monotonic()
+    results = {}
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=ctx, max_tasks_per_child=1) as ex:
+        futures = [ex.submit(run_scenario, i, overrides, args.ticks, args.preys, args.predators)
+                   for i, overrides in enumerate(grid)]
+        for fut in as_completed(futures):
+            index, rows = fut.result()
+            results[index] = rows
+            print(f"  [{len(results)}/{len(grid)}] {grid[index]} -> {len(rows)} ticks")
+
+    # one column per Snapshot field (+ scenario index and swept parameters), one row per tick
+    columns = {"scenario": []}
+    for name in names:
+        columns[f"param_{name}"] = []
+    for index in sorted(results):
+        for row in results[index]:
+            columns["scenario"].append(index)
+            for name in names:
+                columns[f"param_{name}"].append(grid[index][name])
+            for key, value in row.items():
+                columns.setdefault(key, []).append(value)
+
+    np.savez_compressed(args.out, **{k: np.asarray(v) for k, v in columns.items()})
+    print(f"wrote {args.out} ({len(columns['scenario'])} rows) in {time.monotonic() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# tick_log.py
+# Env log lines about the animals (eat, hunt, births, deaths), with a verbosity that can change at runtime:
+#  - "events"  : one line per event (original behaviour, traffic grows with the population)
+#  - "summary" : events are counted and folded into one line per tick; a random sample
+#                (config.LOG_SAMPLE_RATE) of the individual lines is still sent
+#  - "quiet"   : counters only, no line
+# Env-level lines (reset, drought, grass set, UI spawns, stop) do not go through here.
+
+import collections
+
+
+LEVELS = ("quiet", "summary", "events")
+
+
+class TickLog:
+    def __init__(self, emit, level: str, sample_rate: float, rng):
+        self.emit = emit      # callable(line)
+        self.rng = rng        # only drawn from for sampling (own stream, see seeding.py)
+        self.counts = collections.Counter()
+        self.set_level(level, sample_rate)
+
+    def set_level(self, level: str, sample_rate=None):
+        if level not in LEVELS:
+            raise ValueError(f"log level must be one of {LEVELS}, got {level!r}")
+        self.level = level
+        if sample_rate is not None:
+            self.sample_rate = min(1.0, max(0.0, float(sample_rate)))
+
+    def event(self, line: str, *args, **counts):
+        """
+        One event: `counts` are added to the tick counters, `line` is formatted with `args`
+        only when it is actually sent (every event in "events", sampled in "summary").
+        """
+        self.counts.update(counts)
+        if self.level == "events" or (
+                self.level == "summary" and self.sample_rate > 0 and self.rng.random() < self.sample_rate):
+            self.emit(line.format(*args) if args else line)
+
+    def flush(self, tick: int):
+        """End of tick: the summary line ("summary" only), counters back to zero."""
+        c = self.counts
+        if self.level == "summary" and +c:
+            parts = []
+            if c["eaters"]:
+                parts.append(f"🐇 {c['eaters']} ask for grass, {c['grass']} eaten ({c['starving']} without)")
+            if c["hunts"]:
+                parts.append(f"🦁 {c['kills']}/{c['hunts']} hunts succeed")
+            if c["prey_births"] or c["predator_births"]:
+                parts.append(f"👶 +{c['prey_births']} prey +{c['predator_births']} predator")
+            if c["prey_deaths"] or c["predator_deaths"]:
+                parts.append(f"☠️ {c['prey_deaths']} prey / {c['predator_deaths']} predator dead")
+            if parts:
+                self.emit(f"📊 Tick {tick}: " + " | ".join(parts))
+        c.clear()
@@ -0,0 +1,124 @@
+# tick_metrics.py
+# Env tick instrumentation:
+#  - duration histogram per phase of the main loop (and of the whole tick)
+#  - messages drained from / handled for each queue, in total and for the last tick
+#  - ticks that took longer than TICK_DURATION (overruns)
+# Env sends a MetricsReport on env_to_display every config.METRICS_EVERY_TICKS ticks;
+# web_display serves the latest one as Prometheus text on /api/metrics (to_prometheus).
+
+import time
+
+from ipc import MetricsReport
+
+
+PHASES = ("commands", "barrier", "telemetry", "actions", "engine", "grass", "snapshot", "tick")
+QUEUES = ("energies_to_env", "events_to_env", "telemetry_shm", "agent_link")
+
+
+class TickMetrics:
+    def __init__(self, buckets_ms):
+        self.buckets_ms = tuple(sorted(float(b) for b in buckets_ms))
+        self._bounds = [b / 1000.0 for b in self.buckets_ms]
+        self.phases = {p: [0] * (len(self.buckets_ms) + 1) for p in PHASES}
+        self.phase_sums = {p: 0.0 for p in PHASES}
+        self.ticks = 0
+        self.tick_overruns = 0
+        self.drained = {q: 0 for q in QUEUES}
+        self.messages = {q: 0 for q in QUEUES}
+        self.last_tick_messages = {q: 0 for q in QUEUES}
+        self._t0 = self._t = time.perf_counter()
+
+    def _observe(self, phase: str, seconds: float):
+        i = 0
+        bounds = self._bounds
+        while i < len(bounds) and seconds > bounds[i]:
+            i += 1
+        self.phases[phase][i] += 1
+        self.phase_sums[phase] += seconds
+
+    def start(self):
+        self._t0 = self._t = time.perf_counter()
+        for q in QUEUES:
+            self.last_tick_messages[q] = 0
+
+    def lap(self, phase: str):
+        """The phase `phase` ends now (it started at the previous lap or at start())."""
+        now = time.perf_counter()
+        self._observe(phase, now - self._t)
+        self._t = now
+
+    def drain(self, queue: str, drained: int, messages: int):
+        self.drained[queue] += drained
+        self.messages[queue] += messages
+        self.last_tick_messages[queue] += messages
+
+    def end_tick(self, budget: float):
+        seconds = time.perf_counter() - self._t0
+        self._observe("tick", seconds)
+        self.ticks += 1
+        if seconds > budget:
+            self.tick_overruns += 1
+
+    def report(self, tick: int) -> MetricsReport:
+        return MetricsReport(
+            tick=tick,
+            buckets_ms=self.buckets_ms,
+            phases={p: list(c) for p, c in self.phases.items()},
+            phase_sums=dict(self.phase_sums),
+            ticks=self.ticks,
+            tick_overruns=self.tick_overruns,
+            drained=dict(self.drained),
+            messages=dict(self.messages),
+            last_tick_messages=dict(self.last_tick_messages),
+        )
+
+
+def to_prometheus(report: MetricsReport, display=None) -> str:
+    """
+    Prometheus text exposition format (version 0.0.4).
+    `display`: counters of the display side, {"snapshots_skipped": n, "logs_dropped": n}.
+    """
+    out = []
+
+    out.append("# HELP circle_tick_phase_seconds Duration of each phase of the env tick.")
+    out.append("# TYPE circle_tick_phase_seconds histogram")
+    for phase, counts in report.phases.items():
+        total = 0
+        for bound, n in zip(report.buckets_ms, counts):
+            total += n
+            out.append(f'circle_tick_phase_seconds_bucket{{phase="{phase}",le="{bound / 1000.0:g}"}} {total}')
+        total += counts[-1]
+        out.append(f'circle_tick_phase_seconds_bucket{{phase="{phase}",le="+Inf"}} {total}')
+        out.append(f'circle_tick_phase_seconds_sum{{phase="{phase}"}} {report.phase_sums[phase]:.9f}')
+        out.append(f'circle_tick_phase_seconds_count{{phase="{phase}"}} {total}')
+
+    out.append("# HELP circle_ticks_total Ticks run by env.")
+    out.append("# TYPE circle_ticks_total counter")
+    out.append(f"circle_ticks_total {report.ticks}")
+    out.append("# HELP circle_tick_overruns_total Ticks that took longer than TICK_DURATION.")
+    out.append("# TYPE circle_tick_overruns_total counter")
+    out.append(f"circle_tick_overruns_total {report.tick_overruns}")
+
+    for name, values, kind, help_text in (
+        ("circle_queue_drained_total", report.drained, "counter", "Messages taken from each queue (a batch counts once)."),
+        ("circle_messages_total", report.messages, "counter", "Messages handled per source (batches unpacked)."),
+        ("circle_messages_last_tick", report.last_tick_messages, "gauge", "Messages handled per source in the last tick."),
+    ):
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} {kind}")
+        for q, v in values.items():
+            out.append(f'{name}{{queue="{q}"}} {v}')
+
+    out.append("# HELP circle_tick Last tick reported by env.")
+    out.append("# TYPE circle_tick gauge")
+    out.append(f"circle_tick {report.tick}")
+
+    for name, help_text in (
+        ("snapshots_skipped", "Snapshots replaced by a newer one before the display read them."),
+        ("logs_dropped", "Log lines overwritten before the display read them."),
+    ):
+        if display and name in display:
+            out.append(f"# HELP circle_display_{name}_total {help_text}")
+            out.append(f"# TYPE circle_display_{name}_total counter")
+            out.append(f"circle_display_{name}_total {display[name]}")
+    return "\n".join(out) + "\n"
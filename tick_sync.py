@@ -0,0 +1,110 @@
+# tick_sync.py
+# Tick scheduling (config.TICK_MODE):
+#  - "realtime": env and every animal sleep TICK_DURATION on their own (original behaviour)
+#  - "lockstep": env publishes a tick number, every participant (animal process or shard worker)
+#    acts exactly once for it and acks, and env moves on as soon as all acks are in.
+#    With LOCKSTEP_MAX_SPEED nobody sleeps, so a run goes as fast as the machine allows.
+#
+# Queue messages are counted when they are put, so that after the acks env can also wait until
+# every message of the tick has come out of the queues (mp.Queue delivers through a feeder thread).
+
+import time
+import multiprocessing
+
+import config
+from shm_slots import SlotWriter
+
+
+class TickBarrier:
+    """
+    Lives in SharedEnv. state = [published tick, acks for that tick, queue messages sent (running total)]
+    """
+    def __init__(self):
+        self.cond = multiprocessing.Condition()
+        self.state = multiprocessing.RawArray("q", 3)
+        self.state[0] = -1
+
+    # ---- env side ----
+    def next_tick(self) -> int:
+        """First tick an animal spawned now takes part in."""
+        return int(self.state[0]) + 1
+
+    def publish(self, tick: int):
+        with self.cond:
+            self.state[0] = tick
+            self.state[1] = 0
+            self.cond.notify_all()
+
+    def wait_acks(self, expected: int, timeout: float) -> bool:
+        with self.cond:
+            return self.cond.wait_for(lambda: self.state[1] >= expected, timeout)
+
+    def sent(self) -> int:
+        return int(self.state[2])
+
+    # ---- participant side ----
+    def wait_for(self, tick: int, running):
+        """Block until tick `tick` (or a later one) is published; None once the simulation stops."""
+        with self.cond:
+            while self.state[0] < tick:
+                if not running.value:
+                    return None
+                self.cond.wait(0.5)
+            return int(self.state[0])
+
+    def ack(self, tick: int):
+        with self.cond:
+            if self.state[0] == tick:
+                self.state[1] += 1
+                self.cond.notify_all()
+
+    def count_sent(self, n: int = 1):
+        with self.cond:
+            self.state[2] += n
+
+
+class _Counted:
+    """Queue wrapper that declares each put to the barrier before doing it."""
+    def __init__(self, q, barrier: TickBarrier):
+        self.q = q
+        self.barrier = barrier
+
+    def put(self, msg):
+        self.barrier.count_sent()
+        self.q.put(msg)
+
+
+class Pacer:
+    """How a participant waits for its next tick: sleep, or the env barrier in lockstep mode."""
+    def __init__(self, shared_env, first_tick: int = 0):
+        self.shared_env = shared_env
+        self.barrier = shared_env.barrier if config.TICK_MODE == "lockstep" else None
+        self.next = int(first_tick)
+        self.tick = None
+
+    def track(self, q):
+        """Wrap a queue this participant puts to, so env knows how many messages to wait for."""
+        if self.barrier is None:
+            return q
+        if isinstance(q, SlotWriter):
+            q.queue = _Counted(q.queue, self.barrier)
+            return q
+        return _Counted(q, self.barrier)
+
+    def wait(self) -> bool:
+        """Wait for the next tick to act on; False once the simulation stops."""
+        if self.barrier is None:
+            time.sleep(config.TICK_DURATION)
+            return True
+        t = self.barrier.wait_for(self.next, self.shared_env.running)
+        if t is None:
+            return False
+        self.tick = t
+        self.next = t + 1
+        return True
+
+    def done(self):
+        """This participant has finished the current tick (all its messages are put)."""
+        if self.barrier is not None and self.tick is not None:
+            self.barrier.ack(self.tick)
+            self.tick = None
@@ -0,0 +1,342 @@
+# vector_engine.py
+# In-process population engine (config.ENGINE_MODE = "vectorized").
+# Every prey/predator is one row of NumPy structure-of-arrays tables owned by env,
+# and the rules of run_prey / run_predator are applied to the whole table per tick.
+
+from typing import NamedTuple
+
+import numpy as np
+
+import config
+
+
+PREY = 0
+PREDATOR = 1
+
+
+class TickOutcome(NamedTuple):
+    eaters: int            # preys that asked for grass
+    eaten: int             # grass units granted
+    starving: int          # eaters that got nothing
+    hunters: int
+    kills: int
+    prey_births: int
+    predator_births: int
+    prey_deaths: int       # starved + predated
+    predator_deaths: int
+    ghost_kills: object = None   # step(ghosts=...): indices of the ghost preys caught this tick
+
+
+class VectorPopulation:
+    """
+    All animals of the simulation in flat arrays (energy, active, kind, alive).
+    Rows [0, size) are in use; dead rows are compacted away at the end of each step.
+
+    Messages of the per-process model map to columns:
+      grass_grant -> pending_grass, hunt_result -> pending_meal, die -> alive = False
+    and, like the ctrl queues, they are applied at the start of the next tick.
+
+    With a `world` (grid_world.GridWorld), animals also have a position (x, y), move every tick,
+    eat the grass of their cell and only hunt preys within config.WORLD_HUNT_RADIUS.
+    Every row has an id (never reused), so other shards can name an animal across ticks (cluster.py).
+    """
+    def __init__(self, capacity: int = 1024, seed=None, world=None):
+        self.rng = np.random.default_rng(seed)
+        self.world = world
+        self.size = 0
+        self.next_id = 0
+        self._alloc(max(1, int(capacity)))
+
+    def _alloc(self, capacity: int):
+        old = getattr(self, "energy", None)
+        n = self.size
+
+        energy = np.zeros(capacity, dtype=np.float64)
+        active = np.zeros(capacity, dtype=bool)
+        kind = np.zeros(capacity, dtype=np.int8)
+        alive = np.zeros(capacity, dtype=bool)
+        pending_grass = np.zeros(capacity, dtype=np.int64)
+        pending_meal = np.zeros(capacity, dtype=bool)
+        x = np.zeros(capacity, dtype=np.float64)
+        y = np.zeros(capacity, dtype=np.float64)
+        ids = np.zeros(capacity, dtype=np.int64)
+
+        if old is not None and n:
+            energy[:n] = self.energy[:n]
+            active[:n] = self.active[:n]
+            kind[:n] = self.kind[:n]
+            alive[:n] = self.alive[:n]
+            pending_grass[:n] = self.pending_grass[:n]
+            pending_meal[:n] = self.pending_meal[:n]
+            x[:n] = self.x[:n]
+            y[:n] = self.y[:n]
+            ids[:n] = self.ids[:n]
+
+        self.energy = energy
+        self.active = active
+        self.kind = kind
+        self.alive = alive
+        self.pending_grass = pending_grass
+        self.pending_meal = pending_meal
+        self.x = x
+        self.y = y
+        self.ids = ids
+
+    # =======================
+    # POPULATION
+    # =======================
+
+    def clear(self):
+        self.alive[:self.size] = False
+        self.size = 0
+
+    def count(self, kind: int) -> int:
+        return int(np.count_nonzero(self.kind[:self.size] == kind))
+
+    def spawn(self, kind: int, n: int, energy=None):
+        n = int(n)
+        if n <= 0:
+            return
+        need = self.size + n
+        if need > self.energy.shape[0]:
+            self._alloc(max(need, 2 * self.energy.shape[0]))
+
+        rows = slice(self.size, need)
+        if energy is None:
+            # same draw as a freshly spawned animal process
+            energy = self.rng.integers(config.INITIAL_ENERGY_MIN, config.INITIAL_ENERGY_MAX + 1, size=n)
+        self.energy[rows] = energy
+        self.active[rows] = False
+        self.kind[rows] = kind
+        self.alive[rows] = True
+        self.pending_grass[rows] = 0
+        self.pending_meal[rows] = False
+        if self.world is not None:
+            self.x[rows], self.y[rows] = self.world.random_positions(self.rng, n)
+        self.ids[rows] = self._new_ids(n)
+        self.size = need
+
+    def admit(self, kind, energy, active, x, y):
+        """Rows handed over by another shard (arrays of the same length), keeping their state and position."""
+        n = int(kind.shape[0])
+        if n == 0:
+            return
+        need = self.size + n
+        if need > self.energy.shape[0]:
+            self._alloc(max(need, 2 * self.energy.shape[0]))
+
+        rows = slice(self.size, need)
+        self.kind[rows] = kind
+        self.energy[rows] = energy
+        self.active[rows] = active
+        self.alive[rows] = True
+        self.pending_grass[rows] = 0
+        self.pending_meal[rows] = False
+        self.x[rows] = x
+        self.y[rows] = y
+        self.ids[rows] = self._new_ids(n)
+        self.size = need
+
+    def emigrate(self, mask):
+        """Removes the rows selected by `mask` (over [0, size)); returns their (kind, energy, active, x, y)."""
+        rows = np.flatnonzero(mask)
+        out = (self.kind[rows], self.energy[rows], self.active[rows], self.x[rows], self.y[rows])
+        if rows.size:
+            self.alive[rows] = False
+            self._compact()
+        return out
+
+    def kill(self, ids):
+        """The animals with these ids die (like a "die" message; ids already gone are ignored)."""
+        n = self.size
+        if n and len(ids):
+            self.alive[:n] &= ~np.isin(self.ids[:n], ids)
+
+    def _new_ids(self, n: int):
+        ids = np.arange(self.next_id, self.next_id + n, dtype=np.int64)
+        self.next_id += n
+        return ids
+
+    def export(self):
+        """(kind int8, energy float64, active bool) of every row as bytes (checkpoint.py)."""
+        n = self.size
+        return self.kind[:n].tobytes(), self.energy[:n].tobytes(), self.active[:n].tobytes()
+
+    def restore(self, kind: bytes, energy: bytes, active: bytes):
+        """Replace the whole population by the rows of an export()."""
+        kind = np.frombuffer(kind, dtype=np.int8)
+        n = kind.size
+        self.clear()
+        if n > self.energy.shape[0]:
+            self._alloc(n)
+        self.kind[:n] = kind
+        self.energy[:n] = np.frombuffer(energy, dtype=np.float64)
+        self.active[:n] = np.frombuffer(active, dtype=bool)
+        self.alive[:n] = True
+        self.pending_grass[:n] = 0
+        self.pending_meal[:n] = False
+        if self.world is not None:
+            self.x[:n], self.y[:n] = self.world.random_positions(self.rng, n)
+        self.ids[:n] = self._new_ids(n)
+        self.size = n
+
+    def energy_stats(self, kind: int):
+        n = self.size
+        e = self.energy[:n][self.kind[:n] == kind]
+        if e.size == 0:
+            return (0.0, 0.0, 0.0)
+        return (float(e.min()), float(e.mean()), float(e.max()))
+
+    def energy_percentiles(self, kind: int, qs):
+        """Same definition as EnergyStats.percentiles (rank int(q * n), to the energy unit)."""
+        n = self.size
+        e = self.energy[:n][self.kind[:n] == kind]
+        if e.size == 0:
+            return tuple(0.0 for _ in qs)
+        ranks = [min(e.size - 1, int(q * e.size)) for q in qs]
+        return tuple(float(v) for v in np.floor(np.partition(e, ranks)[ranks]))
+
+    def energy_histogram(self, kind: int, width: float, bins: int):
+        n = self.size
+        e = self.energy[:n][self.kind[:n] == kind]
+        idx = np.clip(np.floor(np.floor(e) / width), 0, bins - 1).astype(np.int64)
+        return tuple(int(c) for c in np.bincount(idx, minlength=bins))
+
+    def _allocate(self, requested, available: int):
+        """NumPy version of grass.allocate_grass (fifo = row order)."""
+        available = max(0, available)
+        total = int(requested.sum())
+        if total <= available:
+            return requested
+        if config.GRASS_POLICY == "proportional":
+            share = requested * available
+            granted = share // total
+            left = available - int(granted.sum())
+            if left:
+                granted[np.argsort(-(share % total), kind="stable")[:left]] += 1
+            return granted
+        order = self.rng.permutation(requested.size) if config.GRASS_POLICY == "random" else np.arange(requested.size)
+        r = requested[order]
+        granted = np.empty_like(requested)
+        granted[order] = np.clip(available - (np.cumsum(r) - r), 0, r)
+        return granted
+
+    def _compact(self):
+        n = self.size
+        keep = np.flatnonzero(self.alive[:n])
+        k = keep.size
+        if k == n:
+            return
+        for col in (self.energy, self.active, self.kind, self.alive, self.pending_grass, self.pending_meal,
+                    self.x, self.y, self.ids):
+            col[:k] = col[keep]
+        self.alive[k:n] = False
+        self.size = k
+
+    # =======================
+    # TICK
+    # =======================
+
+    def step(self, grass: int, ghosts=None) -> TickOutcome:
+        """
+        One tick for every animal. `grass` is what env has available for eat requests;
+        the granted total is TickOutcome.eaten and must be removed from shared_env by env.
+        With a world, `grass` is unused: preys eat from their cell, which is updated here.
+        `ghosts` = (x, y) of active preys owned by another shard, huntable like local ones;
+        the ones caught are returned in TickOutcome.ghost_kills (their owner kills them).
+        Births are only counted: env spawns them through spawn_prey/spawn_predator (limits).
+        """
+        n = self.size
+        if n == 0:
+            return TickOutcome(0, 0, 0, 0, 0, 0, 0, 0, 0, np.zeros(0, dtype=np.int64))
+
+        rng = self.rng
+        e = self.energy[:n]
+        active = self.active[:n]
+        alive = self.alive[:n]
+        prey = self.kind[:n] == PREY
+        pred = ~prey
+        world = self.world
+        if world is not None:
+            world.move(rng, self.x[:n], self.y[:n], float(config.WORLD_MOVE_STEP))
+
+        # control messages of the previous tick: grass_grant / hunt_result
+        e[prey] += self.pending_grass[:n][prey] * float(config.PREY_GRASS_GAIN_PER_UNIT)
+        e[self.pending_meal[:n]] += float(config.PREDATOR_EAT_GAIN)
+        self.pending_grass[:n] = 0
+        self.pending_meal[:n] = False
+
+        # decay
+        e -= np.where(prey, float(config.PREY_ENERGY_DECAY), float(config.PREDATOR_ENERGY_DECAY))
+
+        # active/passive (preys: H, predators: hysteresis between H and 1.5 H)
+        low = e < config.H_ENERGY
+        high = np.where(prey, e > config.H_ENERGY, e > config.H_ENERGY * 1.5)
+        active[low] = True
+        active[high] = False
+
+        # Eat: active preys, probabilistic, shared according to config.GRASS_POLICY
+        eaters = np.flatnonzero(prey & active & (rng.random(n) < config.PREY_EAT_PROB))
+        eaten = 0
+        starving = 0
+        if eaters.size:
+            requested = rng.integers(int(config.PREY_MIN_EAT), int(config.R_ENERGY) + 1, size=eaters.size)
+            if world is not None:
+                cells = world.cell_of(self.x[eaters], self.y[eaters])
+                granted = world.eat(cells, requested, config.GRASS_POLICY, rng)
+            else:
+                granted = self._allocate(requested, int(grass))
+            self.pending_grass[eaters] = granted
+            eaten = int(granted.sum())
+            starving = int(np.count_nonzero(granted == 0))
+
+        # Hunt: active predators, probabilistic, only active preys can be predated
+        hunters = np.flatnonzero(pred & active & (rng.random(n) < config.PRED_HUNT_PROB))
+        kills = 0
+        ghost_kills = np.zeros(0, dtype=np.int64)
+        if hunters.size:
+            victims = np.flatnonzero(prey & active & alive)
+            if world is not None:
+                vx, vy = self.x[victims], self.y[victims]
+                if ghosts is not None:
+                    vx, vy = np.concatenate([vx, ghosts[0]]), np.concatenate([vy, ghosts[1]])
+                caught = world.hunt(rng, self.x[hunters], self.y[hunters], vx, vy, float(config.WORLD_HUNT_RADIUS))
+                got = caught >= 0
+                kills = int(np.count_nonzero(got))
+                caught = caught[got]
+                local = caught < victims.size
+                alive[victims[caught[local]]] = False
+                ghost_kills = caught[~local] - victims.size
+                self.pending_meal[hunters[got]] = True
+            else:
+                kills = min(hunters.size, victims.size)
+                if kills:
+                    alive[rng.choice(victims, kills, replace=False)] = False
+                    self.pending_meal[rng.choice(hunters, kills, replace=False)] = True
+
+        # Reproduction: enough energy, probabilistic
+        repro_prob = np.where(prey, config.PREY_REPRO_PROB, config.PRED_REPRO_PROB)
+        parents = alive & (e > config.R_ENERGY) & (rng.random(n) < repro_prob)
+        e[parents] -= np.where(prey, float(config.PREY_REPRO_COST), float(config.PRED_REPRO_COST))[parents]
+        prey_births = int(np.count_nonzero(parents & prey))
+        predator_births = int(np.count_nonzero(parents & pred))
+
+        # death: energy exhausted (same test as the `while my_energy > 0` loops)
+        alive &= e > 0
+        prey_deaths = int(np.count_nonzero(prey & ~alive))
+        predator_deaths = int(np.count_nonzero(pred & ~alive))
+
+        self._compact()
+
+        return TickOutcome(
+            eaters=int(eaters.size),
+            eaten=eaten,
+            starving=starving,
+            hunters=int(hunters.size),
+            kills=kills,
+            prey_births=prey_births,
+            predator_births=predator_births,
+            prey_deaths=prey_deaths,
+            predator_deaths=predator_deaths,
+            ghost_kills=ghost_kills,
+        )
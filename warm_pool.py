@@ -0,0 +1,188 @@
+# warm_pool.py
+# Pre-started animal processes for births (process mode, config.WARM_POOL_SIZE > 0):
+#  - idle processes wait on their ctrl queue for an identity + initial energy
+#  - on death they go back to waiting instead of exiting (up to `size` idle; the surplus is stopped)
+#  - env never pays interpreter start-up / imports / socket join inside its tick
+
+import os
+import time
+import queue
+import itertools
+import threading
+import multiprocessing
+
+import config
+from prey import _join_env_socket, live_prey
+from predator import live_predator
+from agent_link import AgentLink
+from shm_slots import SlotWriter, MailboxReader
+
+
+# pooled identities start above Linux pid_max, so they never collide with cold-spawned OS pids
+POOL_ID_BASE = 1 << 22
+
+
+def run_pooled_animal(wid, shared_env, energies_to_env, events_to_env, ctrl_q, ready_q,
+                      telemetry_shm=None, control_shm=None):
+    if config.AGENT_LINK == "socket":
+        # one connection for every life of this process; its ctrl queue still carries the assignments
+        link = AgentLink(config.ENV_HOST, config.ENV_PORT, "pooled", os.getpid())
+        energies_to_env, events_to_env, _ctrl = link.attach(energies_to_env, events_to_env, ctrl_q)
+    else:
+        _join_env_socket("pooled", config.ENV_HOST, config.ENV_PORT, os.getpid())
+    ready_q.put(wid)
+
+    while shared_env.running.value:
+        try:
+            msg = ctrl_q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        except Exception:
+            break
+
+        if msg[0] == "stop":
+            break
+        # anything else is a leftover of the previous life (late grant, die, ...)
+        if msg[0] != "assign":
+            continue
+
+        _, kind, aid, serial, slot, first_tick, state = msg
+        out = energies_to_env
+        if slot is not None and telemetry_shm is not None:
+            out = SlotWriter(telemetry_shm, energies_to_env, *slot)
+        # with a mailbox, the queue only carries assignments
+        ctrl = ctrl_q
+        if slot is not None and control_shm is not None:
+            ctrl = MailboxReader(control_shm, *slot)
+
+        if kind == "prey":
+            live_prey(shared_env, out, events_to_env, ctrl, aid, serial, first_tick, state)
+        else:
+            live_predator(shared_env, out, events_to_env, ctrl, aid, serial, first_tick, state)
+
+
+class WarmPool:
+    """
+    Env-side pool of idle animal processes.
+    A filler thread keeps `size` processes booted or booting, off the env tick.
+    """
+    def __init__(self, shared_env, energies_to_env, events_to_env, size: int,
+                 telemetry_shm=None, control_shm=None):
+        self.shared_env = shared_env
+        self.energies_to_env = energies_to_env
+        self.events_to_env = events_to_env
+        self.size = int(size)
+        self.telemetry_shm = telemetry_shm
+        self.control_shm = control_shm
+
+        self.lock = threading.Lock()
+        self.ready_q = multiprocessing.Queue()
+        self.workers = {}   # wid -> (process, ctrl queue)
+        self.booting = set()
+        self.idle = []      # booted wids
+        self.busy = {}      # aid -> wid
+        self.retired = []   # processes told to stop, joined by the filler thread
+        self._wids = itertools.count(1)
+        self._aids = itertools.count(POOL_ID_BASE)
+
+    def start(self):
+        threading.Thread(target=self._fill_loop, daemon=True).start()
+
+    def _fill_loop(self):
+        while self.shared_env.running.value:
+            with self.lock:
+                missing = self.size - len(self.idle) - len(self.booting)
+                retired, self.retired = self.retired, []
+            for p in retired:
+                p.join(timeout=0)
+            with self.lock:
+                self.retired.extend(p for p in retired if p.is_alive())
+            for _ in range(max(0, missing)):
+                self._start_one()
+            time.sleep(0.05)
+
+    def _start_one(self):
+        wid = next(self._wids)
+        q = multiprocessing.Queue()
+        p = multiprocessing.Process(
+            target=run_pooled_animal,
+            args=(wid, self.shared_env, self.energies_to_env, self.events_to_env, q, self.ready_q,
+                  self.telemetry_shm, self.control_shm),
+            name=f"POOLED-{wid}",
+        )
+        try:
+            p.start()
+        except Exception:
+            return
+        with self.lock:
+            self.workers[wid] = (p, q)
+            self.booting.add(wid)
+
+    def _collect_ready(self):
+        try:
+            while True:
+                wid = self.ready_q.get_nowait()
+                self.booting.discard(wid)
+                self.idle.append(wid)
+        except queue.Empty:
+            pass
+
+    def acquire(self, kind: str, serial: int, slot=None, state=None):
+        """
+        Hand a new identity, random stream (`serial`), telemetry slot (if any) and checkpointed
+        (energy, active, resume tick) `state` (if resumed) to an idle process.
+        Returns (aid, ctrl queue), or None if no process is ready.
+        """
+        with self.lock:
+            self._collect_ready()
+            if not self.idle:
+                return None
+            wid = self.idle.pop()
+            aid = next(self._aids)
+            self.busy[aid] = wid
+            q = self.workers[wid][1]
+
+        q.put(("assign", kind, aid, serial, slot, self.shared_env.barrier.next_tick(), state))
+        return aid, q
+
+    def _park(self, wid):
+        # lock held; its life is over (or told to die), so "stop" is read before any new assign
+        if len(self.idle) + len(self.booting) < self.size:
+            self.idle.append(wid)
+            return
+        p, q = self.workers.pop(wid)
+        try:
+            q.put(("stop",))
+        except Exception:
+            pass
+        self.retired.append(p)
+
+    def release(self, aid):
+        """The animal `aid` died: its process waits for a new identity, or exits if enough already wait."""
+        with self.lock:
+            wid = self.busy.pop(aid, None)
+            if wid is not None:
+                self._park(wid)
+
+    def reset(self) -> int:
+        """
+        Env has already sent "die" to every animal; each process handles it before any new assign.
+        Returns how many were alive (they still act, and ack, one last tick in lockstep mode).
+        """
+        with self.lock:
+            n = len(self.busy)
+            for wid in self.busy.values():
+                self._park(wid)
+            self.busy.clear()
+        return n
+
+    def stop(self):
+        with self.lock:
+            procs = [p for p, _q in self.workers.values()] + self.retired
+        for p in procs:
+            try:
+                p.join(timeout=1.0)
+            except Exception:
+                pass
+            if p.is_alive():
+                p.terminate()
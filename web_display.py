@@ -1,27 +1,62 @@
 # web_display.py
 # Display process:
-#  - communicates with env ONLY through message queues (display_to_env, env_to_display, log_to_display)
+#  - communicates with env ONLY through message queues (display_to_env, env_to_display, log_to_display);
+#    env_to_display / log_to_display may be the shared-memory channels of display_channel.py
 #  - does NOT access shared_env (spec: shared memory for predator/prey only)
 
+import os
 import json
+import gzip
 import time
 import threading
+from urllib.parse import urlsplit, parse_qs
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
-from ipc import DisplayCommand
+import config
+from ipc import DisplayCommand, MetricsReport
+from log_ring import LogRing
+from history import SnapshotHistory
+from tick_metrics import to_prometheus
+
+
+def _sse(event: str, data, event_id=None) -> bytes:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+class _State:
+    """One state payload serialized once: JSON body, its gzip variant, ETag and SSE message."""
+    _run = os.urandom(4).hex()   # ETags of a previous display process never match
+
+    def __init__(self, payload: dict, version: int):
+        self.version = version
+        self.body = json.dumps(payload).encode("utf-8")
+        self.gzip = gzip.compress(self.body, compresslevel=5)
+        self.etag = f'"{self._run}-{version}"'
+        self.event = b"event: state\ndata: " + self.body + b"\n\n"
 
 
 def run_web_display(env_to_display, display_to_env, log_to_display, host="127.0.0.1", port=8000):
-    latest = {"ok": False, "reason": "no snapshot yet"}
-    latest_lock = threading.Lock()
+    metrics = None  # latest MetricsReport (guarded by metrics_lock)
+    metrics_lock = threading.Lock()
+
+    history = SnapshotHistory(config.HISTORY_TICKS, config.ENERGY_PERCENTILES)
+    logs = LogRing(config.LOG_RETENTION)  # seq numbers double as SSE event ids of the logs events
 
-    logs = []  # newest first
-    logs_lock = threading.Lock()
+    # latest snapshot, serialized once whatever the number of clients (/api/state, /api/stream);
+    # replaced as a whole, SSE clients sleep on `changed` until a snapshot or a log line arrives
+    state = _State({"ok": False, "reason": "no snapshot yet"}, 0)
+    changed = threading.Condition()
 
     def snapshot_loop():
-        nonlocal latest
+        nonlocal metrics, state
         while True:
             try:
                 s = env_to_display.get()
+                if isinstance(s, MetricsReport):
+                    with metrics_lock:
+                        metrics = s
+                    continue
+                history.append(s)
                 payload = {
                     "ok": True,
                     "tick": int(getattr(s, "tick", 0)),
@@ -33,32 +68,51 @@ def run_web_display(env_to_display, display_to_env, log_to_display, host="127.0.
                         "min": float(getattr(s, "prey_energy_stats", (0, 0, 0))[0]),
                         "avg": float(getattr(s, "prey_energy_stats", (0, 0, 0))[1]),
                         "max": float(getattr(s, "prey_energy_stats", (0, 0, 0))[2]),
+                        "pct": [float(v) for v in getattr(s, "prey_energy_pct", ())],
+                        "hist": [int(c) for c in getattr(s, "prey_energy_hist", ())],
                     },
                     "pred_energy": {
                         "min": float(getattr(s, "predator_energy_stats", (0, 0, 0))[0]),
                         "avg": float(getattr(s, "predator_energy_stats", (0, 0, 0))[1]),
                         "max": float(getattr(s, "predator_energy_stats", (0, 0, 0))[2]),
+                        "pct": [float(v) for v in getattr(s, "predator_energy_pct", ())],
+                        "hist": [int(c) for c in getattr(s, "predator_energy_hist", ())],
                     },
                     "prey_probs": {"eat": float(getattr(s, "prey_probs", (0, 0))[0]), "repro": float(getattr(s, "prey_probs", (0, 0))[1])},
                     "pred_probs": {"hunt": float(getattr(s, "pred_probs", (0, 0))[0]), "repro": float(getattr(s, "pred_probs", (0, 0))[1])},
+                    "spawn_latency_ms": {
+                        "p50": float(getattr(s, "spawn_latency_ms", (0, 0))[0]),
+                        "p99": float(getattr(s, "spawn_latency_ms", (0, 0))[1]),
+                    },
                 }
-                with latest_lock:
-                    latest = payload
+                with metrics_lock:
+                    if metrics is not None:
+                        payload["tick_overruns"] = metrics.tick_overruns
+                encoded = _State(payload, state.version + 1)
+                with changed:
+                    state = encoded
+                    changed.notify_all()
             except Exception:
                 pass
 
     def log_loop():
-        nonlocal logs
         while True:
             try:
-                line = log_to_display.get()
-                with logs_lock:
-                    logs.insert(0, str(line))
-                    if len(logs) > 200:
-                        logs = logs[:200]
+                logs.append(str(log_to_display.get()))
+                with changed:
+                    changed.notify_all()
             except Exception:
                 pass
 
+    def display_counters() -> dict:
+        # only the shared-memory channels lose anything on purpose
+        counters = {}
+        if hasattr(env_to_display, "skipped"):
+            counters["snapshots_skipped"] = env_to_display.skipped
+        if hasattr(log_to_display, "dropped"):
+            counters["logs_dropped"] = log_to_display.dropped
+        return counters
+
     threading.Thread(target=snapshot_loop, daemon=False).start()
     threading.Thread(target=log_loop, daemon=False).start()
 
@@ -93,7 +147,7 @@ h1{margin:0 0 8px;}
 .label{font-size:12px; color:var(--muted);}
 .value{font-size:20px; font-weight:bold; margin-top:4px;}
 .row{display:flex; gap:10px; flex-wrap:wrap; align-items:center; margin:10px 0;}
-button,input{padding:8px 10px; border-radius:8px; border:1px solid var(--border); background:rgba(255,255,255,0.08); color:var(--text);}
+button,input,select{padding:8px 10px; border-radius:8px; border:1px solid var(--border); background:rgba(255,255,255,0.08); color:var(--text);}
 button{cursor:pointer; font-weight:bold;}
 button:hover{background:rgba(255,255,255,0.18);}
 button.primary{border-color: rgba(52,211,153,0.6);}
@@ -123,6 +177,8 @@ button.danger{border-color: rgba(239,68,68,0.7);}
       <div class="label">Tick</div>
       <div class="value" id="tick">-</div>
       <div class="small">Mode: <span id="mode">-</span></div>
+      <div class="small">Spawn latency p50/p99: <span id="spawnLat">-</span> ms</div>
+      <div class="small">Tick overruns: <span id="overruns">-</span></div>
     </div>
     <div class="box">
       <div class="label">Grass</div>
@@ -132,12 +188,14 @@ button.danger{border-color: rgba(239,68,68,0.7);}
       <div class="label">Preys</div>
       <div class="value" id="preys">-</div>
       <div class="small">Energy (min/avg/max): <span id="preyE">-</span></div>
+      <div class="small">Percentiles: <span id="preyPct">-</span></div>
       <div class="small">Eat: <span id="preyEatP">-</span>% | Repro: <span id="preyRepP">-</span>%</div>
     </div>
     <div class="box">
       <div class="label">Predators</div>
       <div class="value" id="preds">-</div>
       <div class="small">Energy (min/avg/max): <span id="predE">-</span></div>
+      <div class="small">Percentiles: <span id="predPct">-</span></div>
       <div class="small">Hunt: <span id="predHuntP">-</span>% | Repro: <span id="predRepP">-</span>%</div>
     </div>
   </div>
@@ -148,6 +206,11 @@ button.danger{border-color: rgba(239,68,68,0.7);}
     <button class="primary" onclick="sendCmd('add_prey',{value:1})">+1 prey</button>
     <button class="primary" onclick="sendCmd('add_predator',{value:1})">+1 predator</button>
     <button class="danger" onclick="sendCmd('reset')">Reset preys and predators</button>
+    <select id="logLevel" onchange="sendCmd('set_log_level',{value:this.value})">
+      <option value="events">Logs: every event</option>
+      <option value="summary">Logs: one line per tick</option>
+      <option value="quiet">Logs: quiet</option>
+    </select>
   </div>
 
   <h3>Logs</h3>
@@ -157,6 +220,7 @@ button.danger{border-color: rgba(239,68,68,0.7);}
 "use strict";
 
 const logEl = document.getElementById('log');
+document.getElementById('logLevel').value = "__LOG_LEVEL__";
 
 async function sendCmd(cmd, args){
   try{
@@ -169,11 +233,8 @@ async function sendCmd(cmd, args){
   }catch(e){}
 }
 
-async function refresh(){
+function render(s){
   try{
-    const res = await fetch('/api/state', {cache:'no-store'});
-    const s = await res.json();
-
     if(!s || !s.ok){
       document.getElementById('mode').textContent = 'waiting...';
       return;
@@ -192,6 +253,8 @@ async function refresh(){
       `${Number(pe.min).toFixed(0)} / ${Number(pe.avg).toFixed(1)} / ${Number(pe.max).toFixed(0)}`;
     document.getElementById('predE').textContent =
       `${Number(pr.min).toFixed(0)} / ${Number(pr.avg).toFixed(1)} / ${Number(pr.max).toFixed(0)}`;
+    document.getElementById('preyPct').textContent = (pe.pct || []).map(v => Number(v).toFixed(0)).join(' / ') || '-';
+    document.getElementById('predPct').textContent = (pr.pct || []).map(v => Number(v).toFixed(0)).join(' / ') || '-';
 
     const pp = s.prey_probs || {eat:0, repro:0};
     const dp = s.pred_probs || {hunt:0, repro:0};
@@ -201,48 +264,164 @@ async function refresh(){
     document.getElementById('predHuntP').textContent = Math.round(Number(dp.hunt) * 100);
     document.getElementById('predRepP').textContent = Math.round(Number(dp.repro) * 100);
 
-    if (Array.isArray(s.logs)) logEl.textContent = s.logs.join("\\n");
+    const sl = s.spawn_latency_ms || {p50:0, p99:0};
+    document.getElementById('spawnLat').textContent =
+      `${Number(sl.p50).toFixed(1)} / ${Number(sl.p99).toFixed(1)}`;
+    document.getElementById('overruns').textContent = s.tick_overruns ?? '-';
   }catch(e){}
 }
 
-setInterval(refresh, 200);
-refresh();
+let logLines = [];  // newest first
+let logSeq = 0;     // last line received
+
+function addLogs(lines){
+  logLines = lines.slice().reverse().concat(logLines).slice(0, 200);
+  logEl.textContent = logLines.join("\\n");
+}
+
+async function refresh(){
+  try{
+    const res = await fetch('/api/state', {cache:'no-cache'});  // revalidated with the ETag
+    render(await res.json());
+    const lr = await fetch('/api/logs?since=' + logSeq + '&limit=200', {cache:'no-store'});
+    const l = await lr.json();
+    if (l.seq < logSeq) logLines = [];  // display restarted
+    logSeq = l.seq;
+    if (l.lines.length) addLogs(l.lines);
+  }catch(e){}
+}
+
+// pushed updates (one per snapshot + new log lines only); polling if the browser has no EventSource
+if (window.EventSource){
+  const es = new EventSource('/api/stream');
+  es.addEventListener('state', e => render(JSON.parse(e.data)));
+  es.addEventListener('logs', e => addLogs(JSON.parse(e.data)));
+} else {
+  setInterval(refresh, 200);
+  refresh();
+}
 </script>
 </body>
 </html>
 """
 
-    INDEX_HTML = INDEX_HTML.replace("\ufeff", "")
+    INDEX_HTML = INDEX_HTML.replace("\ufeff", "").replace("__LOG_LEVEL__", str(config.LOG_LEVEL))
 
     class Handler(BaseHTTPRequestHandler):
-        def _send(self, code, body, content_type="application/json"):
+        def _send(self, code, body, content_type="application/json", headers=None):
             if isinstance(body, (dict, list)):
                 body = json.dumps(body).encode("utf-8")
             elif isinstance(body, str):
                 body = body.encode("utf-8")
-            else:
+            elif not isinstance(body, bytes):
                 body = json.dumps({"ok": False, "error": "invalid response"}).encode("utf-8")
 
             self.send_response(code)
             self.send_header("Content-Type", content_type + "; charset=utf-8")
             self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
             self.end_headers()
             self.wfile.write(body)
 
+        def _send_state(self):
+            """Cached bytes of the latest snapshot: 304 if the client has them, gzip if accepted."""
+            st = state
+            headers = {"ETag": st.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+            if st.etag in (t.strip() for t in self.headers.get("If-None-Match", "").split(",")):
+                self.send_response(304)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                return
+            if "gzip" in self.headers.get("Accept-Encoding", ""):
+                headers["Content-Encoding"] = "gzip"
+                self._send(200, st.gzip, headers=headers)
+            else:
+                self._send(200, st.body, headers=headers)
+
         def log_message(self, fmt, *args):
             return
 
+        def _stream(self):
+            """Server-Sent Events: a state event per new snapshot, a logs event with the new lines only."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+
+            seen_version = 0
+            try:
+                # a reconnecting EventSource sends the id of the last logs event it got
+                seen_log = int(self.headers.get("Last-Event-ID", ""))
+            except ValueError:
+                seen_log = 0
+
+            try:
+                while True:
+                    with changed:
+                        changed.wait_for(lambda: state.version != seen_version or logs.seq != seen_log, timeout=15.0)
+                        st = state
+
+                    chunks = []
+                    if st.version != seen_version:
+                        chunks.append(st.event)
+                        seen_version = st.version
+                    seen_log, new = logs.since(seen_log)
+                    if new:
+                        chunks.append(_sse("logs", new, event_id=seen_log))
+                    self.wfile.write(b"".join(chunks) or b": keepalive\n\n")
+                    self.wfile.flush()
+            except OSError:
+                return  # client gone
+
         def do_GET(self):
             if self.path == "/" or self.path.startswith("/index.html"):
                 self._send(200, INDEX_HTML, content_type="text/html")
                 return
 
             if self.path.startswith("/api/state"):
-                with latest_lock:
-                    payload = dict(latest)
-                with logs_lock:
-                    payload["logs"] = list(logs)
-                self._send(200, payload)
+                self._send_state()
+                return
+
+            if self.path.startswith("/api/history"):
+                query = parse_qs(urlsplit(self.path).query)
+
+                def arg(name):
+                    return int(query[name][0]) if name in query else None
+
+                try:
+                    fields = [f for f in query.get("fields", [""])[0].split(",") if f] or None
+                    result = history.query(arg("from"), arg("to"), arg("step"), fields, config.HISTORY_MAX_POINTS)
+                except ValueError as e:
+                    self._send(400, {"ok": False, "error": str(e)})
+                    return
+                self._send(200, dict(result, ok=True))
+                return
+
+            if self.path.startswith("/api/logs"):
+                query = parse_qs(urlsplit(self.path).query)
+                try:
+                    since = int(query.get("since", ["0"])[0])
+                    limit = int(query["limit"][0]) if "limit" in query else None
+                except ValueError:
+                    self._send(400, {"ok": False, "error": "since and limit must be integers"})
+                    return
+                seq, lines = logs.since(since, limit)
+                self._send(200, {"ok": True, "seq": seq, "lines": lines})
+                return
+
+            if self.path.startswith("/api/stream"):
+                self._stream()
+                return
+
+            if self.path.startswith("/api/metrics"):
+                with metrics_lock:
+                    report = metrics
+                if report is None:
+                    self._send(503, "# no metrics yet\n", content_type="text/plain; version=0.0.4")
+                else:
+                    self._send(200, to_prometheus(report, display_counters()), content_type="text/plain; version=0.0.4")
                 return
 
             self._send(404, {"ok": False, "error": "not found"})